@@ -10,10 +10,21 @@ import matplotlib.pyplot as plt
 import seaborn as sns
 import json
 import os
-from datetime import datetime, timedelta
+from datetime import date, datetime, timedelta
 from collections import Counter
 import plotly.express as px
 import plotly.graph_objects as go
+from utils.helpers import INTENSITY_MAX, INTENSITY_MIN
+from utils.profiles import DEFAULT_PROFILE, list_profiles, open_profile, valid_name
+from utils import cache
+from utils.cache import cached_columns
+from utils.columnar import EntryStore, to_epoch
+from utils.search import index_for
+from utils.rollups import SCORES, current_rollups
+from utils.series import BUCKETS, time_series
+from utils import profiling
+from utils.writer import QueueFullError, writer_for
+from utils.export import csv_bytes, export_arrow, export_filename, export_parquet, read_columnar_frame
 
 # Configure page
 st.set_page_config(
@@ -77,34 +88,54 @@ st.markdown("""
 """, unsafe_allow_html=True)
 
 # Data management
-DATA_DIR = "data"
-DATA_FILE = os.path.join(DATA_DIR, "triggers.json")
 REPORTS_DIR = "reports"
 
 def ensure_dirs():
-    os.makedirs(DATA_DIR, exist_ok=True)
     os.makedirs(REPORTS_DIR, exist_ok=True)
 
-def read_json(path):
-    if not os.path.exists(path):
-        return []
-    try:
-        with open(path, "r", encoding="utf-8") as f:
-            data = json.load(f)
-            return data if isinstance(data, list) else []
-    except:
-        return []
+def switch_profile():
+    # Cursors and search offsets belong to the previous profile's data
+    for key in ("history_filters", "history_cursor", "history_offset"):
+        st.session_state.pop(key, None)
 
-def write_json(path, data):
-    tmp = path + ".tmp"
-    with open(tmp, "w", encoding="utf-8") as f:
-        json.dump(data, f, indent=2, ensure_ascii=False)
-    os.replace(tmp, path)
+def create_profile():
+    name = st.session_state.new_profile.strip()
+    if not valid_name(name):
+        st.session_state.profile_error = f"\"{name}\" is not a valid profile name (letters, digits, '.', '_' or '-')."
+        return
+    st.session_state.pop("profile_error", None)
+    st.session_state.profile = name
+    st.session_state.new_profile = ""
+    switch_profile()
 
 def save_entry(entry):
-    data = read_json(DATA_FILE)
-    data.append(entry)
-    write_json(DATA_FILE, data)
+    """Queue entry for the background writer; returns its Ticket."""
+    return writer_for(store).submit(entry)
+
+def save_status():
+    """Acknowledge the latest saves; each is celebrated once it is on disk."""
+    pending = st.session_state.pending_saves
+    celebrated = [t for t in st.session_state.get("celebrated_saves", []) if t in pending]
+    for ticket in pending:
+        if not ticket.done():
+            st.info(f"⏳ Saving \"{ticket.entry['trigger']}\"...")
+        elif ticket.error is not None:
+            st.error(f"Could not save \"{ticket.entry['trigger']}\": {ticket.error}")
+        else:
+            st.success(f"✅ \"{ticket.entry['trigger']}\" saved")
+            if ticket not in celebrated:
+                celebrated.append(ticket)
+                st.balloons()
+    st.session_state.celebrated_saves = celebrated
+
+@st.fragment(run_every=1)
+def poll_save_status():
+    # Re-runs on its own every second while a save is outstanding, so the
+    # acknowledgement appears once the write is durable without rerunning
+    # (or blocking) the page; the last one reruns the page to stop polling.
+    save_status()
+    if all(t.done() for t in st.session_state.pending_saves):
+        st.rerun()
 
 # Initialize
 ensure_dirs()
@@ -116,10 +147,32 @@ st.markdown("*A safe space to understand your patterns and grow stronger*")
 # Sidebar navigation
 with st.sidebar:
     st.markdown("### Navigation")
-    page = st.selectbox("Go to:", ["📝 New Entry", "📊 Dashboard", "📈 Analytics", "📋 History", "💾 Export"])
+    page = st.selectbox("Go to:", ["📝 New Entry", "📊 Dashboard", "📈 Analytics", "📋 History", "💾 Export",
+                                   "🩺 Diagnostics"])
+    
+    # Each profile has its own data; ?profile=name picks one at session start
+    st.markdown("### Profile")
+    if "profile" not in st.session_state:
+        requested = st.query_params.get("profile", DEFAULT_PROFILE)
+        st.session_state.profile = requested if valid_name(requested) else DEFAULT_PROFILE
+    profiles = list_profiles()
+    if st.session_state.profile not in profiles:
+        profiles.append(st.session_state.profile)
+    st.selectbox("Profile", profiles, key="profile", on_change=switch_profile, label_visibility="collapsed")
+    st.text_input("New profile", key="new_profile", placeholder="New profile name", on_change=create_profile)
+    if "profile_error" in st.session_state:
+        st.error(st.session_state.profile_error)
 
-# Load data
-data = read_json(DATA_FILE)
+# Stores are cheap handles; the loaded data is shared through utils.cache
+store = open_profile(st.session_state.profile)
+
+# Time this rerun when TRIGGER_TRACKER_PROFILE is set (see Diagnostics)
+profiling.start_run(page)
+
+# Entry count from store metadata; pages that need every entry load the
+# shared columnar EntryStore themselves, so recent-window views stay cheap
+entry_count = store.count()
+profiling.checkpoint("count entries")
 
 if page == "📝 New Entry":
     st.header("Log a New Trigger")
@@ -146,7 +199,7 @@ if page == "📝 New Entry":
             shame = st.slider("😔 Shame", 0, 10, 0)
             relief = st.slider("😌 Relief", 0, 10, 0)
             
-            intensity = st.slider("⚡ Overall Intensity", 1, 10, 5)
+            intensity = st.slider("⚡ Overall Intensity", INTENSITY_MIN, INTENSITY_MAX, 5)
         
         notes = st.text_area("Additional notes (optional)", placeholder="Any other thoughts or observations...")
         
@@ -171,41 +224,50 @@ if page == "📝 New Entry":
                     "notes": notes.strip(),
                 }
                 
-                save_entry(entry)
-                st.success("✅ Entry saved successfully!")
-                st.balloons()
+                try:
+                    ticket = save_entry(entry)
+                except QueueFullError as exc:
+                    st.error(f"Could not save right now ({exc}). Please try again.")
+                else:
+                    # Keep the latest few acknowledgements on screen
+                    st.session_state.pending_saves = st.session_state.get("pending_saves", [])[-2:] + [ticket]
             else:
                 st.error("Please describe the trigger before saving.")
+    pending = st.session_state.get("pending_saves")
+    if pending and not all(t.done() for t in pending):
+        poll_save_status()
+    elif pending:
+        save_status()
+    profiling.checkpoint("new entry.form")
 
 elif page == "📊 Dashboard":
-    if not data:
+    if not entry_count:
         st.info("No entries yet. Start by logging your first trigger!")
     else:
         st.header("Your Trigger Dashboard")
         
-        # Key metrics
+        # Key metrics, read from the materialised rollups
+        rollups = current_rollups(store)
         col1, col2, col3, col4 = st.columns(4)
         
         with col1:
-            st.metric("Total Entries", len(data))
+            st.metric("Total Entries", rollups.count)
         
         with col2:
-            avg_intensity = sum(e.get("intensity", 0) for e in data) / len(data)
-            st.metric("Avg Intensity", f"{avg_intensity:.1f}/10")
+            st.metric("Avg Intensity", f"{rollups.average_intensity():.1f}/10")
         
         with col3:
-            recent_entries = [e for e in data if datetime.strptime(e["timestamp"], "%Y-%m-%d %H:%M:%S") > datetime.now() - timedelta(days=7)]
-            st.metric("This Week", len(recent_entries))
+            st.metric("This Week", rollups.count_last_days(7))
         
         with col4:
-            triggers = [e["trigger"] for e in data]
-            most_common = Counter(triggers).most_common(1)
+            most_common = rollups.triggers().most_common(1)
             if most_common:
                 st.metric("Top Trigger", most_common[0][0][:15] + ("..." if len(most_common[0][0]) > 15 else ""))
+        profiling.checkpoint("dashboard.metrics")
         
         # Recent activity
         st.subheader("Recent Activity")
-        recent_data = sorted(data, key=lambda x: x["timestamp"], reverse=True)[:5]
+        recent_data = store.page(5)
         
         for entry in recent_data:
             with st.container():
@@ -215,15 +277,13 @@ elif page == "📊 Dashboard":
                     <small>{entry['timestamp']} • Intensity: {entry['intensity']}/10</small>
                 </div>
                 """, unsafe_allow_html=True)
+        profiling.checkpoint("dashboard.recent")
         
         # Feelings overview
         st.subheader("Average Feelings Profile")
         
-        if data:
-            feelings_data = {}
-            for feeling in ["anxiety", "sadness", "anger", "shame", "relief"]:
-                avg_score = sum(e["feelings"].get(feeling, 0) for e in data) / len(data)
-                feelings_data[feeling] = avg_score
+        if rollups.count:
+            feelings_data = rollups.averages()
             
             df_feelings = pd.DataFrame(list(feelings_data.items()), columns=["Feeling", "Average Score"])
             
@@ -233,50 +293,80 @@ elif page == "📊 Dashboard":
                         title="Your Emotional Patterns")
             fig.update_layout(showlegend=False, height=400)
             st.plotly_chart(fig, use_container_width=True)
+            profiling.checkpoint("dashboard.feelings chart")
 
 elif page == "📈 Analytics":
-    if not data:
+    source = st.radio("Data source", ["Live entries", "Columnar archive"], horizontal=True)
+    archive = source == "Columnar archive"
+    df = None
+    
+    if archive:
+        # Parquet/Arrow export, memory-mapped instead of rebuilt from dicts
+        archive_path = st.text_input("Parquet file or folder, or Arrow file",
+                                     placeholder="reports/triggers_parquet_20240101_120000")
+        if archive_path:
+            try:
+                df = read_columnar_frame(archive_path)
+            except (RuntimeError, OSError, ValueError) as exc:
+                st.error(f"Could not open archive: {exc}")
+    else:
+        # Live charts come from the rollups, which also cover archived entries
+        rollups = current_rollups(store)
+    profiling.checkpoint("analytics.frame")
+    
+    if (df is None or df.empty) if archive else not entry_count:
         st.info("Add some entries to see your analytics!")
     else:
         st.header("Pattern Analysis")
         
-        # Convert to DataFrame
-        df_data = []
-        for entry in data:
-            row = {
-                "timestamp": datetime.strptime(entry["timestamp"], "%Y-%m-%d %H:%M:%S"),
-                "trigger": entry["trigger"],
-                "intensity": entry["intensity"],
-                **entry["feelings"]
-            }
-            df_data.append(row)
-        
-        df = pd.DataFrame(df_data)
-        df["date"] = df["timestamp"].dt.date
-        df["hour"] = df["timestamp"].dt.hour
+        if archive:
+            daily = list(df.groupby("date").size().items())
+        else:
+            daily = rollups.days()
+        days = [date.fromisoformat(str(d)) for d, _ in daily]
+        first_day = min(days, default=date.today())
+        last_day = max(days, default=date.today())
+        range_col, bucket_col = st.columns([2, 1])
+        with range_col:
+            picked = st.date_input("Date range", value=(first_day, last_day),
+                                   min_value=first_day, max_value=last_day)
+        with bucket_col:
+            bucket = st.selectbox("Group by", [None, *BUCKETS],
+                                  format_func=lambda b: b.title() if b else "Auto")
+        # A range is only complete once both ends are picked
+        start, end = picked if len(picked) == 2 else (first_day, last_day)
         
         col1, col2 = st.columns(2)
         
         with col1:
-            # Triggers over time
-            daily_counts = df.groupby("date").size().reset_index(name="count")
-            fig = px.line(daily_counts, x="date", y="count", 
-                         title="Triggers Over Time",
-                         markers=True)
+            # Triggers over time, bucketed and capped at MAX_POINTS
+            bucket, points = time_series(daily, start, end, bucket)
+            daily_counts = pd.DataFrame(points, columns=[bucket, "count"])
+            fig = px.line(daily_counts, x=bucket, y="count", 
+                         title=f"Triggers Over Time (per {bucket})",
+                         markers=len(points) <= 100)
             fig.update_layout(height=400)
             st.plotly_chart(fig, use_container_width=True)
+            profiling.checkpoint("analytics.over time chart")
         
         with col2:
             # Hourly patterns
-            hourly_counts = df.groupby("hour").size().reset_index(name="count")
+            if archive:
+                hourly_counts = df.groupby("hour").size().reset_index(name="count")
+            else:
+                hourly_counts = pd.DataFrame(list(enumerate(rollups.per_hour)), columns=["hour", "count"])
             fig = px.bar(hourly_counts, x="hour", y="count",
                         title="Triggers by Hour of Day")
             fig.update_layout(height=400)
             st.plotly_chart(fig, use_container_width=True)
+            profiling.checkpoint("analytics.hourly chart")
         
         # Top triggers
         st.subheader("Most Common Triggers")
-        trigger_counts = Counter(df["trigger"]).most_common(10)
+        if archive:
+            trigger_counts = Counter(df["trigger"]).most_common(10)
+        else:
+            trigger_counts = rollups.triggers().most_common(10)
         
         if trigger_counts:
             triggers_df = pd.DataFrame(trigger_counts, columns=["Trigger", "Count"])
@@ -284,51 +374,89 @@ elif page == "📈 Analytics":
                         orientation="h", title="Top 10 Triggers")
             fig.update_layout(height=500)
             st.plotly_chart(fig, use_container_width=True)
+        profiling.checkpoint("analytics.top triggers chart")
         
         # Correlation heatmap
         st.subheader("Emotional Correlations")
-        feelings_df = df[["anxiety", "sadness", "anger", "shame", "relief", "intensity"]]
-        corr = feelings_df.corr()
+        if archive:
+            feelings_df = df[list(SCORES)]
+            corr = feelings_df.corr()
+        else:
+            # Running covariance from the rollups; no pass over the entries
+            window = st.radio("Window", [None, 90, 30], horizontal=True,
+                              format_func=lambda d: f"Last {d} days" if d else "All time")
+            corr = pd.DataFrame(rollups.covariance(window).correlation(),
+                                index=SCORES, columns=SCORES)
         
         fig = px.imshow(corr, text_auto=True, aspect="auto", 
                        title="How Your Feelings Relate to Each Other")
         st.plotly_chart(fig, use_container_width=True)
+        profiling.checkpoint("analytics.correlation chart")
 
 elif page == "📋 History":
     st.header("Entry History")
     
-    if not data:
+    if not entry_count:
         st.info("No entries to display yet.")
     else:
         # Search and filter
-        col1, col2 = st.columns([2, 1])
+        col1, col2, col3, col4 = st.columns([2, 1, 1, 1])
         with col1:
-            search_term = st.text_input("🔍 Search entries", placeholder="Search triggers, notes, or context...")
+            search_term = st.text_input("🔍 Search entries", placeholder="Search triggers, notes, or context...",
+                                        help="All words must match. Use notes:work to search one field.")
         with col2:
             days_back = st.selectbox("Show entries from:", [7, 30, 90, 365, 9999], 
                                    format_func=lambda x: f"Last {x} days" if x < 9999 else "All time")
+        with col3:
+            rank = st.selectbox("Sort results by:", ["relevance", "recency"], format_func=str.capitalize)
+        with col4:
+            page_size = st.selectbox("Per page:", [10, 25, 50, 100], index=1)
         
-        # Filter data
-        filtered_data = data
+        cutoff_date = datetime.now() - timedelta(days=days_back) if days_back < 9999 else None
         
-        # Date filter
-        if days_back < 9999:
-            cutoff_date = datetime.now() - timedelta(days=days_back)
-            filtered_data = [e for e in filtered_data if datetime.strptime(e["timestamp"], "%Y-%m-%d %H:%M:%S") > cutoff_date]
+        # Start from the newest page whenever the filters change
+        filters = (search_term, days_back, rank, page_size)
+        if st.session_state.get("history_filters") != filters:
+            st.session_state.history_filters = filters
+            st.session_state.history_cursor = None
+            st.session_state.history_offset = 0
         
-        # Search filter
         if search_term:
-            search_lower = search_term.lower()
-            filtered_data = [e for e in filtered_data if 
-                           search_lower in e.get("trigger", "").lower() or
-                           search_lower in e.get("before", "").lower() or
-                           search_lower in e.get("after", "").lower() or
-                           search_lower in e.get("notes", "").lower()]
-        
-        st.caption(f"Showing {len(filtered_data)} of {len(data)} entries")
+            # Indexed search; every word is matched as a prefix while typing.
+            # Results are ranked, so they are paged by offset.
+            data = cached_columns(store)
+            index = index_for(store, data)
+            since = to_epoch(cutoff_date) if cutoff_date else None
+            docs = index.search(search_term, rank=rank, prefix=True, since=since)
+            if entry_count > len(data):
+                st.caption("Search covers entries that are not archived; browse without a search to see older ones.")
+            offset = min(st.session_state.history_offset, max(len(docs) - 1, 0))
+            page_entries = [data[d] for d in docs[offset:offset + page_size]]
+            has_newer, has_older = offset > 0, offset + page_size < len(docs)
+            total = len(docs)
+        else:
+            # Keyset pagination on (timestamp, id): only the visible page is fetched
+            cursor = st.session_state.history_cursor
+            if cursor and cursor[0] == "after":
+                rows = store.page(page_size + 1, after=cursor[1], start=cutoff_date)
+                if len(rows) > page_size:
+                    page_entries, has_newer, has_older = rows[1:], True, True
+                else:
+                    # Reached the newest entries
+                    cursor = st.session_state.history_cursor = None
+            if not cursor or cursor[0] == "before":
+                before = cursor[1] if cursor else None
+                rows = store.page(page_size + 1, before=before, start=cutoff_date)
+                page_entries = rows[:page_size]
+                has_newer, has_older = before is not None, len(rows) > page_size
+            total = store.count(start=cutoff_date) if cutoff_date else entry_count
+            offset = None
+        
+        st.caption(f"Showing {len(page_entries)} of {total} entries")
+        profiling.checkpoint("history.query")
         
         # Display entries
-        for entry in sorted(filtered_data, key=lambda x: x["timestamp"], reverse=True):
+        for entry in page_entries:
             with st.expander(f"{entry['timestamp']} - {entry['trigger'][:50]}{'...' if len(entry['trigger']) > 50 else ''}", expanded=False):
                 col1, col2 = st.columns([2, 1])
                 
@@ -347,53 +475,63 @@ elif page == "📋 History":
                     for feeling, score in entry["feelings"].items():
                         if score > 0:
                             st.write(f"• {feeling.capitalize()}: {score}/10")
+        profiling.checkpoint("history.render")
+        
+        # Page navigation
+        nav_prev, nav_next = st.columns(2)
+        with nav_prev:
+            if st.button("← Newer", disabled=not has_newer):
+                if offset is not None:
+                    st.session_state.history_offset = max(offset - page_size, 0)
+                else:
+                    first = page_entries[0]
+                    st.session_state.history_cursor = ("after", (first["timestamp"], first["id"]))
+                st.rerun()
+        with nav_next:
+            if st.button("Older →", disabled=not has_older):
+                if offset is not None:
+                    st.session_state.history_offset = offset + page_size
+                else:
+                    last = page_entries[-1]
+                    st.session_state.history_cursor = ("before", (last["timestamp"], last["id"]))
+                st.rerun()
 
 elif page == "💾 Export":
     st.header("Export Your Data")
     
-    if not data:
+    if not entry_count:
         st.info("No data to export yet.")
     else:
+        data = cached_columns(store)
+        # Archived entries are only read when they are asked for
+        archived = entry_count - len(data)
+        include_archived = archived > 0 and st.checkbox(f"Include {archived} archived entries")
+        if include_archived:
+            data = EntryStore.from_entries(list(store.iter_all()))
         st.write(f"Export {len(data)} entries to analyze elsewhere or keep as backup.")
         
         col1, col2 = st.columns(2)
         
         with col1:
-            # CSV Export
-            if st.button("📊 Download CSV", type="primary"):
-                # Prepare CSV data
-                csv_data = []
-                for entry in data:
-                    row = {
-                        "id": entry.get("id"),
-                        "timestamp": entry.get("timestamp"),
-                        "trigger": entry.get("trigger"),
-                        "before": entry.get("before"),
-                        "after": entry.get("after"),
-                        "intensity": entry.get("intensity"),
-                        "notes": entry.get("notes", ""),
-                        "anxiety": entry["feelings"].get("anxiety", 0),
-                        "sadness": entry["feelings"].get("sadness", 0),
-                        "anger": entry["feelings"].get("anger", 0),
-                        "shame": entry["feelings"].get("shame", 0),
-                        "relief": entry["feelings"].get("relief", 0),
-                    }
-                    csv_data.append(row)
-                
-                df = pd.DataFrame(csv_data)
-                csv = df.to_csv(index=False)
-                
-                st.download_button(
-                    label="💾 Download CSV File",
-                    data=csv,
-                    file_name=f"triggers_export_{datetime.now().strftime('%Y%m%d_%H%M%S')}.csv",
-                    mime="text/csv"
-                )
+            # CSV Export of the entries as stored, built only when the
+            # button is clicked and never written to reports/
+            compress = st.checkbox("Compress (gzip)")
+            st.download_button(
+                label="📊 Download CSV",
+                data=lambda: csv_bytes(store.iter_all() if include_archived else store.snapshot()[0],
+                                       compress=compress),
+                file_name=export_filename(compress=compress),
+                mime="application/gzip" if compress else "text/csv",
+                key="csv_download",
+                type="primary"
+            )
         
         with col2:
             # JSON Export
             if st.button("📋 Download JSON", type="secondary"):
-                json_str = json.dumps(data, indent=2, ensure_ascii=False)
+                # The backup holds the entries exactly as stored, not as columns
+                backup = list(store.iter_all()) if include_archived else store.snapshot()[0]
+                json_str = json.dumps(backup, indent=2, ensure_ascii=False)
                 
                 st.download_button(
                     label="💾 Download JSON File",
@@ -402,6 +540,23 @@ elif page == "💾 Export":
                     mime="application/json"
                 )
         
+        # Columnar archives for offline analysis
+        st.subheader("Columnar Archive")
+        st.caption("Parquet partitioned by month, or a single memory-mappable Arrow file. Needs pyarrow.")
+        col3, col4 = st.columns(2)
+        stamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+        try:
+            with col3:
+                if st.button("🗂️ Write Parquet archive"):
+                    out = export_parquet(data, os.path.join(REPORTS_DIR, f"triggers_parquet_{stamp}"))
+                    st.success(f"Parquet dataset written to `{out}`")
+            with col4:
+                if st.button("🏹 Write Arrow file"):
+                    out = export_arrow(data, os.path.join(REPORTS_DIR, f"triggers_{stamp}.arrow"))
+                    st.success(f"Arrow file written to `{out}`")
+        except RuntimeError as exc:
+            st.error(str(exc))
+        
         # Data preview
         st.subheader("Data Preview")
         if data:
@@ -414,7 +569,50 @@ elif page == "💾 Export":
                 })
             
             st.dataframe(pd.DataFrame(preview_data), use_container_width=True)
+        profiling.checkpoint("export")
+
+elif page == "🩺 Diagnostics":
+    st.header("Diagnostics")
+    
+    if not profiling.enabled():
+        st.info(f"Timing is off. Start the app with {profiling.PROFILE_ENV}=1 to record "
+                "where each rerun spends its time.")
+    else:
+        runs = profiling.recent_runs()
+        if not runs:
+            st.info("No reruns recorded yet. Visit another page, then come back.")
+        else:
+            # One row per recent rerun, newest first
+            overview = pd.DataFrame([{
+                "Time": datetime.fromtimestamp(r.started).strftime("%H:%M:%S"),
+                "Page": r.label,
+                "Total (ms)": round(r.total * 1000, 1),
+                "Spans": len(r.records),
+            } for r in runs])
+            st.dataframe(overview, use_container_width=True)
+            
+            choice = st.selectbox("Breakdown of rerun:", range(len(runs)),
+                                  format_func=lambda i: f"{overview['Time'][i]} · {runs[i].label} · "
+                                                        f"{overview['Total (ms)'][i]} ms")
+            breakdown = pd.DataFrame(runs[choice].breakdown(), columns=["Span", "Calls", "Total (ms)", "Self (ms)"])
+            breakdown[["Total (ms)", "Self (ms)"]] = (breakdown[["Total (ms)", "Self (ms)"]] * 1000).round(2)
+            
+            fig = px.bar(breakdown.head(15), x="Self (ms)", y="Span", orientation="h",
+                         title="Where the time went (self time, excluding nested spans)")
+            fig.update_layout(height=450, yaxis={"categoryorder": "total ascending"})
+            st.plotly_chart(fig, use_container_width=True)
+            st.dataframe(breakdown, use_container_width=True)
+    
+    # Shared load cache: one slot per profile that was opened recently
+    st.subheader("Load Cache")
+    usage = cache.stats()
+    col1, col2, col3 = st.columns(3)
+    col1.metric("Cached profiles", usage["stores"])
+    col2.metric("Memory", f"{usage['bytes'] / 2**20:.1f} MB",
+                help=f"Limit {usage['limit'] / 2**20:.0f} MB ({cache.CACHE_LIMIT_ENV})")
+    col3.metric("Idle eviction", f"{usage['idle_seconds'] / 60:.0f} min", help=cache.CACHE_IDLE_ENV)
 
 # Footer
 st.markdown("---")
-st.markdown("*Remember: This tool is for personal insight. For professional support, consider speaking with a mental health professional.*")
\ No newline at end of file
+st.markdown("*Remember: This tool is for personal insight. For professional support, consider speaking with a mental health professional.*")
+profiling.finish_run()
\ No newline at end of file
@@ -0,0 +1,62 @@
+#!/usr/bin/env python3
+"""
+Check: importing the CLI stays within its start-up budget.
+
+Runs `python -X importtime -c "import main"` a few times and fails if the
+best run exceeds the budget or pulls in a heavy dependency.
+
+Run: python benchmarks/check_import_time.py [--budget-ms 50]
+"""
+
+import argparse
+import os
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Only the commands that need these may import them.
+HEAVY = ("numpy", "pandas", "pyarrow", "streamlit", "matplotlib", "plotly")
+
+
+def measure():
+    """Return (cumulative microseconds for main, top-level modules imported)."""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import main"],
+        cwd=ROOT, capture_output=True, text=True, check=True,
+    )
+    total, modules = None, set()
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        if not cumulative.strip().isdigit():
+            continue
+        modules.add(name.strip().split(".")[0])
+        if name.strip() == "main":
+            total = int(cumulative)
+    return total, modules
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--budget-ms", type=float, default=50)
+    parser.add_argument("--runs", type=int, default=5)
+    args = parser.parse_args()
+
+    runs = [measure() for _ in range(args.runs)]
+    best = min(t for t, _ in runs) / 1000
+    heavy = sorted(set(HEAVY) & set().union(*(m for _, m in runs)))
+    print(f"import main: {best:.1f} ms (budget {args.budget_ms:.0f} ms)")
+    if heavy:
+        print(f"FAIL: imports {', '.join(heavy)} at start-up")
+        return 1
+    if best > args.budget_ms:
+        print("FAIL: over budget")
+        return 1
+    print("ok")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
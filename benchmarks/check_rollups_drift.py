@@ -0,0 +1,101 @@
+#!/usr/bin/env python3
+"""
+Check: rollups stay in sync with the store they summarise.
+
+Logs entries into every backend, backfills an older month, rebuilds the
+rollups as `summary --rebuild` does and fails if a later current_rollups
+call still finds them drifted and rebuilds again.
+
+Run: python benchmarks/check_rollups_drift.py
+"""
+
+import os
+import shutil
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils import rollups  # noqa: E402
+from utils.helpers import FEELINGS  # noqa: E402
+from utils.storage import BinaryStorage, JsonStorage, PartitionedStorage, SqliteStorage  # noqa: E402
+
+BACKENDS = {
+    "json": (JsonStorage, "triggers.json"),
+    "binary": (BinaryStorage, "triggers.ttb"),
+    "sqlite": (SqliteStorage, "triggers.db"),
+    "partitioned": (PartitionedStorage, "partitions"),
+}
+
+
+def make_entry(entry_id, timestamp):
+    return {
+        "id": entry_id,
+        "timestamp": timestamp,
+        "trigger": f"check {entry_id % 3}",
+        "before": "",
+        "after": "",
+        "feelings": {k: entry_id % 11 for k in FEELINGS},
+        "intensity": entry_id % 10 + 1,
+        "notes": "",
+    }
+
+
+def rebuilds(store, calls=3):
+    """Return how many of `calls` current_rollups calls rebuilt the rollups."""
+    count = 0
+    original = rollups._rebuild
+
+    def counting(*args, **kwargs):
+        nonlocal count
+        count += 1
+        return original(*args, **kwargs)
+
+    rollups._rebuild = counting
+    try:
+        for _ in range(calls):
+            rollups._loaded.clear()
+            rollups.current_rollups(store)
+    finally:
+        rollups._rebuild = original
+    return count
+
+
+def check(backend, workdir):
+    os.makedirs(workdir)
+    kind, name = BACKENDS[backend]
+    store = kind(os.path.join(workdir, name))
+    store.extend([make_entry(i, f"2024-03-{i:02d} 12:00:00") for i in range(1, 11)])
+    failures = []
+    if rebuilds(store):
+        failures.append("rebuilt after appends")
+    # Backfill an older month: the last entry appended is no longer the
+    # last one iter_all yields.
+    store.extend([make_entry(100 + i, f"2024-01-{i:02d} 08:00:00") for i in range(1, 6)])
+    if rebuilds(store):
+        failures.append("rebuilt after a backfill")
+    rollups.rebuild_rollups(store, workers=1)
+    if rebuilds(store):
+        failures.append("rebuilt after summary --rebuild")
+    return failures
+
+
+def main():
+    workdir = tempfile.mkdtemp(prefix="tt-rollups-")
+    failed = False
+    try:
+        for backend in BACKENDS:
+            failures = check(backend, os.path.join(workdir, backend))
+            print(f"{backend}: {'; '.join(failures) or 'ok'}")
+            failed = failed or bool(failures)
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+    if failed:
+        print("FAIL")
+        return 1
+    print("ok")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
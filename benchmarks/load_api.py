@@ -0,0 +1,159 @@
+#!/usr/bin/env python3
+"""
+Load test for the Trigger Tracker HTTP API.
+
+Starts the API on a temporary store in a separate process, then keeps
+several keep-alive connections posting entries for a fixed time and
+reports the sustained entries per second and request latency percentiles.
+Finally checks that every acknowledged entry was stored exactly once.
+
+Run: python benchmarks/load_api.py [--backend json|sqlite|binary] [--connections 32] [--batch 1]
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import socket
+import sys
+import tempfile
+import time
+from multiprocessing import Process
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils import api, helpers  # noqa: E402
+from utils.storage import open_storage  # noqa: E402
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind((api.HOST, 0))
+        return s.getsockname()[1]
+
+
+def server_process(path, port):
+    api.serve(open_storage(path), port)
+
+
+def make_entry(n):
+    return {
+        "trigger": f"load {n % 50}",
+        "feelings": {k: n % 11 for k in helpers.FEELINGS},
+        "intensity": n % 10 + 1,
+        "notes": "posted by load_api",
+    }
+
+
+async def request(reader, writer, method, target, payload=None):
+    body = json.dumps(payload).encode("utf-8") if payload is not None else b""
+    writer.write(
+        f"{method} {target} HTTP/1.1\r\nHost: {api.HOST}\r\n"
+        f"Content-Type: application/json\r\nContent-Length: {len(body)}\r\n\r\n".encode("latin-1") + body
+    )
+    await writer.drain()
+    status = int((await reader.readline()).split()[1])
+    length = 0
+    while True:
+        line = await reader.readline()
+        if line in (b"\r\n", b""):
+            break
+        name, _, value = line.decode("latin-1").partition(":")
+        if name.lower() == "content-length":
+            length = int(value)
+    return status, json.loads(await reader.readexactly(length))
+
+
+async def client(port, batch, deadline, counter, latencies, ids, failures):
+    reader, writer = await asyncio.open_connection(api.HOST, port)
+    try:
+        while time.perf_counter() < deadline:
+            entries = [make_entry(next(counter)) for _ in range(batch)]
+            started = time.perf_counter()
+            if batch == 1:
+                status, reply = await request(reader, writer, "POST", "/entries", entries[0])
+            else:
+                status, reply = await request(reader, writer, "POST", "/entries/batch", entries)
+            latencies.append(time.perf_counter() - started)
+            if status != 201:
+                failures.append(reply)
+                continue
+            ids.extend(reply["ids"] if batch > 1 else [reply["id"]])
+    finally:
+        writer.close()
+
+
+async def wait_for_server(port, timeout=10):
+    deadline = time.perf_counter() + timeout
+    while True:
+        try:
+            _, writer = await asyncio.open_connection(api.HOST, port)
+            writer.close()
+            return
+        except OSError:
+            if time.perf_counter() > deadline:
+                raise
+            await asyncio.sleep(0.05)
+
+
+async def run_load(port, connections, batch, seconds):
+    await wait_for_server(port)
+    counter, latencies, ids, failures = iter(range(10**12)), [], [], []
+    deadline = time.perf_counter() + seconds
+    started = time.perf_counter()
+    await asyncio.gather(*(
+        client(port, batch, deadline, counter, latencies, ids, failures) for _ in range(connections)
+    ))
+    elapsed = time.perf_counter() - started
+    reader, writer = await asyncio.open_connection(api.HOST, port)
+    _, summary = await request(reader, writer, "GET", "/summary")
+    _, recent = await request(reader, writer, "GET", "/entries/recent?n=5")
+    writer.close()
+    return elapsed, latencies, ids, failures, summary, recent
+
+
+def percentile(values, q):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(q * len(values)))] if values else 0.0
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--backend", choices=("json", "sqlite", "binary"), default="json")
+    parser.add_argument("--connections", type=int, default=32)
+    parser.add_argument("--batch", type=int, default=1, help="entries per request (1 posts to /entries)")
+    parser.add_argument("--seconds", type=float, default=10)
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="tt-api-")
+    names = {"sqlite": "triggers.db", "binary": "triggers.ttb"}
+    path = os.path.join(workdir, names.get(args.backend, "triggers.json"))
+    port = free_port()
+    server = Process(target=server_process, args=(path, port), daemon=True)
+    server.start()
+    try:
+        elapsed, latencies, ids, failures, summary, recent = asyncio.run(
+            run_load(port, args.connections, args.batch, args.seconds)
+        )
+    finally:
+        server.terminate()
+        server.join()
+
+    stored = [e["id"] for e in open_storage(path).iter_all()]
+    lost = len(set(ids) - set(stored))
+    duplicated = len(stored) - len(set(stored))
+    print(f"backend={args.backend} connections={args.connections} batch={args.batch} elapsed={elapsed:.1f}s")
+    print(f"requests={len(latencies)} entries={len(ids)} rate={len(ids) / elapsed:.0f} entries/s "
+          f"({len(latencies) / elapsed:.0f} requests/s)")
+    print(f"latency p50={percentile(latencies, 0.5) * 1000:.1f}ms "
+          f"p99={percentile(latencies, 0.99) * 1000:.1f}ms max={max(latencies, default=0) * 1000:.1f}ms")
+    print(f"summary count={summary['count']} recent={len(recent)} "
+          f"stored={len(stored)} lost={lost} duplicated={duplicated} refused={len(failures)}")
+    if lost or duplicated or failures or summary["count"] != len(stored):
+        print("FAILED")
+        sys.exit(1)
+    print("OK")
+
+
+if __name__ == "__main__":
+    main()
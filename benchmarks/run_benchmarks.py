@@ -0,0 +1,224 @@
+#!/usr/bin/env python3
+"""
+Benchmark suite for the hot paths: load (JSON and binary), append, summary,
+search, history and export.
+
+Each benchmark runs against a synthetic history (see synth.py) in a
+temporary data directory and reports its best wall time and, from a
+separate run under tracemalloc, its peak Python memory. Results are saved
+as JSON; with --baseline the run is compared against an earlier file and
+the script exits non-zero when a benchmark got slower than the tolerance.
+
+Run: python benchmarks/run_benchmarks.py [--sizes 1000 100000] [--out results.json]
+         [--baseline old.json] [--only search]
+"""
+
+import argparse
+import json
+import os
+import platform
+import shutil
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from synth import make_entries, write_history  # noqa: E402
+from utils import binary, cache, helpers  # noqa: E402
+from utils.columnar import EntryStore  # noqa: E402
+from utils.export import export_csv  # noqa: E402
+from utils.mapreduce import build_rollups  # noqa: E402
+from utils.rollups import current_rollups, rollups_path  # noqa: E402
+from utils.search import SearchIndex  # noqa: E402
+from utils.storage import BinaryStorage, JsonStorage, SqliteStorage  # noqa: E402
+
+QUERIES = ["work", "deadline", "email meeting", "notes:tea", "tra*", "late train", "sister walk"]
+
+
+class Suite:
+    """Benchmarks sharing one synthetic history of n entries."""
+
+    def __init__(self, n, seed, workdir):
+        self.n = n
+        self.dir = workdir
+        self.path = write_history(os.path.join(workdir, "triggers.json"), n, seed)
+        self.entries = helpers.load_entries(self.path)
+        self.columns = EntryStore.from_entries(self.entries)
+        self.binary_path = os.path.join(workdir, "triggers.ttb")
+        binary.write_file(self.binary_path, self.entries)
+        self.extra = make_entries(1000, seed=seed + 1)
+        self.sqlite = SqliteStorage(os.path.join(workdir, "triggers.db"))
+        self.sqlite.extend(self.entries)
+        self.index = SearchIndex()
+        self.index.sync(self.columns)
+        self.recent_start = self.entries[-1]["timestamp"][:10] + " 00:00:00"
+
+    # Load / write
+    def load_json(self):
+        helpers.load_entries(self.path)
+
+    def write_json(self):
+        helpers.write_json(os.path.join(self.dir, "copy.json"), self.entries)
+
+    def load_columns(self):
+        EntryStore.from_entries(helpers.load_entries(self.path))
+
+    def load_binary(self):
+        binary.read_entries(self.binary_path)
+
+    def load_binary_columns(self):
+        binary.read_columns(self.binary_path)
+
+    # Append
+    def append_single(self):
+        store = JsonStorage(self.path)
+        for e in self.extra[:100]:
+            store.append(e)
+
+    def append_batch(self):
+        JsonStorage(self.path).extend(self.extra)
+
+    def append_sqlite(self):
+        self.sqlite.extend(self.extra)
+
+    # Summary
+    def summary_rollups_rebuild(self):
+        if os.path.exists(rollups_path(self.path)):
+            os.remove(rollups_path(self.path))
+        current_rollups(JsonStorage(self.path))
+
+    def summary_rollups_serial(self):
+        build_rollups(BinaryStorage(self.binary_path), workers=1)
+
+    def summary_rollups_parallel(self):
+        # Workers read their own blocks; TRIGGER_TRACKER_WORKERS sets how many.
+        build_rollups(BinaryStorage(self.binary_path))
+
+    # Search
+    def search_build(self):
+        SearchIndex().sync(self.columns)
+
+    def search_query(self):
+        for q in QUERIES:
+            self.index.search(q, prefix=True)
+            self.index.search(q, rank="recency", limit=25)
+
+    # History
+    def history_pages_json(self):
+        cache.clear()
+        store = JsonStorage(self.path)
+        page = store.page(25)
+        for _ in range(20):
+            page = store.page(25, before=(page[-1]["timestamp"], page[-1]["id"]))
+
+    def history_pages_sqlite(self):
+        page = self.sqlite.page(25)
+        for _ in range(20):
+            page = self.sqlite.page(25, before=(page[-1]["timestamp"], page[-1]["id"]))
+
+    def history_recent(self):
+        cache.clear()
+        JsonStorage(self.path).recent(10)
+
+    def history_range(self):
+        JsonStorage(self.path).range(start=self.recent_start)
+
+    # Export
+    def export_csv(self):
+        export_csv(self.entries, os.path.join(self.dir, "export.csv"))
+
+    def export_csv_gzip(self):
+        export_csv(self.columns, os.path.join(self.dir, "export.csv.gz"), compress=True)
+
+
+BENCHMARKS = [name for name in vars(Suite) if not name.startswith("_")]
+
+
+def measure(fn, repeat):
+    best = min(_timed(fn) for _ in range(repeat))
+    tracemalloc.start()
+    try:
+        fn()
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+    return {"seconds": round(best, 6), "peak_mb": round(peak / 2**20, 3)}
+
+
+def _timed(fn):
+    started = time.perf_counter()
+    fn()
+    return time.perf_counter() - started
+
+
+def compare(results, baseline, tolerance):
+    """Print time ratios against baseline; return the regressed benchmarks."""
+    regressed = []
+    for size, benches in results["sizes"].items():
+        old = baseline.get("sizes", {}).get(size, {})
+        for name, r in benches.items():
+            if name not in old or not old[name]["seconds"]:
+                continue
+            ratio = r["seconds"] / old[name]["seconds"]
+            flag = ""
+            if ratio > 1 + tolerance:
+                flag = "  REGRESSION"
+                regressed.append(f"{size}/{name}")
+            print(f"{size:>9} {name:<24} {old[name]['seconds']:>9.4f}s -> {r['seconds']:>9.4f}s {ratio:>6.2f}x{flag}")
+    return regressed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 100_000])
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--repeat", type=int, default=3, help="timed runs per benchmark (best is kept)")
+    parser.add_argument("--only", nargs="+", help="benchmark names or prefixes to run")
+    parser.add_argument("--out", default="bench_results.json")
+    parser.add_argument("--baseline", help="earlier results file to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="allowed slowdown, 0.25 = 25%%")
+    args = parser.parse_args()
+
+    names = [b for b in BENCHMARKS if not args.only or any(b.startswith(o) for o in args.only)]
+    results = {
+        "meta": {
+            "date": datetime.now().isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpus": os.cpu_count(),
+            "seed": args.seed,
+            "repeat": args.repeat,
+        },
+        "sizes": {},
+    }
+    for n in args.sizes:
+        workdir = tempfile.mkdtemp(prefix="tt-bench-")
+        try:
+            suite = Suite(n, args.seed, workdir)
+            sized = results["sizes"][str(n)] = {}
+            for name in names:
+                sized[name] = measure(getattr(suite, name), args.repeat)
+                print(f"{n:>9} {name:<24} {sized[name]['seconds']:>9.4f}s {sized[name]['peak_mb']:>9.1f} MB")
+        finally:
+            cache.clear()
+            shutil.rmtree(workdir, ignore_errors=True)
+
+    with open(args.out, "w", encoding="utf-8") as f:
+        json.dump(results, f, indent=2)
+    print(f"Results written to {args.out}")
+
+    if args.baseline:
+        with open(args.baseline, "r", encoding="utf-8") as f:
+            baseline = json.load(f)
+        regressed = compare(results, baseline, args.tolerance)
+        if regressed:
+            print(f"{len(regressed)} benchmark(s) slower than the baseline: {', '.join(regressed)}")
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
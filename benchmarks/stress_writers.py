@@ -0,0 +1,101 @@
+#!/usr/bin/env python3
+"""
+Concurrent writer stress check for Trigger Tracker storage.
+
+Spawns several processes, each running several threads that save entries
+through the same store while journal compaction runs, then verifies that
+every entry was kept exactly once.
+
+Run: python benchmarks/stress_writers.py [--backend json|sqlite|partitioned|binary]
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import threading
+import time
+from multiprocessing import Process
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils import helpers  # noqa: E402
+from utils.storage import open_storage  # noqa: E402
+
+
+def make_entry(worker, thread, n):
+    return {
+        "id": worker * 10**9 + thread * 10**6 + n,
+        "timestamp": helpers.now_iso(),
+        "trigger": f"stress {worker}-{thread}",
+        "before": "",
+        "after": "",
+        "feelings": {k: n % 11 for k in helpers.FEELINGS},
+        "intensity": n % 10 + 1,
+        "notes": "",
+    }
+
+
+def writer_process(path, worker, threads, per_thread):
+    # Small journals force many compactions to race with the appends.
+    helpers.COMPACT_THRESHOLD_BYTES = 16 * 1024
+    store = open_storage(path)
+
+    def run(thread):
+        for n in range(per_thread):
+            store.append(make_entry(worker, thread, n))
+
+    pool = [threading.Thread(target=run, args=(t,)) for t in range(threads)]
+    for t in pool:
+        t.start()
+    for t in pool:
+        t.join()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--backend", choices=("json", "sqlite", "partitioned", "binary"), default="json")
+    parser.add_argument("--processes", type=int, default=4)
+    parser.add_argument("--threads", type=int, default=8)
+    parser.add_argument("--entries", type=int, default=200, help="entries per thread")
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="tt-stress-")
+    names = {"sqlite": "triggers.db", "partitioned": "triggers", "binary": "triggers.ttb"}
+    path = os.path.join(workdir, names.get(args.backend, "triggers.json"))
+    if args.backend == "partitioned":
+        os.makedirs(path)
+
+    started = time.perf_counter()
+    procs = [
+        Process(target=writer_process, args=(path, w, args.threads, args.entries))
+        for w in range(args.processes)
+    ]
+    for p in procs:
+        p.start()
+    for p in procs:
+        p.join()
+    elapsed = time.perf_counter() - started
+
+    if args.backend == "json":
+        helpers.compact_journal(path)
+    expected = args.processes * args.threads * args.entries
+    store = open_storage(path)
+    ids = [e["id"] for e in store.iter_all()]
+    if args.backend == "partitioned" and store.manifest()["count"] != len(ids):
+        print(f"manifest count {store.manifest()['count']} != {len(ids)} stored")
+        sys.exit(1)
+    lost = expected - len(set(ids))
+    duplicated = len(ids) - len(set(ids))
+
+    print(f"backend={args.backend} writers={args.processes}x{args.threads} "
+          f"entries={expected} elapsed={elapsed:.2f}s rate={expected / elapsed:.0f}/s")
+    print(f"stored={len(ids)} lost={lost} duplicated={duplicated}")
+    if any(p.exitcode for p in procs) or lost or duplicated:
+        print("FAILED")
+        sys.exit(1)
+    print("OK")
+
+
+if __name__ == "__main__":
+    main()
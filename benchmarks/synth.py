@@ -0,0 +1,155 @@
+#!/usr/bin/env python3
+"""
+Deterministic synthetic trigger histories for benchmarks.
+
+Entries arrive in time order with more of them in the evening and on
+weekdays. Triggers follow a long-tailed (Zipf-like) vocabulary, feelings
+depend on the trigger, and free-text lengths are log-normal. The same
+seed always gives the same entries, from 1k up to 10M of them, generated
+lazily.
+
+Run: python benchmarks/synth.py 100000 --out history.json [--seed 0]
+"""
+
+import argparse
+import json
+import os
+import random
+import sys
+from bisect import bisect_left
+from datetime import datetime, timedelta
+from itertools import islice
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.helpers import FEELINGS  # noqa: E402
+
+TRIGGERS = [
+    "work email", "deadline", "meeting", "family call", "traffic", "social media",
+    "news", "crowds", "phone call", "argument", "bills", "boss feedback",
+    "lack of sleep", "loud noise", "being late", "group chat", "doctor visit",
+    "commute", "presentation", "messy house", "cancelled plans", "money worries",
+    "exam", "partner comment", "neighbour", "waiting in line", "online shopping",
+    "unexpected visitor", "performance review", "school run", "holiday planning",
+    "health scare", "car trouble", "landlord", "job search", "gym", "party",
+    "rainy weather", "old photos", "anniversary",
+]
+
+WORDS = (
+    "i was at work when the email came in and my chest felt tight so i "
+    "closed the laptop went for a walk called my sister tried breathing "
+    "slowly but kept thinking about what they said in the meeting earlier "
+    "felt better after tea and music then worried again before bed because "
+    "tomorrow there is another deadline and the train was late again today"
+).split()
+
+# Relative number of entries per hour of day and per weekday (Mon..Sun).
+HOUR_WEIGHTS = [1, 1, 1, 1, 1, 2, 4, 7, 9, 8, 7, 7, 8, 7, 7, 8, 9, 10, 11, 11, 10, 8, 5, 2]
+WEEKDAY_WEIGHTS = [1.2, 1.1, 1.1, 1.1, 1.0, 0.7, 0.7]
+
+
+def _text(rng, mu, sigma, empty=0.0):
+    if rng.random() < empty:
+        return ""
+    n = max(1, min(80, int(rng.lognormvariate(mu, sigma))))
+    return " ".join(rng.choice(WORDS) for _ in range(n))
+
+
+def generate(n, seed=0, start=datetime(2020, 1, 1), days=5 * 365):
+    """Yield n entries, oldest first, spread over about `days` days."""
+    rng = random.Random(seed)
+    vocab = TRIGGERS + [f"{t} {w}" for t in TRIGGERS for w in ("again", "today", "at night")]
+    weights = [1 / (rank + 1) ** 1.1 for rank in range(len(vocab))]
+    cum = []
+    total = 0.0
+    for w in weights:
+        total += w
+        cum.append(total)
+    profiles = {t: [rng.uniform(0, 8) for _ in FEELINGS] for t in vocab}
+
+    # Thinned Poisson process: candidate arrivals at the peak rate are kept
+    # with probability proportional to the hour and weekday weights.
+    peak = max(HOUR_WEIGHTS) * max(WEEKDAY_WEIGHTS)
+    mean_weight = sum(HOUR_WEIGHTS) / 24 * sum(WEEKDAY_WEIGHTS) / 7
+    gap = days * 86400 / max(n, 1) * mean_weight / peak
+    t = 0.0
+    day_cache = {}
+    produced = 0
+    while produced < n:
+        t += rng.expovariate(1 / gap)
+        day, second = divmod(int(t), 86400)
+        date = day_cache.get(day)
+        if date is None:
+            d = start + timedelta(days=day)
+            date = day_cache[day] = (d.strftime("%Y-%m-%d"), WEEKDAY_WEIGHTS[d.weekday()])
+            if len(day_cache) > 2:
+                day_cache.pop(min(day_cache))
+        hour = second // 3600
+        if rng.random() * peak > HOUR_WEIGHTS[hour] * date[1]:
+            continue
+        trigger = vocab[min(bisect_left(cum, rng.random() * total), len(vocab) - 1)]
+        feelings = {
+            k: max(0, min(10, round(rng.gauss(mean, 2))))
+            for k, mean in zip(FEELINGS, profiles[trigger])
+        }
+        peak_feeling = max(feelings.values())
+        yield {
+            "id": 1_600_000_000_000 + produced,
+            "timestamp": f"{date[0]} {hour:02d}:{second // 60 % 60:02d}:{second % 60:02d}",
+            "trigger": trigger,
+            "before": _text(rng, 1.8, 0.7, empty=0.2),
+            "after": _text(rng, 1.8, 0.7, empty=0.2),
+            "feelings": feelings,
+            "intensity": max(1, min(10, round(rng.gauss(peak_feeling, 1.5)))),
+            "notes": _text(rng, 2.3, 0.8, empty=0.4),
+        }
+        produced += 1
+
+
+def make_entries(n, seed=0):
+    """Return generate(n, seed) as a list."""
+    return list(generate(n, seed))
+
+
+def write_history(path, n, seed=0, chunk=10_000):
+    """Write n synthetic entries to path without holding them all in memory.
+
+    .json writes a snapshot list, .jsonl one entry per line and .csv the
+    export format.
+    """
+    entries = generate(n, seed)
+    if path.endswith(".csv"):
+        from utils.export import export_csv
+
+        export_csv(entries, path)
+        return path
+    with open(path, "w", encoding="utf-8") as f:
+        if path.endswith(".jsonl"):
+            for e in entries:
+                f.write(json.dumps(e, ensure_ascii=False) + "\n")
+            return path
+        f.write("[")
+        first = True
+        while True:
+            block = list(islice(entries, chunk))
+            if not block:
+                break
+            text = ",\n".join(json.dumps(e, ensure_ascii=False) for e in block)
+            f.write(text if first else ",\n" + text)
+            first = False
+        f.write("]")
+    return path
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("n", type=int)
+    parser.add_argument("--out", required=True, help=".json, .jsonl or .csv")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    write_history(args.out, args.n, args.seed)
+    print(f"Wrote {args.n} entries to {args.out}")
+
+
+if __name__ == "__main__":
+    main()
@@ -6,26 +6,37 @@ Log detailed trigger entries and analyze patterns.
 Run: python main.py
 """
 
+import argparse
 import json
 import os
 import sys
 from datetime import datetime
-from utils.helpers import now_iso, read_json, write_json, prompt_int
-from utils.stats import (
-    average_emotion_scores,
-    count_triggers,
-    triggers_per_hour,
-    triggers_per_day,
+from utils.helpers import FEELINGS, INTENSITY_MAX, INTENSITY_MIN, now_iso, normalize_entry, prompt_int, journal_path
+from utils.rollups import current_rollups, rebuild_rollups
+from utils import profiling
+from utils.profiles import profile_dir
+from utils.storage import (
+    DATA_DIR,
+    apply_retention,
+    backend_path,
+    migrate_json_to_binary,
+    migrate_json_to_partitioned,
+    migrate_json_to_sqlite,
+    open_storage,
 )
-from utils.export import export_csv
 
-DATA_DIR = "data"
-DATA_FILE = os.path.join(DATA_DIR, "triggers.json")
+# numpy, pandas and pyarrow are imported by the commands that need them, so
+# quick commands like `log` and `recent` start fast.
+
 REPORTS_DIR = "reports"
 
+# Replaced by main() when --user selects another profile.
+data_dir = DATA_DIR
+store = open_storage()
+
 
 def ensure_dirs():
-    os.makedirs(DATA_DIR, exist_ok=True)
+    os.makedirs(data_dir, exist_ok=True)
     os.makedirs(REPORTS_DIR, exist_ok=True)
 
 
@@ -46,12 +57,14 @@ def prompt_entry():
     shame = prompt_int("   Shame (0-10): ", 0, 10)
     relief = prompt_int("   Relief (0-10): ", 0, 10)
 
-    intensity = prompt_int("\n5) Overall intensity (1-10): ", 1, 10)
+    intensity = prompt_int(
+        f"\n5) Overall intensity ({INTENSITY_MIN}-{INTENSITY_MAX}): ", INTENSITY_MIN, INTENSITY_MAX
+    )
 
     notes = input("\n6) Additional notes (optional): ").strip()
 
     entry = {
-        "id": int(datetime.utcnow().timestamp() * 1000),
+        "id": new_id(),
         "timestamp": now_iso(),
         "trigger": trigger,
         "before": before,
@@ -88,56 +101,182 @@ def prompt_entry():
 
 
 def add_entry(entry):
-    data = read_json(DATA_FILE)
-    data.append(entry)
-    write_json(DATA_FILE, data)
+    store.append(entry)
     print("Entry saved.")
 
 
-def show_recent(n=10):
-    data = read_json(DATA_FILE)
-    if not data:
+def new_id():
+    return int(datetime.utcnow().timestamp() * 1000)
+
+
+def log_batch(lines, batch_size=1000):
+    """Append one entry per JSON line; returns (saved, invalid)."""
+    saved, invalid, batch = 0, 0, []
+    next_id = new_id()
+    for n, line in enumerate(lines, 1):
+        if not line.strip():
+            continue
+        try:
+            entry = normalize_entry(json.loads(line))
+        except (ValueError, AttributeError) as exc:
+            print(f"line {n}: {exc}", file=sys.stderr)
+            invalid += 1
+            continue
+        if entry["id"] is None:
+            entry["id"], next_id = next_id, next_id + 1
+        batch.append(entry)
+        if len(batch) >= batch_size:
+            store.extend(batch)
+            saved, batch = saved + len(batch), []
+    if batch:
+        store.extend(batch)
+        saved += len(batch)
+    return saved, invalid
+
+
+def show_recent(n=10, as_json=False):
+    recent = store.recent(n)
+    if as_json:
+        print(json.dumps(recent, ensure_ascii=False, indent=2))
+        return
+    if not recent:
         print("No entries found.")
         return
-    print(f"\n--- Most recent {min(n, len(data))} entries ---")
-    for e in sorted(data, key=lambda x: x["timestamp"], reverse=True)[:n]:
+    print(f"\n--- Most recent {len(recent)} entries ---")
+    for e in recent:
         ts = e["timestamp"]
         trig = e["trigger"]
         inten = e.get("intensity", "")
         print(f"{ts} | {trig} | intensity: {inten}")
 
 
-def summary():
-    data = read_json(DATA_FILE)
-    if not data:
+def summary(as_json=False, rebuild=False, workers=None):
+    rollups = rebuild_rollups(store, workers) if rebuild else current_rollups(store)
+    if as_json:
+        print(json.dumps(rollups.summary(), ensure_ascii=False, indent=2))
+        return
+    if not rollups.count:
         print("No data available for summary.")
         return
     print("\n--- Summary ---")
-    counts = count_triggers(data)
-    print(f"Total entries: {len(data)}")
+    print(f"Total entries: {rollups.count}")
     print("\nTop triggers (by count):")
-    for trig, cnt in counts.most_common(10):
+    for trig, cnt in rollups.triggers().most_common(10):
         print(f"  {trig} — {cnt}")
 
-    avg = average_emotion_scores(data)
     print("\nAverage feelings (0-10):")
-    for k, v in avg.items():
+    for k, v in rollups.averages().items():
         print(f"  {k.capitalize():7}: {v:.2f}")
 
-    per_day = triggers_per_day(data)
     print("\nEntries per day (most recent 10):")
-    for date, cnt in list(per_day.items())[-10:]:
+    for date, cnt in rollups.days()[-10:]:
         print(f"  {date}: {cnt}")
 
 
-def generate_reports():
-    data = read_json(DATA_FILE)
-    if not data:
+def search(query, n=20, rank="relevance"):
+    from utils.cache import cached_columns
+    from utils.columnar import EntryStore
+    from utils.search import SearchIndex, index_for
+
+    columns = cached_columns(store)
+    if len(columns) == store.tail_info()[0]:
+        # The same columns and saved index as the app.
+        index = index_for(store, columns)
+    else:
+        # Archived entries are not in the saved index, which covers the data
+        # file only; index everything once here without replacing it.
+        columns = EntryStore.from_entries(list(store.iter_all()))
+        index = SearchIndex()
+        index.sync(columns)
+    docs = index.search(query, rank=rank, limit=n)
+    if not docs:
+        print("No matching entries.")
+        return
+    print(f"\n--- {len(docs)} matching entries ({rank}) ---")
+    for d in docs:
+        e = columns[d]
+        print(f"{e['timestamp']} | {e['trigger']} | intensity: {e['intensity']}")
+
+
+def generate_reports(fmt="csv", compress=False):
+    from utils.export import export_arrow, export_csv, export_filename, export_parquet
+
+    try:
+        if fmt == "parquet":
+            path = os.path.join(REPORTS_DIR, f"triggers_parquet_{datetime.now().strftime('%Y%m%d_%H%M%S')}")
+            export_parquet(store.iter_all(), path)
+        elif fmt == "arrow":
+            path = os.path.join(REPORTS_DIR, f"triggers_{datetime.now().strftime('%Y%m%d_%H%M%S')}.arrow")
+            export_arrow(store.iter_all(), path)
+        else:
+            path = os.path.join(REPORTS_DIR, export_filename(compress=compress))
+            export_csv(store.iter_all(), path, compress=compress)
+    except ValueError:
         print("No entries to export.")
         return
-    csv_path = os.path.join(REPORTS_DIR, f"triggers_export_{datetime.now().strftime('%Y%m%d_%H%M%S')}.csv")
-    export_csv(data, csv_path)
-    print(f"CSV exported: {csv_path}")
+    except RuntimeError as exc:
+        print(exc)
+        return
+    print(f"{fmt.upper()} exported: {path}")
+
+
+def migrate(target="sqlite"):
+    source, dest = backend_path("json", data_dir), backend_path(target, data_dir)
+    if not (os.path.exists(source) or os.path.exists(journal_path(source))):
+        print(f"Nothing to migrate: {source} not found.")
+        return
+    if target == "partitioned":
+        moved = migrate_json_to_partitioned(source, dest)
+        print(f"Migrated {moved} entries into monthly partitions in {dest}.")
+    elif target == "binary":
+        moved = migrate_json_to_binary(source, dest)
+        print(f"Migrated {moved} entries into {dest}.")
+    else:
+        moved = migrate_json_to_sqlite(source, dest)
+        print(f"Migrated {moved} entries into {dest}.")
+    print(f"Set TRIGGER_TRACKER_BACKEND={target} to use them.")
+
+
+def convert_file(src, dst, codec=None):
+    from utils.binary import convert
+
+    if not os.path.exists(src) and not os.path.exists(journal_path(src)):
+        print(f"File not found: {src}")
+        return 1
+    moved = convert(src, dst, codec)
+    print(f"Wrote {moved} entries to {dst}.")
+    return 0
+
+
+def archive_old(days=None):
+    try:
+        moved = apply_retention(store, days)
+    except ValueError as exc:
+        print(f"Cannot archive: {exc}")
+        return 1
+    print(f"Archived {moved} entries; summaries still include them.")
+    return 0
+
+
+def serve_api(port):
+    from utils.api import serve
+
+    serve(store, port)
+
+
+def import_history(path, workers=None):
+    from utils.importer import import_file
+
+    if not os.path.exists(path):
+        print(f"File not found: {path}")
+        return
+    result = import_file(store, path, workers=workers)
+    print(
+        f"Read {result['read']} rows: {result['imported']} imported, "
+        f"{result['duplicates']} duplicates skipped, {result['invalid']} invalid."
+    )
+    for err in result["errors"]:
+        print(f"  invalid: {err}")
 
 
 def interactive_menu():
@@ -147,9 +286,10 @@ def interactive_menu():
         print("1) Log new trigger")
         print("2) Show recent entries")
         print("3) Summary statistics")
-        print("4) Export CSV report")
-        print("5) Exit")
-        choice = input("Select an option (1-5): ").strip()
+        print("4) Export report (CSV, Parquet or Arrow)")
+        print("5) Search entries")
+        print("6) Exit")
+        choice = input("Select an option (1-6): ").strip()
         if choice == "1":
             entry = prompt_entry()
             if entry:
@@ -159,13 +299,146 @@ def interactive_menu():
         elif choice == "3":
             summary()
         elif choice == "4":
-            generate_reports()
+            fmt = input("Format [csv/parquet/arrow] (csv): ").strip().lower() or "csv"
+            if fmt in ("csv", "parquet", "arrow"):
+                generate_reports(fmt)
+            else:
+                print("Unknown format.")
         elif choice == "5":
+            query = input("Search (e.g. work, notes:email, meet*): ").strip()
+            if query:
+                search(query)
+        elif choice == "6":
             print("Goodbye.")
             sys.exit(0)
         else:
-            print("Invalid selection. Enter a number from 1 to 5.")
+            print("Invalid selection. Enter a number from 1 to 6.")
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(
+        description="Log and analyze triggers. Without a command, starts the interactive menu."
+    )
+    parser.add_argument("--profile", action="store_true", help="print a timing breakdown to stderr")
+    parser.add_argument("--profile-dump", metavar="FILE", help="run under cProfile and save the stats to FILE")
+    parser.add_argument("--user", metavar="NAME", help="use the data of profile NAME under data/profiles/")
+    sub = parser.add_subparsers(dest="command")
+
+    log = sub.add_parser("log", help="log one entry")
+    log.add_argument("trigger")
+    log.add_argument("--before", default="")
+    log.add_argument("--after", default="")
+    for k in FEELINGS:
+        log.add_argument(f"--{k}", type=int, default=0, help="0-10")
+    log.add_argument("--intensity", type=int, required=True, help=f"{INTENSITY_MIN}-{INTENSITY_MAX}")
+    log.add_argument("--notes", default="")
+    log.add_argument("--timestamp", help="defaults to now (UTC)")
+
+    sub.add_parser("log-batch", help="log one JSON entry per line read from stdin")
+
+    recent = sub.add_parser("recent", help="show the most recent entries")
+    recent.add_argument("-n", type=int, default=10)
+    recent.add_argument("--json", action="store_true")
+
+    summ = sub.add_parser("summary", help="show summary statistics")
+    summ.add_argument("--json", action="store_true")
+    summ.add_argument("--rebuild", action="store_true", help="recompute the rollups from every entry first")
+    summ.add_argument("--workers", type=int, help="processes for --rebuild (default: $TRIGGER_TRACKER_WORKERS or CPUs)")
+
+    export = sub.add_parser("export", help="export a report to reports/")
+    export.add_argument("--format", choices=["csv", "parquet", "arrow"], default="csv")
+    export.add_argument("--gzip", action="store_true", help="compress CSV output")
+
+    search_cmd = sub.add_parser("search", help="search entries")
+    search_cmd.add_argument("query", nargs="+")
+    search_cmd.add_argument("-n", type=int, default=20)
+    search_cmd.add_argument("--rank", choices=["relevance", "recency"], default="relevance")
+
+    imp = sub.add_parser("import", help="import a CSV, JSON or JSON lines history")
+    imp.add_argument("path")
+    imp.add_argument("--workers", type=int)
+
+    mig = sub.add_parser("migrate", help="move JSON entries into SQLite, monthly partitions or the binary format")
+    mig.add_argument("--to", choices=["sqlite", "partitioned", "binary"], default="sqlite")
+
+    arch = sub.add_parser("archive", help="move old entries into compressed monthly archive segments")
+    arch.add_argument("--older-than", type=int, metavar="DAYS",
+                      help="age in days (default: $TRIGGER_TRACKER_RETENTION_DAYS or 365)")
+
+    srv = sub.add_parser("serve", help="serve the local HTTP API on 127.0.0.1")
+    srv.add_argument("--port", type=int, default=8765)
+
+    conv = sub.add_parser("convert", help="convert a JSON history to the binary .ttb format or back")
+    conv.add_argument("src")
+    conv.add_argument("dst")
+    conv.add_argument("--codec", choices=["zstd", "zlib", "none"], help="block compression (zstd if installed)")
+    return parser
+
+
+def main(argv=None):
+    global data_dir, store
+    parser = build_parser()
+    args = parser.parse_args(argv)
+    if args.user:
+        try:
+            data_dir = profile_dir(args.user)
+        except ValueError as exc:
+            parser.error(str(exc))
+        store = open_storage(data_dir=data_dir)
+    if not (args.profile or args.profile_dump):
+        return run_command(args)
+    profiling.enable()
+    profiling.start_run(args.command or "menu")
+    try:
+        if args.profile_dump:
+            with profiling.cprofile(args.profile_dump):
+                return run_command(args)
+        return run_command(args)
+    finally:
+        run = profiling.finish_run()
+        if args.profile and run:
+            print(profiling.format_breakdown(run), file=sys.stderr)
+
+
+def run_command(args):
+    if args.command is None:
+        interactive_menu()
+        return 0
+    ensure_dirs()
+    if args.command == "log":
+        raw = {k: getattr(args, k) for k in ("trigger", "before", "after", "intensity", "notes") + FEELINGS}
+        raw["timestamp"] = args.timestamp or now_iso()
+        try:
+            entry = normalize_entry(raw)
+        except ValueError as exc:
+            print(f"Invalid entry: {exc}", file=sys.stderr)
+            return 2
+        entry["id"] = new_id()
+        add_entry(entry)
+    elif args.command == "log-batch":
+        saved, invalid = log_batch(sys.stdin)
+        print(f"Saved {saved} entries, skipped {invalid} invalid lines.")
+        return 1 if invalid else 0
+    elif args.command == "recent":
+        show_recent(args.n, as_json=args.json)
+    elif args.command == "summary":
+        summary(as_json=args.json, rebuild=args.rebuild, workers=args.workers)
+    elif args.command == "export":
+        generate_reports(args.format, compress=args.gzip)
+    elif args.command == "search":
+        search(" ".join(args.query), n=args.n, rank=args.rank)
+    elif args.command == "import":
+        import_history(args.path, workers=args.workers)
+    elif args.command == "migrate":
+        migrate(args.to)
+    elif args.command == "archive":
+        return archive_old(args.older_than)
+    elif args.command == "serve":
+        serve_api(args.port)
+    elif args.command == "convert":
+        return convert_file(args.src, args.dst, args.codec)
+    return 0
 
 
 if __name__ == "__main__":
-    interactive_menu()
+    sys.exit(main())
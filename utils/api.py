@@ -0,0 +1,309 @@
+"""
+Local HTTP API for Trigger Tracker.
+A small asyncio server, bound to localhost only, that lets other tools on
+this machine push entries and read recent entries and summary figures:
+
+    POST /entries          one entry as a JSON object
+    POST /entries/batch    a JSON array of entries, saved all or nothing
+    GET  /entries/recent   ?n=10, newest first
+    GET  /summary          the figures of `main.py summary --json`
+
+Only requests addressed to this machine by name (Host 127.0.0.1 or
+localhost) are served, and posts must be application/json, so a web page
+can neither post entries here nor read them through DNS rebinding.
+
+Entries are validated with normalize_entry, like imports and log-batch
+(feelings 0-10, intensity INTENSITY_MIN-INTENSITY_MAX).
+Concurrent posts are coalesced into one store.extend call per write.
+"""
+
+import asyncio
+import json
+from datetime import datetime
+from urllib.parse import parse_qs, urlsplit
+
+from utils.helpers import normalize_entry, now_iso
+from utils.rollups import current_rollups
+from utils.writer import QueueFullError
+
+HOST = "127.0.0.1"
+PORT = 8765
+# Largest request body accepted, in bytes.
+MAX_BODY = 16 * 1024 * 1024
+# Most entries accepted in one batch post.
+MAX_BATCH = 10000
+# Entries that may wait for a write before posts are refused with 503.
+MAX_PENDING = 50000
+
+# Host header values accepted, with or without the port.
+LOCAL_HOSTS = (HOST, "localhost")
+
+_REASONS = {
+    200: "OK", 201: "Created", 400: "Bad Request", 403: "Forbidden", 404: "Not Found",
+    405: "Method Not Allowed", 411: "Length Required", 413: "Payload Too Large",
+    415: "Unsupported Media Type",
+    500: "Internal Server Error", 503: "Service Unavailable",
+}
+
+
+class HttpError(Exception):
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+
+class Coalescer:
+    """Saves posted entries to store, one write for everything that arrived
+    while the previous write was running.
+
+    The asyncio counterpart of utils.writer.BackgroundWriter: the write runs
+    on a worker thread and each post awaits its own future, so the event
+    loop keeps accepting requests meanwhile.
+    """
+
+    def __init__(self, store, max_pending=MAX_PENDING):
+        self.store = store
+        self.max_pending = max_pending
+        self.writes = 0
+        self._waiting = []
+        self._pending = 0
+        self._wake = asyncio.Event()
+        self._task = None
+
+    async def save(self, entries):
+        """Return once entries are on disk; raises QueueFullError when too
+        many entries are already waiting."""
+        if self._pending + len(entries) > self.max_pending:
+            raise QueueFullError(f"{self._pending} entries are already waiting to be saved")
+        done = asyncio.get_running_loop().create_future()
+        self._waiting.append((entries, done))
+        self._pending += len(entries)
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+        self._wake.set()
+        await done
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            await self._wake.wait()
+            self._wake.clear()
+            batch, self._waiting = self._waiting, []
+            if not batch:
+                continue
+            entries = [e for group, _ in batch for e in group]
+            try:
+                await loop.run_in_executor(None, self.store.extend, entries)
+            except Exception as exc:
+                for _, done in batch:
+                    if not done.done():
+                        done.set_exception(exc)
+            else:
+                # A post whose client went away was cancelled meanwhile.
+                for _, done in batch:
+                    if not done.done():
+                        done.set_result(None)
+            finally:
+                self._pending -= len(entries)
+                self.writes += 1
+
+
+class Api:
+    """Request handling for one store."""
+
+    def __init__(self, store):
+        self.store = store
+        self.coalescer = Coalescer(store)
+        self._last_id = 0
+
+    def _new_id(self):
+        # Millisecond ids like the form's, kept unique within this server.
+        self._last_id = max(int(datetime.utcnow().timestamp() * 1000), self._last_id + 1)
+        return self._last_id
+
+    def _entry(self, raw):
+        if not isinstance(raw, dict):
+            raise ValueError("an entry must be a JSON object")
+        raw = dict(raw)
+        if not raw.get("timestamp"):
+            raw["timestamp"] = now_iso()
+        entry = normalize_entry(raw)
+        if entry["id"] is None:
+            entry["id"] = self._new_id()
+        return entry
+
+    async def post_entry(self, body):
+        try:
+            entry = self._entry(body)
+        except ValueError as exc:
+            raise HttpError(400, str(exc)) from None
+        await self.coalescer.save([entry])
+        return 201, {"id": entry["id"]}
+
+    async def post_batch(self, body):
+        if not isinstance(body, list):
+            raise HttpError(400, "expected a JSON array of entries")
+        if len(body) > MAX_BATCH:
+            raise HttpError(413, f"at most {MAX_BATCH} entries per batch")
+        entries, errors = [], []
+        for i, raw in enumerate(body):
+            try:
+                entries.append(self._entry(raw))
+            except ValueError as exc:
+                errors.append({"index": i, "error": str(exc)})
+        if errors:
+            return 400, {"error": "invalid entries; nothing was saved", "invalid": errors[:100]}
+        if entries:
+            await self.coalescer.save(entries)
+        return 201, {"saved": len(entries), "ids": [e["id"] for e in entries]}
+
+    async def recent(self, query):
+        try:
+            n = int(query.get("n", ["10"])[0])
+        except ValueError:
+            raise HttpError(400, "n must be an integer") from None
+        n = max(0, min(n, 1000))
+        rows = await asyncio.get_running_loop().run_in_executor(None, self._recent, n)
+        return 200, rows
+
+    def _recent(self, n):
+        # Keep the columns loaded (and reload them after an idle eviction),
+        # so a request only reads the entries appended since the last one.
+        self.store.warm()
+        return self.store.recent(n)
+
+    async def summary(self):
+        rollups = await asyncio.get_running_loop().run_in_executor(None, current_rollups, self.store)
+        return 200, rollups.summary()
+
+    async def dispatch(self, method, target, body):
+        url = urlsplit(target)
+        routes = {
+            "/entries": ("POST", lambda: self.post_entry(_json(body))),
+            "/entries/batch": ("POST", lambda: self.post_batch(_json(body))),
+            "/entries/recent": ("GET", lambda: self.recent(parse_qs(url.query))),
+            "/summary": ("GET", self.summary),
+        }
+        route = routes.get(url.path.rstrip("/") or "/")
+        if route is None:
+            raise HttpError(404, f"no endpoint {url.path}")
+        if method != route[0]:
+            raise HttpError(405, f"use {route[0]} for {url.path}")
+        return await route[1]()
+
+
+def _json(body):
+    try:
+        return json.loads(body)
+    except ValueError:
+        raise HttpError(400, "request body must be JSON") from None
+
+
+async def _read_request(reader):
+    """Return (method, target, headers, body), or None at end of stream."""
+    line = await reader.readline()
+    if not line:
+        return None
+    try:
+        method, target, _ = line.decode("latin-1").split()
+    except ValueError:
+        raise HttpError(400, "malformed request line") from None
+    headers = {}
+    while True:
+        line = await reader.readline()
+        if line in (b"\r\n", b"\n", b""):
+            break
+        name, _, value = line.decode("latin-1").partition(":")
+        headers[name.strip().lower()] = value.strip()
+    body = b""
+    if method == "POST":
+        if "content-length" not in headers:
+            raise HttpError(411, "Content-Length is required")
+        try:
+            length = int(headers["content-length"])
+        except ValueError:
+            raise HttpError(400, "bad Content-Length") from None
+        if length < 0:
+            raise HttpError(400, "bad Content-Length")
+        if length > MAX_BODY:
+            raise HttpError(413, f"bodies are limited to {MAX_BODY} bytes")
+        body = await reader.readexactly(length)
+    return method, target, headers, body
+
+
+def _check_origin(method, headers, port):
+    """Refuse requests a web page could have sent: another Host (DNS
+    rebinding) or a post that is not JSON (a cross-site form)."""
+    host = headers.get("host", "")
+    name, _, host_port = host.rpartition(":") if host.count(":") == 1 else (host, "", "")
+    if name.lower() not in LOCAL_HOSTS or host_port not in ("", str(port)):
+        raise HttpError(403, f"unexpected Host {host!r}")
+    if method == "POST":
+        content_type = headers.get("content-type", "").split(";")[0].strip().lower()
+        if content_type != "application/json":
+            raise HttpError(415, "Content-Type must be application/json")
+
+
+def _response(status, payload, keep_alive):
+    body = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+    head = (
+        f"HTTP/1.1 {status} {_REASONS.get(status, '')}\r\n"
+        "Content-Type: application/json; charset=utf-8\r\n"
+        f"Content-Length: {len(body)}\r\n"
+        f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n"
+    )
+    return head.encode("latin-1") + body
+
+
+async def _handle(api, reader, writer, port):
+    try:
+        while True:
+            keep_alive = False
+            try:
+                request = await _read_request(reader)
+                if request is None:
+                    break
+                method, target, headers, body = request
+                keep_alive = headers.get("connection", "").lower() != "close"
+                _check_origin(method, headers, port)
+                status, payload = await api.dispatch(method, target, body)
+            except HttpError as exc:
+                status, payload = exc.status, {"error": str(exc)}
+            except QueueFullError as exc:
+                status, payload = 503, {"error": str(exc)}
+            except asyncio.IncompleteReadError:
+                break
+            except Exception as exc:
+                status, payload = 500, {"error": f"{type(exc).__name__}: {exc}"}
+            writer.write(_response(status, payload, keep_alive))
+            await writer.drain()
+            if not keep_alive:
+                break
+    except ConnectionError:
+        pass
+    finally:
+        writer.close()
+
+
+async def start(store, port=PORT):
+    """Start serving store on HOST:port and return the asyncio server."""
+    api = Api(store)
+    server = await asyncio.start_server(lambda r, w: _handle(api, r, w, bound), HOST, port)
+    # The port actually bound, when port 0 asked for any free one.
+    bound = server.sockets[0].getsockname()[1]
+    return server
+
+
+def serve(store, port=PORT):
+    """Serve store on HOST:port until interrupted."""
+
+    async def run():
+        server = await start(store, port)
+        print(f"Trigger Tracker API listening on http://{HOST}:{port}")
+        async with server:
+            await server.serve_forever()
+
+    try:
+        asyncio.run(run())
+    except KeyboardInterrupt:
+        pass
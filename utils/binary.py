@@ -0,0 +1,408 @@
+"""
+Compact binary entry format for Trigger Tracker.
+A file is a short header followed by length-prefixed, self-contained blocks.
+Each block holds a table of the trigger strings it uses, one fixed-width
+record per entry and the free text packed per field, and is zlib- or
+zstd-compressed when that helps. Entries that do not fit the record layout
+are kept as JSON text, so a round trip through this format is lossless.
+
+Because the records are fixed-width, read_columns can load a file straight
+into an EntryStore without building a dict per entry.
+"""
+
+import importlib.util
+import json
+import logging
+import os
+import struct
+import threading
+import zlib
+from datetime import datetime, timedelta
+
+from utils.helpers import FEELINGS, load_entries, parse_timestamp, write_json
+from utils.locking import file_lock
+
+log = logging.getLogger(__name__)
+
+MAGIC = b"TTB1"
+BINARY_SUFFIX = ".ttb"
+
+# Records per block when a whole file is written at once.
+BLOCK_RECORDS = 4096
+
+NONE, ZLIB, ZSTD = 0, 1, 2
+CODECS = {"none": NONE, "zlib": ZLIB, "zstd": ZSTD}
+
+_BLOCK = struct.Struct("<BIII")  # codec, stored bytes, raw bytes, records
+_COUNT = struct.Struct("<I")
+# kind, id, epoch seconds, trigger index, the five feelings, intensity and
+# the UTF-8 byte lengths of before, after and notes. A JSON record keeps
+# its text in the notes slot.
+_RECORD = struct.Struct("<BqqI6BIII")
+_TEXT_FIELDS = ("before", "after", "notes")
+# The same layout as a NumPy dtype, for loading a block column-wise.
+_RECORD_DTYPE = [
+    ("kind", "u1"), ("id", "<i8"), ("epoch", "<i8"), ("code", "<u4"),
+    ("feelings", "u1", (5,)), ("intensity", "u1"), ("lengths", "<u4", (3,)),
+]
+_PACKED, _JSON = 0, 1
+
+_KEYS = {"id", "timestamp", "trigger", "before", "after", "feelings", "intensity", "notes"}
+_EPOCH = datetime(1970, 1, 1)
+_SECOND = timedelta(seconds=1)
+
+
+def _zstd():
+    try:
+        import zstandard
+    except ImportError as exc:
+        raise RuntimeError("zstd blocks need the zstandard package (pip install zstandard).") from exc
+    return zstandard
+
+
+def default_codec():
+    """Return "zstd" when the zstandard package is installed, else "zlib"."""
+    return "zstd" if importlib.util.find_spec("zstandard") else "zlib"
+
+
+def _compress(raw, codec):
+    if codec == ZLIB:
+        return zlib.compress(raw, 6)
+    if codec == ZSTD:
+        return _zstd().ZstdCompressor(level=6).compress(raw)
+    return raw
+
+
+def _decompress(stored, codec):
+    if codec == ZLIB:
+        return zlib.decompress(stored)
+    if codec == ZSTD:
+        return _zstd().ZstdDecompressor().decompress(stored)
+    if codec == NONE:
+        return stored
+    raise ValueError(f"unknown block codec {codec}")
+
+
+def _small(value):
+    # Stored in one byte and held as int8 by EntryStore.
+    return type(value) is int and 0 <= value <= 127
+
+
+def _packable(entry):
+    """Return the epoch of entry if it round-trips through a packed record."""
+    if not isinstance(entry, dict) or entry.keys() != _KEYS:
+        return None
+    feelings = entry["feelings"]
+    if not isinstance(feelings, dict) or feelings.keys() != set(FEELINGS):
+        return None
+    if not all(_small(feelings[k]) for k in FEELINGS) or not _small(entry["intensity"]):
+        return None
+    if type(entry["id"]) is not int or not -2**63 <= entry["id"] < 2**63:
+        return None
+    if not all(isinstance(entry[k], str) for k in ("trigger", "before", "after", "notes")):
+        return None
+    try:
+        dt = parse_timestamp(entry["timestamp"])
+    except (TypeError, ValueError):
+        return None
+    if dt.tzinfo is not None or dt.isoformat(" ") != entry["timestamp"]:
+        return None
+    return (dt - _EPOCH) // _SECOND
+
+
+def encode_block(entries, codec=ZLIB):
+    """Return one block holding entries, compressed with codec when smaller."""
+    table, index, records = [], {}, []
+    texts = {field: [] for field in _TEXT_FIELDS}
+    pack = _RECORD.pack
+    for e in entries:
+        epoch = _packable(e)
+        if epoch is None:
+            text = json.dumps(e, ensure_ascii=False).encode("utf-8")
+            records.append(pack(_JSON, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, len(text)))
+            texts["notes"].append(text)
+            continue
+        code = index.get(e["trigger"])
+        if code is None:
+            code = index[e["trigger"]] = len(table)
+            table.append(e["trigger"].encode("utf-8"))
+        encoded = [e[field].encode("utf-8") for field in _TEXT_FIELDS]
+        for field, text in zip(_TEXT_FIELDS, encoded):
+            texts[field].append(text)
+        feelings = e["feelings"]
+        records.append(pack(
+            _PACKED, e["id"], epoch, code, *(feelings[k] for k in FEELINGS), e["intensity"],
+            *map(len, encoded),
+        ))
+    raw = b"".join([
+        _COUNT.pack(len(table)),
+        struct.pack(f"<{len(table)}I", *map(len, table)),
+        *table,
+        *records,
+        *(b"".join(texts[field]) for field in _TEXT_FIELDS),
+    ])
+    stored = _compress(raw, codec) if codec != NONE else raw
+    if len(stored) >= len(raw):
+        codec, stored = NONE, raw
+    return _BLOCK.pack(codec, len(stored), len(raw), len(entries)) + stored
+
+
+def _layout(raw, count):
+    """Return (trigger table, start of the records, end of the records)."""
+    (n,) = _COUNT.unpack_from(raw)
+    lengths = struct.unpack_from(f"<{n}I", raw, _COUNT.size)
+    pos = _COUNT.size + 4 * n
+    table = []
+    for size in lengths:
+        table.append(raw[pos:pos + size].decode("utf-8"))
+        pos += size
+    return table, pos, pos + count * _RECORD.size
+
+
+class _Timestamps:
+    """Formats epoch seconds, caching the day and time-of-day strings."""
+
+    def __init__(self):
+        self.days = {}
+        self.times = {}
+
+    def __call__(self, epoch):
+        day, second = divmod(epoch, 86400)
+        text = self.days.get(day)
+        if text is None:
+            text = self.days[day] = (_EPOCH + day * 86400 * _SECOND).date().isoformat() + " "
+        clock = self.times.get(second)
+        if clock is None:
+            clock = self.times[second] = "%02d:%02d:%02d" % (second // 3600, second // 60 % 60, second % 60)
+        return text + clock
+
+
+def decode_block(raw, count, timestamps=None):
+    """Return the entries of an uncompressed block payload."""
+    timestamp = timestamps or _Timestamps()
+    table, start, end = _layout(raw, count)
+    records = list(_RECORD.iter_unpack(raw[start:end]))
+    # Each text field is packed separately, in record order.
+    b, a, n = end, end + sum(r[-3] for r in records), end + sum(r[-3] + r[-2] for r in records)
+    entries = []
+    for kind, entry_id, epoch, code, f1, f2, f3, f4, f5, intensity, nb, na, nn in records:
+        if kind == _JSON:
+            entries.append(json.loads(raw[n:n + nn].decode("utf-8")))
+            n += nn
+            continue
+        entries.append({
+            "id": entry_id,
+            "timestamp": timestamp(epoch),
+            "trigger": table[code],
+            "before": raw[b:b + nb].decode("utf-8"),
+            "after": raw[a:a + na].decode("utf-8"),
+            "feelings": dict(zip(FEELINGS, (f1, f2, f3, f4, f5))),
+            "intensity": intensity,
+            "notes": raw[n:n + nn].decode("utf-8"),
+        })
+        b, a, n = b + nb, a + na, n + nn
+    return entries
+
+
+def _extend_columns(store, raw, count):
+    """Append the entries of a block payload to an EntryStore column-wise;
+    blocks holding JSON records go through the dicts instead."""
+    import numpy as np
+
+    table, start, end = _layout(raw, count)
+    records = np.frombuffer(raw, dtype=_RECORD_DTYPE, count=count, offset=start)
+    if (records["kind"] != _PACKED).any():
+        store.extend(decode_block(raw, count))
+        return
+    texts, pos = {}, end
+    for field, lengths in zip(_TEXT_FIELDS, records["lengths"].T):
+        size = int(lengths.sum(dtype=np.int64))
+        texts[field] = (raw[pos:pos + size], lengths)
+        pos += size
+    store.extend_columns(
+        records["epoch"], records["id"], records["intensity"], records["feelings"],
+        table, records["code"], texts,
+    )
+
+
+def _blocks(data, base):
+    """Yield (codec, stored payload, records, end offset) of every complete
+    block in data, which starts at file offset base; a torn final block is
+    left for the next read."""
+    pos = 0
+    while pos + _BLOCK.size <= len(data):
+        codec, stored, _, count = _BLOCK.unpack_from(data, pos)
+        start = pos + _BLOCK.size
+        if start + stored > len(data):
+            return
+        pos = start + stored
+        yield codec, data[start:pos], count, base + pos
+
+
+def _read(path, offset=0, end=None):
+    """Return (bytes from offset to end, inode, offset) after checking the header."""
+    try:
+        f = open(path, "rb")
+    except FileNotFoundError:
+        return b"", None, offset
+    with f:
+        inode = os.fstat(f.fileno()).st_ino
+        head = f.read(len(MAGIC))
+        if head and head != MAGIC:
+            raise ValueError(f"{path} is not a Trigger Tracker binary file")
+        offset = max(offset, len(MAGIC))
+        f.seek(offset)
+        return f.read(-1 if end is None else max(0, end - offset)), inode, offset
+
+
+def read_entries(path, offset=0, end=None):
+    """Return (entries, inode, end offset) for the blocks from offset up to
+    end (a block boundary, default the end of the file)."""
+    data, inode, offset = _read(path, offset, end)
+    entries, timestamps = [], _Timestamps()
+    for codec, stored, count, offset in _blocks(data, offset):
+        entries.extend(decode_block(_decompress(stored, codec), count, timestamps))
+    return entries, inode, offset
+
+
+def read_columns(path):
+    """Return (EntryStore, inode, end offset) for the whole file, loaded
+    without building a dict per entry."""
+    from utils.columnar import EntryStore
+
+    data, inode, offset = _read(path)
+    store = EntryStore()
+    for codec, stored, count, offset in _blocks(data, offset):
+        _extend_columns(store, _decompress(stored, codec), count)
+    return store, inode, offset
+
+
+def block_spans(path, records):
+    """Split the blocks of path into runs of about `records` entries.
+
+    Returns [(start offset, end offset)] that read_entries can load
+    independently; only the block headers are read.
+    """
+    spans, start, pos, count = [], len(MAGIC), len(MAGIC), 0
+    try:
+        f = open(path, "rb")
+    except FileNotFoundError:
+        return spans
+    with f:
+        size = os.fstat(f.fileno()).st_size
+        while pos + _BLOCK.size <= size:
+            f.seek(pos)
+            _, stored, _, n = _BLOCK.unpack(f.read(_BLOCK.size))
+            if pos + _BLOCK.size + stored > size:
+                break
+            pos += _BLOCK.size + stored
+            count += n
+            if count >= records:
+                spans.append((start, pos))
+                start, count = pos, 0
+    if pos > start:
+        spans.append((start, pos))
+    return spans
+
+
+def block_info(path):
+    """Return (number of entries, id of the last one); only the block
+    headers are read, and the last block is decompressed."""
+    try:
+        f = open(path, "rb")
+    except FileNotFoundError:
+        return 0, None
+    with f:
+        head = f.read(len(MAGIC))
+        if head and head != MAGIC:
+            raise ValueError(f"{path} is not a Trigger Tracker binary file")
+        size = os.fstat(f.fileno()).st_size
+        count, last, pos = 0, None, len(MAGIC)
+        while pos + _BLOCK.size <= size:
+            f.seek(pos)
+            codec, stored, _, n = _BLOCK.unpack(f.read(_BLOCK.size))
+            if pos + _BLOCK.size + stored > size:
+                break
+            count, last = count + n, (codec, pos + _BLOCK.size, stored, n)
+            pos += _BLOCK.size + stored
+        if last is None or not last[3]:
+            return count, None
+        codec, start, stored, n = last
+        f.seek(start)
+        return count, decode_block(_decompress(f.read(stored), codec), n)[-1].get("id")
+
+
+def _encode_blocks(entries, codec, block_records=BLOCK_RECORDS):
+    code = CODECS[codec or default_codec()]
+    return [encode_block(entries[i:i + block_records], code) for i in range(0, len(entries), block_records)]
+
+
+def _complete_end(f):
+    """Return the offset just past the last complete block of the open
+    file f; only the block headers are read."""
+    size = os.fstat(f.fileno()).st_size
+    pos = len(MAGIC)
+    while pos + _BLOCK.size <= size:
+        f.seek(pos)
+        stored = _BLOCK.unpack(f.read(_BLOCK.size))[1]
+        if pos + _BLOCK.size + stored > size:
+            break
+        pos += _BLOCK.size + stored
+    return pos
+
+
+def _drop_torn_block(f, path):
+    """Cut a block left incomplete by an interrupted append, so the next
+    block starts where readers expect one."""
+    size = os.fstat(f.fileno()).st_size
+    end = _complete_end(f)
+    if end < size:
+        log.warning("dropping %d bytes of a torn block at the end of %s", size - end, path)
+        f.truncate(end)
+    f.seek(end)
+
+
+def append_entries(path, entries, codec=None):
+    """Append entries to path as new blocks, creating the file if needed."""
+    if not entries:
+        return
+    blocks = _encode_blocks(entries, codec)
+    with file_lock(path):
+        with open(path, "a+b") as f:
+            f.seek(0)
+            head = f.read(len(MAGIC))
+            if head != MAGIC:
+                if head:
+                    raise ValueError(f"{path} is not a Trigger Tracker binary file")
+                f.write(MAGIC)
+            else:
+                _drop_torn_block(f, path)
+            f.write(b"".join(blocks))
+            f.flush()
+            os.fsync(f.fileno())
+
+
+def write_file(path, entries, codec=None):
+    """Replace path with entries written in full blocks."""
+    tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(tmp, "wb") as f:
+        f.write(MAGIC)
+        for block in _encode_blocks(entries, codec):
+            f.write(block)
+        f.flush()
+        os.fsync(f.fileno())
+    with file_lock(path):
+        os.replace(tmp, path)
+
+
+def convert(src, dst, codec=None):
+    """Convert between the JSON snapshot (with its journal) and the binary
+    format; the direction follows the extension of src. Returns the number
+    of entries written."""
+    if src.endswith(BINARY_SUFFIX):
+        entries = read_entries(src)[0]
+        write_json(dst, entries)
+    else:
+        entries = load_entries(src)
+        write_file(dst, entries, codec)
+    return len(entries)
@@ -0,0 +1,154 @@
+"""
+Process-wide load cache for Trigger Tracker.
+Keeps a columnar EntryStore and its search index per store,
+shared by every Streamlit session, and re-reads only what was appended
+since the last load. Stores are evicted least recently used first once the
+total passes a memory ceiling, and after sitting idle for a while, so one
+process can serve many profiles. Each store loads under its own lock, so a
+slow load of one profile does not hold up sessions reading another.
+"""
+
+import os
+import threading
+import time
+from collections import OrderedDict
+
+from utils.profiling import timed
+
+# Total size cap for everything cached, in megabytes.
+CACHE_LIMIT_ENV = "TRIGGER_TRACKER_CACHE_MB"
+DEFAULT_CACHE_MB = 256
+# Stores untouched for this many seconds are dropped.
+CACHE_IDLE_ENV = "TRIGGER_TRACKER_CACHE_IDLE"
+DEFAULT_IDLE_SECONDS = 1800
+
+_slots = OrderedDict()
+# Guards _slots and _loading only; reads from disk hold the store's own lock.
+_lock = threading.RLock()
+_loading = {}
+
+
+class _Slot:
+    __slots__ = ("columns", "cursor", "index", "used")
+
+    def __init__(self, columns, cursor):
+        self.columns = columns
+        self.cursor = cursor
+        self.index = None
+        self.used = time.monotonic()
+
+    def nbytes(self):
+        size = self.columns.nbytes()
+        if self.index is not None:
+            size += self.index.nbytes()
+        return size
+
+
+def _limit_bytes():
+    return int(float(os.environ.get(CACHE_LIMIT_ENV, DEFAULT_CACHE_MB)) * 1024 * 1024)
+
+
+def _idle_seconds():
+    return float(os.environ.get(CACHE_IDLE_ENV, DEFAULT_IDLE_SECONDS))
+
+
+def _key(store):
+    return type(store).__name__, os.path.abspath(store.path)
+
+
+def _load_lock(key):
+    with _lock:
+        return _loading.setdefault(key, threading.RLock())
+
+
+def _refresh(store):
+    key = _key(store)
+    with _load_lock(key):
+        with _lock:
+            slot = _slots.get(key)
+        update = None
+        if slot is not None and slot.cursor is not None:
+            update = store.read_new(slot.cursor)
+        if update is None:
+            slot = _Slot(*store.snapshot_columns())
+        else:
+            tail, slot.cursor = update
+            if tail:
+                # A new store, so columns already handed out never change.
+                slot.columns = slot.columns.extended(tail)
+        with _lock:
+            _slots[key] = slot
+            slot.used = time.monotonic()
+            _slots.move_to_end(key)
+            _evict(keep=key)
+        return slot
+
+
+def _evict(keep):
+    # Least recently used first, so idle stores sit at the front.
+    cutoff = time.monotonic() - _idle_seconds()
+    for key in list(_slots):
+        if _slots[key].used >= cutoff:
+            break
+        if key != keep:
+            del _slots[key]
+    limit = _limit_bytes()
+    total = sum(s.nbytes() for s in _slots.values())
+    for key in list(_slots):
+        if total <= limit:
+            break
+        if key == keep:
+            continue
+        total -= _slots.pop(key).nbytes()
+
+
+@timed()
+def cached_columns(store):
+    """Return all entries of store as an EntryStore, reloading only what
+    changed on disk.
+
+    The EntryStore is shared between sessions and must not be modified.
+    Appended entries give a new EntryStore (EntryStore.extended), so one
+    already returned keeps its length and contents while it is read.
+    """
+    return _refresh(store).columns
+
+
+def cached_index(store):
+    """Return the search index of store, loaded from its file on first use.
+
+    The caller syncs it with the columns (see search.index_for).
+    """
+    from utils.search import SearchIndex, index_path
+
+    key = _key(store)
+    with _load_lock(key):
+        slot = _refresh(store)
+        if slot.index is None:
+            slot.index = SearchIndex.load(index_path(store.path))
+            with _lock:
+                _evict(keep=key)
+        return slot.index
+
+
+def stats():
+    """Return a summary of the cache: stores held, their bytes, the memory
+    limit and the idle timeout."""
+    with _lock:
+        size = sum(slot.nbytes() for slot in _slots.values())
+        return {"stores": len(_slots), "bytes": size, "limit": _limit_bytes(), "idle_seconds": _idle_seconds()}
+
+
+def loaded_columns(store):
+    """Return the cached EntryStore of store, brought up to date, or None
+    when this process has not loaded it yet."""
+    with _lock:
+        if _key(store) not in _slots:
+            return None
+    return _refresh(store).columns
+
+
+def clear():
+    """Drop every cached store."""
+    with _lock:
+        _slots.clear()
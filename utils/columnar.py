@@ -0,0 +1,389 @@
+"""
+Columnar in-memory entry store for Trigger Tracker.
+Holds entries as NumPy arrays instead of one nested dict per entry.
+"""
+
+import copy
+from array import array
+
+import numpy as np
+
+from utils.helpers import FEELINGS
+from utils.timeline import Timeline
+
+# Epoch value used for missing or unparseable timestamps.
+NAT = np.iinfo(np.int64).min
+
+TEXT_FIELDS = ("before", "after", "notes")
+KEYS = ("id", "timestamp", "trigger", "before", "after", "feelings", "intensity", "notes")
+
+
+def parse_timestamps(values):
+    """Return epoch seconds (int64) for "%Y-%m-%d %H:%M:%S" strings."""
+    try:
+        parsed = np.array([v or "" for v in values], dtype="datetime64[s]")
+    except ValueError:
+        parsed = np.empty(len(values), dtype="datetime64[s]")
+        for i, v in enumerate(values):
+            try:
+                parsed[i] = np.datetime64(v or "", "s")
+            except ValueError:
+                parsed[i] = np.datetime64("NaT")
+    return parsed.astype(np.int64)
+
+
+def _clipped(value, lo, hi):
+    """Return value as an integer column can hold it: numbers truncated and
+    clipped to [lo, hi], anything else 0."""
+    try:
+        return min(hi, max(lo, int(value or 0)))
+    except (TypeError, ValueError, OverflowError):
+        return 0
+
+
+def _int_column(values, dtype):
+    """Return (values as an array of dtype, rows that had to be clipped).
+
+    values holds one number, or one equal-length list of numbers, per row;
+    the second item is None when every value fit as given.
+    """
+    info = np.iinfo(dtype)
+    column = np.asarray(values)
+    if column.dtype.kind in "iu" and (
+        not column.size or (column.min() >= info.min and column.max() <= info.max)
+    ):
+        return column, None
+    rows = [row if isinstance(row, list) else [row] for row in values]
+    clipped = np.array([[_clipped(v, info.min, info.max) for v in row] for row in rows], dtype=dtype)
+    changed = [
+        i for i, row in enumerate(rows)
+        if not all(type(v) is int and info.min <= v <= info.max for v in row)
+    ]
+    return clipped.reshape(column.shape), changed
+
+
+def _regular(entry):
+    """Return True if entry has exactly the usual fields, of the usual
+    types; the numbers are checked column-wise by _int_column."""
+    feelings = entry.get("feelings")
+    timestamp = entry.get("timestamp")
+    return (
+        entry.keys() == _KEY_SET
+        and type(feelings) is dict and feelings.keys() == _FEELING_SET
+        and type(timestamp) is str and len(timestamp) == 19 and timestamp[10] == " "
+        and type(entry["trigger"]) is type(entry["before"]) is type(entry["after"]) is type(entry["notes"]) is str
+    )
+
+
+_KEY_SET = frozenset(KEYS)
+_FEELING_SET = frozenset(FEELINGS)
+
+
+def to_epoch(dt):
+    """Return epoch seconds for a naive datetime, matching parse_timestamps."""
+    return int(np.datetime64(dt, "s").astype(np.int64))
+
+
+def format_timestamps(epochs):
+    """Inverse of parse_timestamps; missing values become empty strings."""
+    epochs = np.asarray(epochs, dtype=np.int64)
+    text = np.datetime_as_string(epochs.astype("datetime64[s]"), unit="s")
+    return ["" if s == "NaT" else s.replace("T", " ") for s in text.tolist()]
+
+
+class _TextColumn:
+    """Strings packed into one UTF-8 buffer with an offsets array."""
+
+    __slots__ = ("buffer", "offsets", "_list")
+
+    def __init__(self):
+        self.buffer = bytearray()
+        self.offsets = array("q", [0])
+        self._list = None
+
+    def extend(self, values):
+        for v in values:
+            self.buffer += (v or "").encode("utf-8")
+            self.offsets.append(len(self.buffer))
+        self._list = None
+
+    def extend_packed(self, buffer, lengths):
+        """Append strings given as one UTF-8 buffer and the byte length of each."""
+        base = len(self.buffer)
+        self.buffer += buffer
+        self.offsets.extend((np.cumsum(lengths, dtype=np.int64) + base).tolist())
+        self._list = None
+
+    def get(self, i):
+        return self.buffer[self.offsets[i]:self.offsets[i + 1]].decode("utf-8")
+
+    def tolist(self):
+        if self._list is None:
+            self._list = [self.get(i) for i in range(len(self.offsets) - 1)]
+        return self._list
+
+    def nbytes(self):
+        return len(self.buffer) + self.offsets.itemsize * len(self.offsets)
+
+
+class EntryRow:
+    """Read-only view of one entry; supports the dict access used by pages."""
+
+    __slots__ = ("_store", "_i")
+
+    def __init__(self, store, i):
+        self._store = store
+        self._i = i
+
+    def __getitem__(self, key):
+        return self._store.value(key, self._i)
+
+    def get(self, key, default=None):
+        try:
+            return self._store.value(key, self._i)
+        except KeyError:
+            return default
+
+    @property
+    def epoch(self):
+        return int(self._store.ts[self._i])
+
+    def to_dict(self):
+        return self._store.entry(self._i)
+
+
+class EntryStore:
+    """Entries held column-wise.
+
+    ts (epoch seconds), ids, intensity and the five feelings (one column per
+    entry of FEELINGS) are NumPy arrays. Triggers are dictionary-encoded in
+    trigger_codes against trigger_vocab, and the free-text fields are packed
+    buffers that are only turned into lists on demand. The few entries the
+    columns cannot hold exactly (extra keys, missing ids, odd timestamps or
+    scores) are also kept as given, so entry() returns them unchanged.
+    """
+
+    def __init__(self, capacity=1024):
+        self._n = 0
+        self._ts = np.empty(capacity, dtype=np.int64)
+        self._ids = np.empty(capacity, dtype=np.int64)
+        self._intensity = np.empty(capacity, dtype=np.int8)
+        self._feelings = np.empty((capacity, len(FEELINGS)), dtype=np.int8)
+        self._codes = np.empty(capacity, dtype=np.int32)
+        self.trigger_vocab = []
+        self._vocab_index = {}
+        self._text = {f: _TextColumn() for f in TEXT_FIELDS}
+        self._timestamps = None
+        self._timeline = None
+        self._irregular = {}
+
+    @classmethod
+    def from_entries(cls, entries):
+        store = cls(capacity=max(1024, len(entries)))
+        store.extend(entries)
+        return store
+
+    def __len__(self):
+        return self._n
+
+    def __iter__(self):
+        return (EntryRow(self, i) for i in range(self._n))
+
+    def __getitem__(self, key):
+        if isinstance(key, slice):
+            return [EntryRow(self, i) for i in range(*key.indices(self._n))]
+        if key < 0:
+            key += self._n
+        if not 0 <= key < self._n:
+            raise IndexError(key)
+        return EntryRow(self, key)
+
+    # Column views, trimmed to the filled length.
+    @property
+    def ts(self):
+        return self._ts[:self._n]
+
+    @property
+    def ids(self):
+        return self._ids[:self._n]
+
+    @property
+    def intensity(self):
+        return self._intensity[:self._n]
+
+    @property
+    def feelings(self):
+        return self._feelings[:self._n]
+
+    @property
+    def trigger_codes(self):
+        return self._codes[:self._n]
+
+    def _reserve(self, extra):
+        need = self._n + extra
+        capacity = len(self._ts)
+        if need <= capacity:
+            return
+        while capacity < need:
+            capacity *= 2
+        for name in ("_ts", "_ids", "_intensity", "_codes", "_feelings"):
+            old = getattr(self, name)
+            new = np.empty((capacity,) + old.shape[1:], dtype=old.dtype)
+            new[:self._n] = old[:self._n]
+            setattr(self, name, new)
+
+    def _encode(self, trigger):
+        code = self._vocab_index.get(trigger)
+        if code is None:
+            code = self._vocab_index[trigger] = len(self.trigger_vocab)
+            self.trigger_vocab.append(trigger)
+        return code
+
+    def extend(self, entries):
+        """Append a list of entry dicts."""
+        k = len(entries)
+        if not k:
+            return
+        self._reserve(k)
+        lo, hi = self._n, self._n + k
+        self._ts[lo:hi] = parse_timestamps([e.get("timestamp") for e in entries])
+        irregular = set(np.flatnonzero(self._ts[lo:hi] == NAT).tolist())
+        for name, values in (
+            ("_ids", [e.get("id") for e in entries]),
+            ("_intensity", [e.get("intensity") for e in entries]),
+            ("_feelings", [[(e.get("feelings") or {}).get(f, 0) for f in FEELINGS] for e in entries]),
+        ):
+            column = getattr(self, name)
+            column[lo:hi], clipped = _int_column(values, column.dtype)
+            irregular.update(clipped or ())
+        self._codes[lo:hi] = [self._encode(e.get("trigger", "")) for e in entries]
+        for field, column in self._text.items():
+            column.extend(e.get(field, "") for e in entries)
+        for i, e in enumerate(entries):
+            if i in irregular or not _regular(e):
+                self._irregular[lo + i] = e
+        self._filled(lo, hi)
+
+    def extended(self, entries):
+        """Return a new EntryStore holding these entries followed by entries.
+
+        The new store writes its rows past the length of this one, into the
+        same buffers, and copies only the timeline; anyone still reading
+        this store sees it unchanged. Only the newest store of a line may
+        be extended, or two of them would write the same rows.
+        """
+        grown = copy.copy(self)
+        grown._irregular = dict(self._irregular)
+        if self._timeline is not None:
+            grown._timeline = self._timeline.copy()
+        grown.extend(entries)
+        return grown
+
+    def extend_columns(self, ts, ids, intensity, feelings, vocab, codes, texts):
+        """Append entries given column-wise.
+
+        codes index into vocab, a list of trigger strings, and texts maps
+        each free-text field to (UTF-8 buffer, byte length of each entry).
+        """
+        k = len(ts)
+        if not k:
+            return
+        self._reserve(k)
+        lo, hi = self._n, self._n + k
+        self._ts[lo:hi] = ts
+        self._ids[lo:hi] = ids
+        self._intensity[lo:hi] = intensity
+        self._feelings[lo:hi] = feelings
+        self._codes[lo:hi] = np.array([self._encode(t) for t in vocab], dtype=np.int32)[codes]
+        for field, (buffer, lengths) in texts.items():
+            self._text[field].extend_packed(buffer, lengths)
+        self._filled(lo, hi)
+
+    def _filled(self, lo, hi):
+        if self._timeline is not None:
+            self._timeline.extend(self._ts[lo:hi].tolist(), self._ids[lo:hi].tolist(), range(lo, hi))
+        self._n = hi
+        self._timestamps = None
+
+    @property
+    def timeline(self):
+        """Timeline of the entries, built on first use and kept up to date
+        by extend."""
+        if self._timeline is None:
+            order = np.lexsort((self.ids, self.ts))
+            self._timeline = Timeline.from_sorted(
+                self.ts[order].tolist(), self.ids[order].tolist(), order.tolist()
+            )
+        return self._timeline
+
+    def page(self, size, before=None, after=None, start=None, end=None):
+        """Return up to size entries ordered newest first, keyed on (timestamp, id).
+
+        before/after are (timestamp, id) keys taken from the last/first row of
+        the previous page; entries strictly older than before, or the ones
+        just newer than after, are returned. start/end bound the timestamp
+        like Storage.range. Costs O(log n + size) once the timeline is built.
+        """
+        return [EntryRow(self, i) for i in self.timeline.page(size, before, after, start, end)]
+
+    def between(self, start=None, end=None):
+        """Return the entries with start <= timestamp < end, oldest first."""
+        return [EntryRow(self, i) for i in self.timeline.between(start, end)]
+
+    def count(self, start=None, end=None):
+        """Return the number of entries with start <= timestamp < end."""
+        return self.timeline.count(start, end)
+
+    def latest(self, n):
+        """Return the n most recent entries, newest first."""
+        return [EntryRow(self, i) for i in self.timeline.latest(n)]
+
+    def triggers(self):
+        """Return the trigger of every entry as an array of strings."""
+        return np.array(self.trigger_vocab, dtype=object)[self.trigger_codes]
+
+    def timestamps(self):
+        """Return the timestamp strings, materialised once."""
+        if self._timestamps is None or len(self._timestamps) != self._n:
+            self._timestamps = format_timestamps(self.ts)
+        return self._timestamps
+
+    def column(self, field):
+        """Return a list of values of a free-text field."""
+        values = self._text[field].tolist()
+        # The column may have grown for a store extended from this one.
+        return values if len(values) == self._n else values[:self._n]
+
+    def value(self, key, i):
+        """Return field key of entry i, in the shape of the JSON entry."""
+        if key == "timestamp":
+            if self._timestamps is not None and len(self._timestamps) == self._n:
+                return self._timestamps[i]
+            return format_timestamps(self._ts[i:i + 1])[0]
+        if key == "trigger":
+            return self.trigger_vocab[self._codes[i]]
+        if key == "intensity":
+            return int(self._intensity[i])
+        if key == "id":
+            return int(self._ids[i])
+        if key == "feelings":
+            return dict(zip(FEELINGS, self._feelings[i].tolist()))
+        if key in self._text:
+            return self._text[key].get(i)
+        raise KeyError(key)
+
+    def entry(self, i):
+        """Return entry i as a plain dict, equal to the one it was added as."""
+        given = self._irregular.get(i)
+        if given is not None:
+            return dict(given)
+        return {key: self.value(key, i) for key in KEYS}
+
+    def to_dicts(self):
+        return [self.entry(i) for i in range(self._n)]
+
+    def nbytes(self):
+        """Approximate memory held by the columns."""
+        size = sum(a.nbytes for a in (self._ts, self._ids, self._intensity, self._codes, self._feelings))
+        size += sum(len(t) + 50 for t in self.trigger_vocab)
+        return size + sum(c.nbytes() for c in self._text.values())
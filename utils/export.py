@@ -1,50 +1,191 @@
 """
 Export helpers for Trigger Tracker.
-Create CSV from JSON entries.
+Stream entries to CSV (optionally gzip-compressed) in bounded memory, or
+write columnar Parquet/Arrow archives (needs pyarrow).
 """
 
 import csv
+import gzip
+import io
 from datetime import datetime
+from itertools import chain
 
+from utils.helpers import FEELINGS
 
-def export_csv(entries, path):
-    """Write entries (list of dicts) to CSV file at path."""
-    if not entries:
+# Flatten feelings into columns; shared by the CLI and web exports.
+FIELDNAMES = [
+    "id",
+    "timestamp",
+    "trigger",
+    "before",
+    "after",
+    "intensity",
+    "notes",
+] + [f"feeling_{k}" for k in FEELINGS]
+
+# Rows buffered before a chunk is handed on.
+CHUNK_ROWS = 1000
+
+
+def flatten(e):
+    """Return the CSV row for one entry."""
+    feelings = e.get("feelings") or {}
+    row = {
+        "id": e.get("id"),
+        "timestamp": e.get("timestamp"),
+        "trigger": e.get("trigger"),
+        "before": e.get("before"),
+        "after": e.get("after"),
+        "intensity": e.get("intensity"),
+        "notes": e.get("notes", ""),
+    }
+    for k in FEELINGS:
+        row[f"feeling_{k}"] = feelings.get(k, 0)
+    return row
+
+
+def iter_csv(entries, chunk_rows=CHUNK_ROWS):
+    """Yield CSV text in chunks of up to chunk_rows rows, header first.
+
+    entries may be any iterable (a store iterator, an EntryStore); only one
+    chunk is held in memory at a time.
+    """
+    buf = io.StringIO()
+    writer = csv.DictWriter(buf, fieldnames=FIELDNAMES)
+    writer.writeheader()
+    pending = 0
+    for e in entries:
+        writer.writerow(flatten(e))
+        pending += 1
+        if pending >= chunk_rows:
+            yield buf.getvalue()
+            buf.seek(0)
+            buf.truncate()
+            pending = 0
+    if buf.tell():
+        yield buf.getvalue()
+
+
+def export_csv(entries, path, compress=False):
+    """Stream entries (any iterable of entries) to a CSV file at path.
+
+    With compress=True the file is gzip-compressed.
+    """
+    entries = iter(entries)
+    first = next(entries, None)
+    if first is None:
         raise ValueError("No entries to export.")
 
-    # Flatten feelings into columns
-    fieldnames = [
-        "id",
-        "timestamp",
-        "trigger",
-        "before",
-        "after",
-        "intensity",
-        "notes",
-        "feeling_anxiety",
-        "feeling_sadness",
-        "feeling_anger",
-        "feeling_shame",
-        "feeling_relief",
-    ]
-
-    with open(path, "w", newline="", encoding="utf-8") as f:
-        writer = csv.DictWriter(f, fieldnames=fieldnames)
-        writer.writeheader()
-        for e in entries:
-            feelings = e.get("feelings", {})
-            row = {
-                "id": e.get("id"),
-                "timestamp": e.get("timestamp"),
-                "trigger": e.get("trigger"),
-                "before": e.get("before"),
-                "after": e.get("after"),
-                "intensity": e.get("intensity"),
-                "notes": e.get("notes", ""),
-                "feeling_anxiety": feelings.get("anxiety", 0),
-                "feeling_sadness": feelings.get("sadness", 0),
-                "feeling_anger": feelings.get("anger", 0),
-                "feeling_shame": feelings.get("shame", 0),
-                "feeling_relief": feelings.get("relief", 0),
-            }
-            writer.writerow(row)
+    opener = gzip.open if compress else open
+    with opener(path, "wt", newline="", encoding="utf-8") as f:
+        for chunk in iter_csv(chain([first], entries)):
+            f.write(chunk)
+
+
+def csv_bytes(entries, compress=False):
+    """Return entries as CSV bytes, gzip-compressed with compress=True,
+    built chunk by chunk in memory rather than through a file."""
+    out = io.BytesIO()
+    sink = gzip.GzipFile(fileobj=out, mode="wb") if compress else out
+    for chunk in iter_csv(entries):
+        sink.write(chunk.encode("utf-8"))
+    if compress:
+        sink.close()
+    return out.getvalue()
+
+
+def export_filename(prefix="triggers_export", compress=False):
+    """Return a timestamped export file name."""
+    stamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+    return f"{prefix}_{stamp}.csv" + (".gz" if compress else "")
+
+
+def _require_pyarrow():
+    try:
+        import pyarrow  # noqa: F401
+        import pyarrow.parquet  # noqa: F401
+    except ImportError as exc:
+        raise RuntimeError("Parquet/Arrow export needs pyarrow (pip install pyarrow).") from exc
+    return pyarrow
+
+
+def entries_table(entries):
+    """Return entries as a pyarrow Table with typed, flattened columns.
+
+    Feelings and intensity become int8 columns, triggers a dictionary
+    column, and a "month" (YYYY-MM) column is added for partitioning.
+    """
+    pa = _require_pyarrow()
+    import numpy as np
+
+    from utils.columnar import EntryStore
+
+    if not isinstance(entries, EntryStore):
+        entries = EntryStore.from_entries(list(entries))
+    ts = entries.ts.astype("datetime64[s]")
+    columns = {
+        "id": pa.array(entries.ids),
+        "timestamp": pa.array(ts),
+        "trigger": pa.DictionaryArray.from_arrays(
+            pa.array(entries.trigger_codes), pa.array(entries.trigger_vocab, type=pa.string())
+        ),
+        "before": pa.array(entries.column("before"), type=pa.string()),
+        "after": pa.array(entries.column("after"), type=pa.string()),
+        "intensity": pa.array(entries.intensity),
+        "notes": pa.array(entries.column("notes"), type=pa.string()),
+    }
+    for j, k in enumerate(FEELINGS):
+        columns[f"feeling_{k}"] = pa.array(entries.feelings[:, j])
+    columns["month"] = pa.array(np.datetime_as_string(ts.astype("datetime64[M]")).tolist())
+    return pa.table(columns)
+
+
+def export_parquet(entries, directory):
+    """Write entries as a Parquet dataset partitioned by month.
+
+    Produces directory/month=YYYY-MM/*.parquet. Returns the directory.
+    """
+    _require_pyarrow()
+    import pyarrow.parquet as pq
+
+    table = entries_table(entries)
+    if not table.num_rows:
+        raise ValueError("No entries to export.")
+    pq.write_to_dataset(table, directory, partition_cols=["month"])
+    return directory
+
+
+def export_arrow(entries, path):
+    """Write entries to a single Arrow IPC file, which can be memory-mapped."""
+    pa = _require_pyarrow()
+
+    table = entries_table(entries)
+    if not table.num_rows:
+        raise ValueError("No entries to export.")
+    with pa.OSFile(path, "wb") as sink:
+        with pa.ipc.new_file(sink, table.schema) as writer:
+            writer.write_table(table)
+    return path
+
+
+def read_columnar_frame(path):
+    """Open a Parquet file/dataset or Arrow IPC file as an analytics DataFrame.
+
+    Files are memory-mapped rather than read into a buffer. The frame has
+    the columns of stats.entries_frame (feelings without the feeling_
+    prefix, plus date and hour).
+    """
+    pa = _require_pyarrow()
+    import pyarrow.parquet as pq
+
+    if path.endswith((".arrow", ".feather", ".ipc")):
+        table = pa.ipc.open_file(pa.memory_map(path, "r")).read_all()
+    else:
+        table = pq.read_table(path, memory_map=True)
+    keep = ["timestamp", "trigger", "intensity"] + [f"feeling_{k}" for k in FEELINGS]
+    df = table.select(keep).to_pandas(split_blocks=True)
+    df = df.rename(columns={f"feeling_{k}": k for k in FEELINGS})
+    df["trigger"] = df["trigger"].astype(str)
+    df["date"] = df["timestamp"].dt.date
+    df["hour"] = df["timestamp"].dt.hour
+    return df
@@ -3,15 +3,34 @@ Utility helpers for Trigger Tracker.
 """
 
 import json
+import logging
 import os
+import threading
 from datetime import datetime
 
+from utils.locking import ConcurrentModificationError, file_lock, file_version
+from utils.profiling import timed
+
+log = logging.getLogger(__name__)
+
+FEELINGS = ("anxiety", "sadness", "anger", "shame", "relief")
+TIMESTAMP_FORMAT = "%Y-%m-%d %H:%M:%S"
+# Bounds of the overall intensity of an entry (feelings are rated 0-10).
+INTENSITY_MIN, INTENSITY_MAX = 1, 10
+
+# Journal is folded into the snapshot once it grows past this many bytes,
+# or past COMPACT_RATIO of the snapshot size if that is larger, so bulk
+# appends to a big history compact a bounded number of times.
+COMPACT_THRESHOLD_BYTES = 1024 * 1024
+COMPACT_RATIO = 0.5
+
 
 def now_iso():
     """Return current UTC timestamp in ISO format (readable)."""
-    return datetime.utcnow().strftime("%Y-%m-%d %H:%M:%S")
+    return datetime.utcnow().strftime(TIMESTAMP_FORMAT)
 
 
+@timed()
 def read_json(path):
     """Read JSON list from file. Return empty list if file not found or invalid."""
     if not os.path.exists(path):
@@ -26,12 +45,412 @@ def read_json(path):
     return []
 
 
-def write_json(path, data):
-    """Write list to JSON file (pretty printed)."""
-    tmp = path + ".tmp"
+@timed()
+def write_json(path, data, expected_version=None):
+    """Write list to JSON file (pretty printed).
+
+    With expected_version (from file_version), raise
+    ConcurrentModificationError instead of overwriting a file that another
+    writer replaced since it was read.
+    """
+    tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
     with open(tmp, "w", encoding="utf-8") as f:
         json.dump(data, f, indent=2, ensure_ascii=False)
-    os.replace(tmp, path)
+        f.flush()
+        os.fsync(f.fileno())
+    with file_lock(path):
+        if expected_version is not None and file_version(path) != expected_version:
+            os.remove(tmp)
+            raise ConcurrentModificationError(path)
+        os.replace(tmp, path)
+
+
+def _fsync_dir(path):
+    """Make renames into the directory of path durable."""
+    fd = os.open(os.path.dirname(os.path.abspath(path)), os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+def journal_path(path):
+    """Return the append-only journal path that belongs to snapshot path."""
+    return os.path.splitext(path)[0] + ".jsonl"
+
+
+def _parse_lines(chunk, entries):
+    """Decode complete JSON lines from bytes into entries, skipping (with a
+    warning) lines that are not valid JSON."""
+    for line in chunk.splitlines():
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            entries.append(json.loads(line))
+        except ValueError:
+            log.warning("skipping unreadable journal line: %r", line[:80])
+
+
+def _read_journal(path, offset=0):
+    """Read entries from a JSON-lines file starting at byte offset.
+
+    Returns (entries, inode, end offset); only complete lines are consumed.
+    """
+    entries = []
+    try:
+        f = open(path, "rb")
+    except FileNotFoundError:
+        return entries, None, 0
+    with f:
+        inode = os.fstat(f.fileno()).st_ino
+        f.seek(offset)
+        chunk = f.read()
+    end = chunk.rfind(b"\n") + 1
+    _parse_lines(chunk[:end], entries)
+    return entries, inode, offset + end
+
+
+@timed()
+def load_entries_with_cursor(path):
+    """Return (entries, cursor) for the snapshot replayed with its journal.
+
+    The cursor can be passed to read_new_entries to pick up later appends.
+    """
+    jpath = journal_path(path)
+    segment = jpath + ".compacting"
+    while True:
+        version = file_version(path)
+        seg_version = file_version(segment)
+        journal_version = file_version(jpath)
+        data = read_json(path)
+        pending = _read_journal(segment)[0]
+        if pending:
+            # A compaction that died after writing the snapshot leaves its
+            # segment behind; skip whatever already made it into the snapshot.
+            seen = {e.get("id") for e in data}
+            data.extend(e for e in pending if e.get("id") not in seen)
+        tail, inode, offset = _read_journal(jpath)
+        data.extend(tail)
+        # A compaction running mid-read moves entries between files: it
+        # renames the journal to the segment, rewrites the snapshot and
+        # removes the segment. Appends only grow the journal.
+        if (
+            file_version(path) == version
+            and file_version(segment) == seg_version
+            and _only_grew(journal_version, file_version(jpath))
+        ):
+            return data, (version, seg_version, inode, offset)
+
+
+def _only_grew(before, after):
+    """Return True if the file versions differ at most by appends."""
+    if before is None:
+        return True
+    return after is not None and after[0] == before[0] and after[2] >= before[2]
+
+
+def load_entries(path):
+    """Return all entries: the JSON snapshot replayed with its journal."""
+    return load_entries_with_cursor(path)[0]
+
+
+@timed()
+def read_new_entries(path, cursor):
+    """Return (new entries, cursor) appended since cursor was taken.
+
+    Returns None when the snapshot was rewritten in the meantime and the
+    caller has to reload everything.
+    """
+    version, seg_version, inode, offset = cursor
+    jpath = journal_path(path)
+    if file_version(path) != version or file_version(jpath + ".compacting") != seg_version:
+        return None
+    tail, new_inode, new_offset = _read_journal(jpath, offset)
+    if new_inode is None:
+        return ([], cursor) if inode is None else None
+    if inode is not None and new_inode != inode:
+        return None
+    return tail, (version, seg_version, new_inode, new_offset)
+
+
+def append_entry(path, entry):
+    """Append a single entry to the journal of snapshot path."""
+    append_entries(path, [entry])
+
+
+@timed()
+def append_entries(path, entries):
+    """Append several entries to the journal with a single write."""
+    lines = "".join(json.dumps(e, ensure_ascii=False) + "\n" for e in entries)
+    if not lines:
+        return
+    jpath = journal_path(path)
+    with file_lock(jpath):
+        with open(jpath, "a+b") as f:
+            _drop_torn_tail(f, jpath)
+            start = f.tell()
+            f.write(lines.encode("utf-8"))
+            f.flush()
+            os.fsync(f.fileno())
+            size = f.tell()
+            inode = os.fstat(f.fileno()).st_ino
+        # Carry the journal's line count forward when it described the
+        # journal as it was before this write.
+        count = 0
+        if start:
+            meta = _read_journal_meta(jpath)
+            count = meta["count"] if meta and (meta["inode"], meta["size"]) == (inode, start) else None
+        if count is not None:
+            _write_journal_meta(jpath, inode, size, count + len(entries), entries[-1].get("id"))
+    if size >= COMPACT_THRESHOLD_BYTES:
+        try:
+            snapshot_size = os.path.getsize(path)
+        except OSError:
+            snapshot_size = 0
+        if size >= snapshot_size * COMPACT_RATIO:
+            compact_in_background(path)
+
+
+def _drop_torn_tail(f, jpath):
+    """Cut a partial last line, left by a crash mid-append, off journal f.
+
+    Its entry was never acknowledged; appending after it would glue the
+    next entry onto the torn line and lose that one too.
+    """
+    end = f.seek(0, os.SEEK_END)
+    if not end:
+        return
+    f.seek(end - 1)
+    if f.read(1) == b"\n":
+        return
+    # Scan back in blocks for the last complete line.
+    pos = end
+    while pos > 0:
+        start = max(0, pos - 65536)
+        f.seek(start)
+        newline = f.read(pos - start).rfind(b"\n")
+        if newline >= 0:
+            pos = start + newline + 1
+            break
+        pos = start
+    log.warning("dropping %d bytes of a torn line at the end of %s", end - pos, jpath)
+    f.truncate(pos)
+    f.seek(pos)
+
+
+@timed()
+def compact_journal(path):
+    """Fold the journal into the snapshot. Return False if already running."""
+    with file_lock(path + ".compact", blocking=False) as acquired:
+        if not acquired:
+            return False
+        jpath = journal_path(path)
+        segment = jpath + ".compacting"
+        recovering = os.path.exists(segment)
+        # New appends go to a fresh journal while the old one is folded in.
+        if not recovering:
+            with file_lock(jpath):
+                if not os.path.exists(jpath):
+                    return True
+                os.replace(jpath, segment)
+        folded = _read_journal(segment)[0]
+        while True:
+            version = file_version(path)
+            data = read_json(path)
+            if recovering:
+                seen = {e.get("id") for e in data}
+                data.extend(e for e in folded if e.get("id") not in seen)
+            else:
+                data.extend(folded)
+            try:
+                write_json(path, data, expected_version=version)
+                break
+            except ConcurrentModificationError:
+                continue
+        _write_meta(path, data)
+        # The segment holds acknowledged entries; drop it only once the
+        # snapshot that replaced it is on disk.
+        _fsync_dir(path)
+        os.remove(segment)
+        return True
+
+
+def replace_entries(path, entries):
+    """Replace the snapshot of path with entries.
+
+    Fold the journal in first (compact_journal) and keep appends out
+    meanwhile, or journal entries are replayed on top of the new snapshot.
+    """
+    write_json(path, entries)
+    _write_meta(path, entries)
+
+
+def _write_meta(path, data):
+    """Record the entry count of the snapshot so it can be read cheaply."""
+    meta = {
+        "version": file_version(path),
+        "count": len(data),
+        "last_id": data[-1].get("id") if data else None,
+    }
+    tmp = f"{path}.meta.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(meta, f)
+    os.replace(tmp, path + ".meta")
+
+
+def _snapshot_info(path):
+    version = file_version(path)
+    if version is None:
+        return 0, None
+    try:
+        with open(path + ".meta", "r", encoding="utf-8") as f:
+            meta = json.load(f)
+        if tuple(meta["version"]) == version:
+            return meta["count"], meta["last_id"]
+    except (OSError, ValueError, KeyError, TypeError):
+        pass
+    data = read_json(path)
+    if file_version(path) == version:
+        _write_meta(path, data)
+    return len(data), (data[-1].get("id") if data else None)
+
+
+def _read_journal_meta(jpath):
+    try:
+        with open(jpath + ".meta", "r", encoding="utf-8") as f:
+            meta = json.load(f)
+        return {k: meta[k] for k in ("inode", "size", "count", "last_id")}
+    except (OSError, ValueError, KeyError, TypeError):
+        return None
+
+
+def _write_journal_meta(jpath, inode, size, count, last_id):
+    """Record the line count and last id of the journal at inode and size,
+    so entry_count does not have to scan it."""
+    meta = {"inode": inode, "size": size, "count": count, "last_id": last_id}
+    tmp = f"{jpath}.meta.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(meta, f)
+    os.replace(tmp, jpath + ".meta")
+
+
+def _journal_info(path, remember=True):
+    try:
+        f = open(path, "rb")
+    except FileNotFoundError:
+        return 0, None
+    with f:
+        st = os.fstat(f.fileno())
+        meta = _read_journal_meta(path)
+        if meta and (meta["inode"], meta["size"]) == (st.st_ino, st.st_size):
+            return meta["count"], meta["last_id"]
+        chunk = f.read()
+    end = chunk.rfind(b"\n")
+    if end < 0:
+        return 0, None
+    last = chunk.rfind(b"\n", 0, end) + 1
+    try:
+        last_id = json.loads(chunk[last:end]).get("id")
+    except ValueError:
+        last_id = None
+    count = chunk.count(b"\n")
+    if remember and end == len(chunk) - 1:
+        _write_journal_meta(path, st.st_ino, len(chunk), count, last_id)
+    return count, last_id
+
+
+def entry_count(path):
+    """Return (number of entries, id of the last one) for snapshot path.
+
+    The snapshot count comes from the metadata written at compaction and
+    the journal's from the metadata appends keep up to date, so nothing is
+    scanned unless one of them is stale.
+    """
+    jpath = journal_path(path)
+    while True:
+        version = file_version(path)
+        count, last_id = _snapshot_info(path)
+        for part, remember in ((jpath + ".compacting", False), (jpath, True)):
+            n, part_last = _journal_info(part, remember)
+            if n:
+                count, last_id = count + n, part_last
+        if file_version(path) == version:
+            return count, last_id
+
+
+def compact_in_background(path):
+    """Start journal compaction on a worker thread and return the thread."""
+    worker = threading.Thread(target=compact_journal, args=(path,), name="journal-compact")
+    worker.start()
+    return worker
+
+
+def parse_timestamp(text):
+    """Parse a TIMESTAMP_FORMAT string; much faster than strptime in bulk."""
+    if len(text) != 19 or text[10] != " ":
+        raise ValueError(f"not a {TIMESTAMP_FORMAT} timestamp: {text!r}")
+    return datetime.fromisoformat(text)
+
+
+def timestamp_bound(text):
+    """Return a range bound in TIMESTAMP_FORMAT; a bare "%Y-%m-%d" date
+    means midnight. Any other string raises ValueError rather than
+    silently leaving the range open."""
+    if len(text) == 10:
+        text += " 00:00:00"
+    parse_timestamp(text)
+    return text
+
+
+def _score(raw, name, minimum, maximum, default=None):
+    value = raw if raw not in (None, "") else default
+    if value is None:
+        raise ValueError(f"{name} is required")
+    try:
+        value = int(value)
+    except (TypeError, ValueError):
+        raise ValueError(f"{name} must be an integer") from None
+    if not minimum <= value <= maximum:
+        raise ValueError(f"{name} must be between {minimum} and {maximum}")
+    return value
+
+
+def normalize_entry(raw):
+    """Validate a raw entry and return it in the stored shape.
+
+    Accepts nested feelings or flattened feeling_* / bare feeling columns
+    (as written by the exporters), and string numbers. Raises ValueError
+    describing the first problem found.
+    """
+    trigger = str(raw.get("trigger") or "").strip()
+    if not trigger:
+        raise ValueError("trigger is required")
+    timestamp = str(raw.get("timestamp") or "").strip().replace("T", " ")
+    try:
+        parse_timestamp(timestamp)
+    except ValueError:
+        raise ValueError(f"timestamp must look like 2024-01-31 18:05:00, got {timestamp!r}") from None
+    nested = raw.get("feelings") if isinstance(raw.get("feelings"), dict) else {}
+    feelings = {}
+    for k in FEELINGS:
+        value = nested.get(k, raw.get(f"feeling_{k}", raw.get(k)))
+        feelings[k] = _score(value, k, 0, 10, default=0)
+    entry_id = raw.get("id")
+    if entry_id not in (None, ""):
+        entry_id = _score(entry_id, "id", 0, 2**63 - 1)
+    else:
+        entry_id = None
+    return {
+        "id": entry_id,
+        "timestamp": timestamp,
+        "trigger": trigger,
+        "before": str(raw.get("before") or "").strip(),
+        "after": str(raw.get("after") or "").strip(),
+        "feelings": feelings,
+        "intensity": _score(raw.get("intensity"), "intensity", INTENSITY_MIN, INTENSITY_MAX),
+        "notes": str(raw.get("notes") or "").strip(),
+    }
 
 
 def prompt_int(prompt_text, minimum=0, maximum=10, default=0):
@@ -0,0 +1,139 @@
+"""
+Bulk import for Trigger Tracker.
+Streams CSV, JSON or JSON-lines histories in chunks, parses and validates
+them on a process pool, and appends each deduplicated batch in one write.
+"""
+
+import csv
+import gzip
+import json
+import os
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from multiprocessing import get_context
+
+from utils.helpers import normalize_entry, parse_timestamp
+
+CHUNK_ROWS = 5000
+
+
+def _open_text(path):
+    if path.endswith(".gz"):
+        return gzip.open(path, "rt", newline="", encoding="utf-8")
+    return open(path, "r", newline="", encoding="utf-8")
+
+
+def _kind(path):
+    name = path[:-3] if path.endswith(".gz") else path
+    ext = os.path.splitext(name)[1].lower()
+    if ext == ".csv":
+        return "csv"
+    if ext in (".jsonl", ".ndjson"):
+        return "jsonl"
+    if ext == ".json":
+        return "json"
+    raise ValueError(f"Unsupported import format: {path} (use .csv, .json or .jsonl)")
+
+
+def read_chunks(path, chunk_rows=CHUNK_ROWS):
+    """Yield lists of raw records (dicts or JSON lines) from path.
+
+    CSV and JSON-lines files are streamed; a .json file holds one list
+    and has to be parsed whole before it is chunked. .gz files are
+    decompressed on the fly.
+    """
+    kind = _kind(path)
+    with _open_text(path) as f:
+        if kind == "json":
+            records = json.load(f)
+            if not isinstance(records, list):
+                raise ValueError(f"{path} does not contain a JSON list")
+            source = iter(records)
+        elif kind == "csv":
+            source = csv.DictReader(f)
+        else:
+            source = (line for line in f if line.strip())
+        chunk = []
+        for record in source:
+            chunk.append(record)
+            if len(chunk) >= chunk_rows:
+                yield chunk
+                chunk = []
+        if chunk:
+            yield chunk
+
+
+def parse_chunk(records):
+    """Validate a chunk of raw records. Returns (entries, errors)."""
+    entries, errors = [], []
+    for record in records:
+        try:
+            if isinstance(record, str):
+                record = json.loads(record)
+            entries.append(normalize_entry(record))
+        except (ValueError, AttributeError) as exc:
+            errors.append(str(exc))
+    return entries, errors
+
+
+def _parsed(chunks, workers):
+    """Yield parse_chunk results in order, keeping a bounded number in flight."""
+    if workers <= 1:
+        for chunk in chunks:
+            yield parse_chunk(chunk)
+        return
+    # spawn, not fork, like utils.mapreduce: the batches appended meanwhile
+    # start journal compaction on a background thread, and a forked child
+    # could inherit a lock it held.
+    with ProcessPoolExecutor(max_workers=workers, mp_context=get_context("spawn")) as pool:
+        pending = deque()
+        for chunk in chunks:
+            pending.append(pool.submit(parse_chunk, chunk))
+            if len(pending) >= workers * 2:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+
+
+def _fallback_id(entry):
+    dt = parse_timestamp(entry["timestamp"])
+    return int((dt - datetime(1970, 1, 1)).total_seconds() * 1000)
+
+
+def import_file(store, path, workers=None, chunk_rows=CHUNK_ROWS, known_ids=None, progress=None):
+    """Import entries from path into store.
+
+    Entries whose id is already stored or repeated in the file are skipped;
+    entries without an id get one derived from their timestamp. Each
+    chunk is appended with a single store.extend. Returns a dict of
+    read/imported/duplicates/invalid counts and the first few errors.
+    """
+    workers = workers or os.cpu_count() or 1
+    if known_ids is None:
+        known_ids = {e.get("id") for e in store.iter_all()}
+    seen = set(known_ids)
+    result = {"read": 0, "imported": 0, "duplicates": 0, "invalid": 0, "errors": []}
+
+    for entries, errors in _parsed(read_chunks(path, chunk_rows), workers):
+        result["read"] += len(entries) + len(errors)
+        result["invalid"] += len(errors)
+        if len(result["errors"]) < 10:
+            result["errors"].extend(errors[:10 - len(result["errors"])])
+        batch = []
+        for e in entries:
+            if e["id"] is None:
+                e["id"] = _fallback_id(e)
+                while e["id"] in seen:
+                    e["id"] += 1
+            elif e["id"] in seen:
+                result["duplicates"] += 1
+                continue
+            seen.add(e["id"])
+            batch.append(e)
+        if batch:
+            store.extend(batch)
+            result["imported"] += len(batch)
+        if progress:
+            progress(result)
+    return result
@@ -0,0 +1,113 @@
+"""
+Locking helpers for Trigger Tracker.
+Cross-process file locks and in-process group commit for concurrent writers.
+"""
+
+import os
+import threading
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+
+class ConcurrentModificationError(Exception):
+    """Raised when a file changed between reading it and writing it back."""
+
+
+def file_version(path):
+    """Return a token that changes whenever path is replaced or modified."""
+    try:
+        st = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return (st.st_ino, st.st_mtime_ns, st.st_size)
+
+
+@contextmanager
+def file_lock(path, blocking=True):
+    """Hold an exclusive lock on path + ".lock" across processes.
+
+    Yields True once the lock is held. With blocking=False, yields False
+    instead of waiting when another holder has it.
+    """
+    fd = os.open(path + ".lock", os.O_RDWR | os.O_CREAT, 0o644)
+    try:
+        try:
+            if fcntl is not None:
+                fcntl.flock(fd, fcntl.LOCK_EX if blocking else fcntl.LOCK_EX | fcntl.LOCK_NB)
+            else:
+                msvcrt.locking(fd, msvcrt.LK_LOCK if blocking else msvcrt.LK_NBLCK, 1)
+        except OSError:
+            if blocking:
+                raise
+            yield False
+            return
+        try:
+            yield True
+        finally:
+            if fcntl is not None:
+                fcntl.flock(fd, fcntl.LOCK_UN)
+            else:
+                os.lseek(fd, 0, os.SEEK_SET)
+                msvcrt.locking(fd, msvcrt.LK_UNLCK, 1)
+    finally:
+        os.close(fd)
+
+
+class GroupCommit:
+    """Coalesce appends that arrive together into a single batch write.
+
+    The first thread to submit becomes the leader and writes everything
+    queued so far with one call to write_batch; threads that submit while
+    it is busy wait and are committed together in the next batch.
+    """
+
+    def __init__(self, write_batch):
+        self._write_batch = write_batch
+        self._cond = threading.Condition()
+        self._pending = []
+        self._writing = False
+
+    def submit(self, entries):
+        """Queue entries and return once they have been written."""
+        ticket = {"done": False, "error": None}
+        with self._cond:
+            self._pending.append((list(entries), ticket))
+            while not ticket["done"]:
+                if self._writing:
+                    self._cond.wait()
+                    continue
+                batch, self._pending = self._pending, []
+                self._writing = True
+                self._cond.release()
+                error = None
+                try:
+                    self._write_batch([e for chunk, _ in batch for e in chunk])
+                except Exception as exc:
+                    error = exc
+                finally:
+                    self._cond.acquire()
+                    self._writing = False
+                for _, t in batch:
+                    t["done"] = True
+                    t["error"] = error
+                self._cond.notify_all()
+        if ticket["error"] is not None:
+            raise ticket["error"]
+
+
+_committers = {}
+_committers_lock = threading.Lock()
+
+
+def group_commit_for(key, write_batch):
+    """Return the process-wide GroupCommit for key, creating it on first use."""
+    with _committers_lock:
+        committer = _committers.get(key)
+        if committer is None:
+            committer = _committers[key] = GroupCommit(write_batch)
+        return committer
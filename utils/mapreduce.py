@@ -0,0 +1,63 @@
+"""
+Process-pool aggregation for Trigger Tracker.
+Splits a store into pieces its files can be read in (Storage.parts),
+builds partial Rollups of each piece in worker processes and merges them
+in order, so building the rollups of a large history uses every core.
+Stores that are only read whole, like the JSON snapshot, are aggregated
+in this process. The merged result equals the
+serial one: counts and sums exactly, covariance to rounding.
+"""
+
+import os
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import get_context
+
+from utils.profiling import timed
+from utils.rollups import Rollups
+
+# Worker processes for analytics; defaults to the number of CPUs.
+WORKERS_ENV = "TRIGGER_TRACKER_WORKERS"
+# Entries per piece. A store with fewer entries is aggregated serially,
+# since starting workers would cost more than it saves.
+PART_ENTRIES = 50000
+
+
+def default_workers():
+    """Return TRIGGER_TRACKER_WORKERS, else the number of CPUs."""
+    try:
+        return max(1, int(os.environ[WORKERS_ENV]))
+    except (KeyError, ValueError):
+        return os.cpu_count() or 1
+
+
+def partial_rollups(part):
+    """Rollups of one piece; runs in a worker process."""
+    func, args = part
+    rollups = Rollups()
+    rollups.add(func(*args))
+    return rollups
+
+
+def merge_rollups(partials):
+    """Merge partial Rollups given in insertion order."""
+    total = Rollups()
+    for partial in partials:
+        total.merge(partial)
+    return total
+
+
+@timed()
+def build_rollups(store, workers=None, part_entries=PART_ENTRIES):
+    """Return Rollups over every entry of store, built on `workers`
+    processes (default_workers() when None)."""
+    workers = workers or default_workers()
+    if workers > 1 and store.tail_info()[0] > part_entries:
+        parts = store.parts(part_entries)
+        if parts is not None and len(parts) > 1:
+            # spawn, not fork: the Streamlit server runs threads, and a
+            # forked child could inherit a lock one of them held.
+            with ProcessPoolExecutor(min(workers, len(parts)), mp_context=get_context("spawn")) as pool:
+                return merge_rollups(pool.map(partial_rollups, parts))
+    rollups = Rollups()
+    rollups.add(store.iter_all())
+    return rollups
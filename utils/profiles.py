@@ -0,0 +1,46 @@
+"""
+Per-user data namespaces for Trigger Tracker.
+Each profile keeps its entries (in whichever backend is configured), rollups
+and search index in its own directory under data/profiles/. The default
+profile is the top-level data directory used before profiles existed.
+"""
+
+import os
+import re
+
+from utils.storage import DATA_DIR, open_storage
+
+PROFILES_DIR = os.path.join(DATA_DIR, "profiles")
+DEFAULT_PROFILE = "default"
+
+_NAME_RE = re.compile(r"[A-Za-z0-9][A-Za-z0-9_.-]{0,63}")
+
+
+def valid_name(name):
+    """Return True if name is usable as a profile (and directory) name."""
+    return bool(name) and bool(_NAME_RE.fullmatch(name)) and ".." not in name
+
+
+def profile_dir(name):
+    """Return the data directory of profile name."""
+    if name in (None, "", DEFAULT_PROFILE):
+        return DATA_DIR
+    if not valid_name(name):
+        raise ValueError(f"invalid profile name {name!r}: use letters, digits, '.', '_' or '-'")
+    return os.path.join(PROFILES_DIR, name)
+
+
+def list_profiles():
+    """Return the default profile followed by every existing profile, sorted."""
+    try:
+        names = sorted(n for n in os.listdir(PROFILES_DIR) if valid_name(n) and n != DEFAULT_PROFILE)
+    except FileNotFoundError:
+        names = []
+    return [DEFAULT_PROFILE] + names
+
+
+def open_profile(name):
+    """Open the store of profile name, creating its directory if needed."""
+    data_dir = profile_dir(name)
+    os.makedirs(data_dir, exist_ok=True)
+    return open_storage(data_dir=data_dir)
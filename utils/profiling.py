@@ -0,0 +1,174 @@
+"""
+Lightweight timing instrumentation for Trigger Tracker.
+Spans are recorded per run (one Streamlit rerun or one CLI command) when
+TRIGGER_TRACKER_PROFILE is set; otherwise every hook is a flag check.
+"""
+
+import functools
+import os
+import sys
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager, nullcontext
+
+PROFILE_ENV = "TRIGGER_TRACKER_PROFILE"
+
+# Finished runs kept for the Diagnostics page.
+KEEP_RUNS = 50
+
+_enabled = os.environ.get(PROFILE_ENV, "").lower() not in ("", "0", "false", "no")
+_local = threading.local()
+_runs = deque(maxlen=KEEP_RUNS)
+_runs_lock = threading.Lock()
+_NULL = nullcontext()
+
+
+def enabled():
+    return _enabled
+
+
+def enable(on=True):
+    """Turn recording on or off for the whole process."""
+    global _enabled
+    _enabled = on
+
+
+class Run:
+    """Spans recorded during one rerun or command.
+
+    Each record is (name, seconds, self seconds, depth); self time excludes
+    nested spans.
+    """
+
+    def __init__(self, label):
+        self.label = label
+        self.started = time.time()
+        self.records = []
+        self.total = None
+        self._stack = []
+        self._t0 = time.perf_counter()
+        # Start of the current checkpoint section and the span time in it.
+        self._mark = self._t0
+        self._in_section = 0.0
+
+    def finish(self):
+        self.total = time.perf_counter() - self._t0
+
+    def breakdown(self):
+        """Return [(name, calls, total seconds, self seconds)], slowest first."""
+        rows = {}
+        for name, seconds, own, _ in self.records:
+            row = rows.setdefault(name, [name, 0, 0.0, 0.0])
+            row[1] += 1
+            row[2] += seconds
+            row[3] += own
+        return sorted((tuple(r) for r in rows.values()), key=lambda r: r[3], reverse=True)
+
+
+def start_run(label):
+    """Begin recording a new run on this thread; returns it (None when off)."""
+    if not _enabled:
+        _local.run = None
+        return None
+    _local.run = Run(label)
+    return _local.run
+
+
+def finish_run():
+    """Close the run of this thread and keep it in the history."""
+    run = getattr(_local, "run", None)
+    _local.run = None
+    if run is None:
+        return None
+    run.finish()
+    with _runs_lock:
+        _runs.append(run)
+    return run
+
+
+def recent_runs():
+    """Return finished runs, newest first."""
+    with _runs_lock:
+        return list(reversed(_runs))
+
+
+@contextmanager
+def _span(run, name):
+    started = time.perf_counter()
+    run._stack.append(0.0)
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - started
+        children = run._stack.pop()
+        if run._stack:
+            run._stack[-1] += elapsed
+        else:
+            run._in_section += elapsed
+        run.records.append((name, elapsed, elapsed - children, len(run._stack)))
+
+
+def span(name):
+    """Context manager timing a block as one span of the current run."""
+    run = getattr(_local, "run", None) if _enabled else None
+    if run is None:
+        return _NULL
+    return _span(run, name)
+
+
+def timed(name=None):
+    """Decorator recording each call of a function as a span."""
+    def decorate(fn):
+        label = name or f"{fn.__module__.rpartition('.')[2]}.{fn.__qualname__}"
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            if not _enabled:
+                return fn(*args, **kwargs)
+            with span(label):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorate
+
+
+def checkpoint(name):
+    """Record the time since the previous checkpoint as a section called name.
+
+    Meant for straight-line scripts such as app.py, where wrapping each
+    section in a with-block would re-indent the whole page. Spans that ran
+    in the section count towards its total but not its self time.
+    """
+    run = getattr(_local, "run", None) if _enabled else None
+    if run is None or run._stack:
+        return
+    now = time.perf_counter()
+    elapsed = now - run._mark
+    run.records.append((name, elapsed, elapsed - run._in_section, 0))
+    run._mark, run._in_section = now, 0.0
+
+
+def format_breakdown(run, limit=20):
+    """Return a plain-text table of a run, for the CLI."""
+    lines = [f"{run.label}: {run.total * 1000:.1f} ms"]
+    lines.append(f"  {'span':<36} {'calls':>5} {'total ms':>10} {'self ms':>10}")
+    for name, calls, total, own in run.breakdown()[:limit]:
+        lines.append(f"  {name:<36} {calls:>5} {total * 1000:>10.1f} {own * 1000:>10.1f}")
+    return "\n".join(lines)
+
+
+@contextmanager
+def cprofile(path, limit=25, stream=None):
+    """Run the block under cProfile, dump the stats to path and print the
+    top functions by cumulative time to stream (stderr by default)."""
+    import cProfile
+    import pstats
+
+    profiler = cProfile.Profile()
+    profiler.enable()
+    try:
+        yield profiler
+    finally:
+        profiler.disable()
+        profiler.dump_stats(path)
+        pstats.Stats(profiler, stream=stream or sys.stderr).sort_stats("cumulative").print_stats(limit)
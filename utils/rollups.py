@@ -0,0 +1,382 @@
+"""
+Materialised rollups for Trigger Tracker.
+Running counts and sums per day, hour and trigger, plus the covariance of
+the feeling and intensity scores, kept next to the data file and updated
+with every append so dashboards never scan the history.
+"""
+
+import json
+import math
+import os
+import threading
+from collections import Counter, OrderedDict
+from contextlib import contextmanager
+from datetime import date, datetime, timedelta
+from operator import mul
+
+from utils.helpers import FEELINGS, parse_timestamp
+from utils.locking import file_lock, file_version
+from utils.profiling import timed
+
+_FORMAT = 2
+
+# Scores whose covariance is tracked, in matrix order.
+SCORES = FEELINGS + ("intensity",)
+# Per-day covariance buckets are kept for this many days back from the
+# newest entry, which bounds the longest window covariance can answer.
+WINDOW_DAYS = 90
+
+_PAIRS = [(i, j) for i in range(len(SCORES)) for j in range(i, len(SCORES))]
+
+
+def rollups_path(path):
+    """Return the rollups file that belongs to a data file."""
+    return path + ".rollups"
+
+
+def _scores(entry):
+    feelings = entry.get("feelings") or {}
+    return [feelings.get(k, 0) for k in FEELINGS] + [entry.get("intensity") or 0]
+
+
+class Comoments:
+    """Count, mean and co-moments of the scores.
+
+    m2 holds the upper triangle of the sum of products of deviations from
+    the mean, in _PAIRS order. Accumulators over disjoint sets of entries
+    combine with merge, the pairwise form of Welford's update (Chan et
+    al.), which never subtracts large sums and so stays accurate however
+    many entries are folded in. Appends and day-bucket windows both work
+    by merging.
+    """
+
+    __slots__ = ("n", "mean", "m2")
+
+    def __init__(self, n=0, mean=None, m2=None):
+        self.n = n
+        self.mean = mean or [0.0] * len(SCORES)
+        self.m2 = m2 or [0.0] * len(_PAIRS)
+
+    @classmethod
+    def of(cls, rows):
+        """Accumulator of a list of score rows, computed in two passes."""
+        n = len(rows)
+        if not n:
+            return cls()
+        columns = list(zip(*rows))
+        mean = [sum(c) / n for c in columns]
+        deviations = [[v - m for v in c] for c, m in zip(columns, mean)]
+        m2 = [sum(map(mul, deviations[i], deviations[j])) for i, j in _PAIRS]
+        return cls(n, mean, m2)
+
+    def merge(self, other):
+        """Fold the accumulator of another, disjoint set of entries into this one."""
+        if not other.n:
+            return self
+        if not self.n:
+            self.n, self.mean, self.m2 = other.n, list(other.mean), list(other.m2)
+            return self
+        n = self.n + other.n
+        delta = [b - a for a, b in zip(self.mean, other.mean)]
+        weight = self.n * other.n / n
+        self.mean = [a + d * other.n / n for a, d in zip(self.mean, delta)]
+        self.m2 = [
+            a + b + delta[i] * delta[j] * weight
+            for (i, j), a, b in zip(_PAIRS, self.m2, other.m2)
+        ]
+        self.n = n
+        return self
+
+    def correlation(self):
+        """Return the Pearson correlation matrix of SCORES as nested lists,
+        with NaN where a score has no variance (as DataFrame.corr does)."""
+        size = len(SCORES)
+        full = [[0.0] * size for _ in range(size)]
+        for (i, j), v in zip(_PAIRS, self.m2):
+            full[i][j] = full[j][i] = v
+        corr = [[math.nan] * size for _ in range(size)]
+        for i in range(size):
+            for j in range(size):
+                denom = math.sqrt(full[i][i] * full[j][j])
+                if self.n > 1 and denom > 0:
+                    corr[i][j] = max(-1.0, min(1.0, full[i][j] / denom))
+        return corr
+
+    def to_list(self):
+        return [self.n, self.mean, self.m2]
+
+    @classmethod
+    def from_list(cls, raw):
+        return cls(raw[0], list(raw[1]), list(raw[2]))
+
+
+class Rollups:
+    """Running aggregates over every entry of a store.
+
+    per_day maps "YYYY-MM-DD" and per_trigger maps the stripped trigger to
+    [count, intensity sum]; per_hour holds 24 counts. moments covers every
+    entry and day_moments the last WINDOW_DAYS days, by date. count and
+    last_id identify the entries covered, for drift checks against the
+    store.
+    """
+
+    def __init__(self):
+        self.count = 0
+        self.last_id = None
+        self.intensity_sum = 0
+        self.feeling_sums = {k: 0 for k in FEELINGS}
+        self.per_day = {}
+        self.per_hour = [0] * 24
+        self.per_trigger = {}
+        self.moments = Comoments()
+        self.day_moments = {}
+
+    def add(self, entries):
+        """Fold entries into the running aggregates."""
+        # Scores are grouped by day, summarised per group and merged, so the
+        # stored accumulators take one merge per day of the batch.
+        batch = {}
+        for e in entries:
+            intensity = e.get("intensity") or 0
+            feelings = e.get("feelings") or {}
+            self.count += 1
+            self.last_id = e.get("id")
+            self.intensity_sum += intensity
+            for k in FEELINGS:
+                self.feeling_sums[k] += feelings.get(k, 0)
+            trig = e.get("trigger")
+            if trig:
+                slot = self.per_trigger.setdefault(trig.strip(), [0, 0])
+                slot[0] += 1
+                slot[1] += intensity
+            try:
+                dt = parse_timestamp(e.get("timestamp") or "")
+            except ValueError:
+                batch.setdefault(None, []).append(_scores(e))
+                continue
+            day = dt.date().isoformat()
+            batch.setdefault(day, []).append(_scores(e))
+            slot = self.per_day.setdefault(day, [0, 0])
+            slot[0] += 1
+            slot[1] += intensity
+            self.per_hour[dt.hour] += 1
+        for day, rows in batch.items():
+            moments = Comoments.of(rows)
+            self.moments.merge(moments)
+            if day is not None:
+                self.day_moments[day] = self.day_moments.get(day, Comoments()).merge(moments)
+        self._prune()
+
+    def merge(self, other):
+        """Fold in the rollups of entries added after the ones covered here.
+
+        Counts and sums add up exactly and the covariance accumulators
+        merge like Comoments.merge, so rollups built over consecutive
+        chunks and merged in order equal rollups built in one pass.
+        """
+        if not other.count:
+            return self
+        self.count += other.count
+        self.last_id = other.last_id
+        self.intensity_sum += other.intensity_sum
+        for k in FEELINGS:
+            self.feeling_sums[k] += other.feeling_sums[k]
+        for own, theirs in ((self.per_day, other.per_day), (self.per_trigger, other.per_trigger)):
+            for key, (count, total) in theirs.items():
+                slot = own.setdefault(key, [0, 0])
+                slot[0] += count
+                slot[1] += total
+        self.per_hour = [a + b for a, b in zip(self.per_hour, other.per_hour)]
+        self.moments.merge(other.moments)
+        for day, moments in other.day_moments.items():
+            self.day_moments[day] = self.day_moments.get(day, Comoments()).merge(moments)
+        self._prune()
+        return self
+
+    def _prune(self):
+        # A day dropped here is older than WINDOW_DAYS before the newest
+        # day, so it stays out of range once more entries are merged in.
+        if self.day_moments:
+            newest = date.fromisoformat(max(self.day_moments))
+            oldest = (newest - timedelta(days=WINDOW_DAYS - 1)).isoformat()
+            for day in [d for d in self.day_moments if d < oldest]:
+                del self.day_moments[day]
+
+    def to_dict(self):
+        return {
+            "format": _FORMAT,
+            "count": self.count,
+            "last_id": self.last_id,
+            "intensity_sum": self.intensity_sum,
+            "feeling_sums": self.feeling_sums,
+            "per_day": self.per_day,
+            "per_hour": self.per_hour,
+            "per_trigger": self.per_trigger,
+            "moments": self.moments.to_list(),
+            "day_moments": {d: m.to_list() for d, m in self.day_moments.items()},
+        }
+
+    @classmethod
+    def from_dict(cls, raw):
+        r = cls()
+        if raw.get("format") != _FORMAT:
+            return r
+        r.count = raw["count"]
+        r.last_id = raw["last_id"]
+        r.intensity_sum = raw["intensity_sum"]
+        r.feeling_sums = raw["feeling_sums"]
+        r.per_day = raw["per_day"]
+        r.per_hour = raw["per_hour"]
+        r.per_trigger = raw["per_trigger"]
+        r.moments = Comoments.from_list(raw["moments"])
+        r.day_moments = {d: Comoments.from_list(m) for d, m in raw["day_moments"].items()}
+        return r
+
+    # Reads; none of these depend on the number of entries.
+    def average_intensity(self):
+        return self.intensity_sum / self.count if self.count else 0
+
+    def averages(self):
+        """Average score per feeling, like stats.average_emotion_scores."""
+        if not self.count:
+            return {k: 0 for k in FEELINGS}
+        return {k: self.feeling_sums[k] / self.count for k in FEELINGS}
+
+    def triggers(self):
+        """Counter of triggers, like stats.count_triggers."""
+        return Counter({t: c for t, (c, _) in self.per_trigger.items()})
+
+    def count_last_days(self, days, today=None):
+        """Entries logged on the last `days` calendar days, today included."""
+        today = today or datetime.utcnow().date()
+        return sum(
+            self.per_day.get((today - timedelta(days=i)).isoformat(), (0, 0))[0]
+            for i in range(days)
+        )
+
+    def days(self):
+        """Return [(date, count)] ordered by date."""
+        return [(d, v[0]) for d, v in sorted(self.per_day.items())]
+
+    def summary(self):
+        """The figures of `main.py summary --json` as a dict."""
+        return {
+            "count": self.count,
+            "average_intensity": self.average_intensity(),
+            "averages": self.averages(),
+            "triggers": dict(self.triggers().most_common()),
+            "per_day": dict(self.days()),
+        }
+
+    def covariance(self, days=None, today=None):
+        """Comoments of every entry, or of the last `days` calendar days
+        (today included, at most WINDOW_DAYS) merged from the day buckets."""
+        if days is None:
+            return self.moments
+        if days > WINDOW_DAYS:
+            raise ValueError(f"covariance windows are limited to {WINDOW_DAYS} days")
+        today = today or datetime.utcnow().date()
+        total = Comoments()
+        for i in range(days):
+            bucket = self.day_moments.get((today - timedelta(days=i)).isoformat())
+            if bucket is not None:
+                total.merge(bucket)
+        return total
+
+
+def _load(rpath):
+    try:
+        with open(rpath, "r", encoding="utf-8") as f:
+            return Rollups.from_dict(json.load(f))
+    except (OSError, ValueError, KeyError):
+        return Rollups()
+
+
+def _save(rpath, rollups):
+    tmp = f"{rpath}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(rollups.to_dict(), f, ensure_ascii=False, separators=(",", ":"))
+    os.replace(tmp, rpath)
+
+
+# Parsed rollups kept per file, least recently used dropped first.
+KEEP_LOADED = 256
+
+_loaded = OrderedDict()
+_loaded_lock = threading.Lock()
+
+
+def _remember(rpath, version, rollups):
+    with _loaded_lock:
+        _loaded[rpath] = (version, rollups)
+        _loaded.move_to_end(rpath)
+        while len(_loaded) > KEEP_LOADED:
+            _loaded.popitem(last=False)
+
+
+def _load_cached(rpath):
+    """Load rollups, reusing the parsed copy while the file is unchanged."""
+    version = file_version(rpath)
+    with _loaded_lock:
+        hit = _loaded.get(rpath)
+        if hit and hit[0] == version:
+            _loaded.move_to_end(rpath)
+            return hit[1]
+    rollups = _load(rpath)
+    _remember(rpath, version, rollups)
+    return rollups
+
+
+@contextmanager
+def updating(path):
+    """Hold the rollups lock of a data file and yield its Rollups.
+
+    Writers append entries inside this block and add them to the yielded
+    rollups, which are saved if the block succeeds. Holding the lock over
+    both steps keeps a concurrent rebuild from double counting.
+    """
+    rpath = rollups_path(path)
+    with file_lock(rpath):
+        rollups = _load_cached(rpath)
+        yield rollups
+        _save(rpath, rollups)
+        _remember(rpath, file_version(rpath), rollups)
+
+
+@timed()
+def current_rollups(store):
+    """Return up-to-date rollups of store, rebuilding them if they drifted.
+
+    Drift (entries written without updating the rollups, a restored backup,
+    a hand-edited file) is detected by comparing the covered count and last
+    id with the store.
+    """
+    rpath = rollups_path(store.path)
+    rollups = _load_cached(rpath)
+    if (rollups.count, rollups.last_id) == store.tail_info():
+        return rollups
+    with file_lock(rpath):
+        rollups = _load(rpath)
+        if (rollups.count, rollups.last_id) != store.tail_info():
+            rollups = _rebuild(store, rpath)
+    return rollups
+
+
+def rebuild_rollups(store, workers=None):
+    """Recompute the rollups of store from every entry and save them.
+
+    Large stores are aggregated on `workers` processes (see
+    utils.mapreduce); None uses TRIGGER_TRACKER_WORKERS or every CPU.
+    """
+    rpath = rollups_path(store.path)
+    with file_lock(rpath):
+        return _rebuild(store, rpath, workers)
+
+
+def _rebuild(store, rpath, workers=None):
+    from utils.mapreduce import build_rollups
+
+    rollups = build_rollups(store, workers)
+    _save(rpath, rollups)
+    _remember(rpath, file_version(rpath), rollups)
+    return rollups
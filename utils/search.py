@@ -0,0 +1,228 @@
+"""
+Full-text search for Trigger Tracker.
+An inverted token index over trigger, before, after and notes, persisted
+next to the data file and caught up incrementally as entries are added.
+"""
+
+import json
+import math
+import os
+import re
+import threading
+from bisect import bisect_left
+
+from utils.profiling import timed
+
+SEARCH_FIELDS = ("trigger", "before", "after", "notes")
+
+# Rewrite the index file once this many documents were added since the last save.
+SAVE_EVERY = 500
+
+_TOKEN_RE = re.compile(r"\w+")
+_INDEX_FORMAT = 1
+
+
+def tokenize(text):
+    """Split text into lowercase word tokens."""
+    return _TOKEN_RE.findall((text or "").lower())
+
+
+def index_path(path):
+    """Return the index file that belongs to a data file."""
+    return path + ".index"
+
+
+def parse_query(query, prefix=False):
+    """Parse a query into (field or None, token, is_prefix) terms.
+
+    Terms are ANDed. "notes:work" restricts a term to one field and a
+    trailing "*" matches any token starting with the term; prefix=True
+    treats every term that way.
+    """
+    terms = []
+    for raw in query.split():
+        field = None
+        if ":" in raw:
+            name, _, rest = raw.partition(":")
+            if name.lower() in SEARCH_FIELDS:
+                field, raw = name.lower(), rest
+        is_prefix = prefix or raw.endswith("*")
+        for token in tokenize(raw.rstrip("*")):
+            terms.append((field, token, is_prefix))
+    return terms
+
+
+class SearchIndex:
+    """Inverted index from (field, token) to document postings.
+
+    Documents are numbered by their position in the store, so the index
+    only ever needs the entries appended since it was last brought up to
+    date. Each postings list is a flat [doc, tf, doc, tf, ...] list in
+    increasing doc order.
+    """
+
+    def __init__(self, path=None):
+        self.path = path
+        self.postings = {f: {} for f in SEARCH_FIELDS}
+        self.timestamps = []
+        self.last_id = None
+        self.saved_docs = 0
+        self._vocab = {}
+        self._lock = threading.RLock()
+
+    def __len__(self):
+        return len(self.timestamps)
+
+    def nbytes(self):
+        """Rough memory held by the postings and timestamps."""
+        with self._lock:
+            tokens = sum(len(table) for table in self.postings.values())
+            postings = sum(len(p) for table in self.postings.values() for p in table.values())
+        # A list slot plus a small int, and a dict entry with its key string.
+        return 16 * postings + 120 * tokens + 36 * len(self.timestamps)
+
+    @classmethod
+    def load(cls, path):
+        """Load a saved index, or return an empty one."""
+        index = cls(path)
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                raw = json.load(f)
+        except (OSError, ValueError):
+            return index
+        if raw.get("format") != _INDEX_FORMAT:
+            return index
+        index.postings = {f: raw["postings"].get(f, {}) for f in SEARCH_FIELDS}
+        index.timestamps = raw["timestamps"]
+        index.last_id = raw.get("last_id")
+        index.saved_docs = len(index.timestamps)
+        return index
+
+    def save(self):
+        """Write the index next to the data file."""
+        if not self.path:
+            return
+        with self._lock:
+            raw = {
+                "format": _INDEX_FORMAT,
+                "postings": self.postings,
+                "timestamps": self.timestamps,
+                "last_id": self.last_id,
+            }
+            tmp = f"{self.path}.{os.getpid()}.{threading.get_ident()}.tmp"
+            with open(tmp, "w", encoding="utf-8") as f:
+                json.dump(raw, f, ensure_ascii=False, separators=(",", ":"))
+            os.replace(tmp, self.path)
+            self.saved_docs = len(self.timestamps)
+
+    def clear(self):
+        with self._lock:
+            self.postings = {f: {} for f in SEARCH_FIELDS}
+            self.timestamps = []
+            self.last_id = None
+            self.saved_docs = 0
+            self._vocab = {}
+
+    def add(self, doc, fields, epoch, entry_id):
+        """Index one document given its field texts."""
+        with self._lock:
+            for field in SEARCH_FIELDS:
+                counts = {}
+                for token in tokenize(fields.get(field)):
+                    counts[token] = counts.get(token, 0) + 1
+                table = self.postings[field]
+                for token, tf in counts.items():
+                    plist = table.get(token)
+                    if plist is None:
+                        table[token] = [doc, tf]
+                        self._vocab.pop(field, None)
+                    else:
+                        plist += (doc, tf)
+            self.timestamps.append(epoch)
+            self.last_id = entry_id
+
+    @timed()
+    def sync(self, columns):
+        """Bring the index up to date with an EntryStore.
+
+        Only entries past the indexed count are tokenised; if the store no
+        longer lines up with the index (rewritten or migrated), the index
+        is rebuilt from scratch.
+        """
+        with self._lock:
+            n = len(self)
+            if n > len(columns) or (n and int(columns.ids[n - 1]) != self.last_id):
+                self.clear()
+                n = 0
+            for i in range(n, len(columns)):
+                row = columns[i]
+                self.add(i, {f: row[f] for f in SEARCH_FIELDS}, int(columns.ts[i]), int(columns.ids[i]))
+            if len(self) - self.saved_docs >= SAVE_EVERY or (len(self) and not self.saved_docs):
+                self.save()
+
+    def _sorted_vocab(self, field):
+        vocab = self._vocab.get(field)
+        if vocab is None:
+            vocab = self._vocab[field] = sorted(self.postings[field])
+        return vocab
+
+    def _matches(self, field, token, is_prefix):
+        """Yield postings lists for a single query term."""
+        for f in ([field] if field else SEARCH_FIELDS):
+            table = self.postings[f]
+            if not is_prefix:
+                if token in table:
+                    yield table[token]
+                continue
+            vocab = self._sorted_vocab(f)
+            i = bisect_left(vocab, token)
+            while i < len(vocab) and vocab[i].startswith(token):
+                yield table[vocab[i]]
+                i += 1
+
+    @timed()
+    def search(self, query, rank="relevance", prefix=False, since=None, limit=None):
+        """Return document numbers matching every term of query.
+
+        rank is "relevance" (tf-idf) or "recency" (newest first). since
+        drops documents older than that epoch second.
+        """
+        terms = parse_query(query, prefix=prefix)
+        if not terms:
+            return []
+        with self._lock:
+            total = max(len(self), 1)
+            scores = None
+            for field, token, is_prefix in terms:
+                term_scores = {}
+                for plist in self._matches(field, token, is_prefix):
+                    idf = math.log(1 + total / (len(plist) // 2))
+                    for j in range(0, len(plist), 2):
+                        doc = plist[j]
+                        term_scores[doc] = term_scores.get(doc, 0.0) + plist[j + 1] * idf
+                if scores is None:
+                    scores = term_scores
+                else:
+                    scores = {d: s + term_scores[d] for d, s in scores.items() if d in term_scores}
+                if not scores:
+                    return []
+            ts = self.timestamps
+            docs = [d for d in scores if since is None or ts[d] >= since]
+        if rank == "recency":
+            docs.sort(key=lambda d: (ts[d], d), reverse=True)
+        else:
+            docs.sort(key=lambda d: (scores[d], ts[d]), reverse=True)
+        return docs[:limit] if limit else docs
+
+
+def index_for(store, columns):
+    """Return the process-wide index of store, synced with columns.
+
+    The index lives in the load cache next to the columns, so it counts
+    towards the cache memory ceiling and is evicted with them.
+    """
+    from utils.cache import cached_index
+
+    index = cached_index(store)
+    index.sync(columns)
+    return index
@@ -0,0 +1,110 @@
+"""
+Time-series shaping for Trigger Tracker charts.
+Aggregates daily counts into day, week or month buckets sized to the date
+range, and downsamples what is still too dense with Largest-Triangle-
+Three-Buckets (LTTB), so a chart never sends more than MAX_POINTS points.
+"""
+
+from datetime import date, timedelta
+
+# Most points one chart is given.
+MAX_POINTS = 400
+
+BUCKETS = ("day", "week", "month")
+
+
+def _as_date(value):
+    if isinstance(value, date):
+        return value if type(value) is date else value.date()
+    return date.fromisoformat(str(value)[:10])
+
+
+def bucket_start(day, bucket):
+    """Return the first day of the bucket holding day (weeks start Monday)."""
+    if bucket == "week":
+        return day - timedelta(days=day.weekday())
+    if bucket == "month":
+        return day.replace(day=1)
+    return day
+
+
+def _next(start, bucket):
+    if bucket == "week":
+        return start + timedelta(days=7)
+    if bucket == "month":
+        return date(start.year + start.month // 12, start.month % 12 + 1, 1)
+    return start + timedelta(days=1)
+
+
+def choose_bucket(start, end, max_points=MAX_POINTS):
+    """Return the finest bucket that spans start..end in at most max_points."""
+    days = (end - start).days + 1
+    if days <= max_points:
+        return "day"
+    if days <= max_points * 7:
+        return "week"
+    return "month"
+
+
+def lttb(points, threshold):
+    """Downsample [(x, y)] sorted by x to threshold points with LTTB.
+
+    The first and last points are kept; from each of the buckets in between
+    the point forming the largest triangle with the previously kept point
+    and the average of the next bucket is chosen, which preserves peaks
+    and troughs that plain striding would drop.
+    """
+    n = len(points)
+    if threshold >= n or threshold < 3:
+        return list(points)
+    sampled = [points[0]]
+    every = (n - 2) / (threshold - 2)
+    a = 0
+    for i in range(threshold - 2):
+        lo, hi = int(i * every) + 1, int((i + 1) * every) + 1
+        nxt = points[hi:min(int((i + 2) * every) + 1, n)] or points[-1:]
+        avg_x = sum(p[0] for p in nxt) / len(nxt)
+        avg_y = sum(p[1] for p in nxt) / len(nxt)
+        ax, ay = points[a]
+        best, best_area = lo, -1.0
+        for j in range(lo, hi):
+            x, y = points[j]
+            area = abs((ax - avg_x) * (y - ay) - (ax - x) * (avg_y - ay))
+            if area > best_area:
+                best, best_area = j, area
+        sampled.append(points[best])
+        a = best
+    sampled.append(points[-1])
+    return sampled
+
+
+def time_series(daily, start=None, end=None, bucket=None, max_points=MAX_POINTS):
+    """Shape daily counts for a chart.
+
+    daily is an iterable of (day, count) with days as dates or "YYYY-MM-DD"
+    strings; start/end bound it (inclusive, defaulting to the data). bucket
+    is one of BUCKETS or None to choose from the range. Empty buckets count
+    as zero. Returns (bucket, [(bucket start date, count)]) with at most
+    max_points points, downsampled with LTTB when the bucket is too fine.
+    """
+    days = [(_as_date(d), c) for d, c in daily]
+    if not days:
+        return bucket or "day", []
+    start = start or min(d for d, _ in days)
+    end = end or max(d for d, _ in days)
+    if end < start:
+        return bucket or "day", []
+    bucket = bucket or choose_bucket(start, end, max_points)
+    totals = {}
+    for day, count in days:
+        if start <= day <= end:
+            key = bucket_start(day, bucket)
+            totals[key] = totals.get(key, 0) + count
+    points, key = [], bucket_start(start, bucket)
+    while key <= end:
+        points.append((key, totals.get(key, 0)))
+        key = _next(key, bucket)
+    if len(points) > max_points:
+        ordinals = lttb([(d.toordinal(), c) for d, c in points], max_points)
+        points = [(date.fromordinal(x), c) for x, c in ordinals]
+    return bucket, points
@@ -3,14 +3,24 @@ Statistics helpers for Trigger Tracker.
 """
 
 from collections import Counter, OrderedDict
+import numpy as np
 import pandas as pd
-from datetime import datetime
 
+from utils.columnar import NAT, EntryStore
+from utils.helpers import FEELINGS, TIMESTAMP_FORMAT, parse_timestamp
+from utils.profiling import timed
 
+SECONDS_PER_DAY = 86400
+
+
+@timed()
 def average_emotion_scores(entries):
     """Compute average scores for each recorded feeling."""
     if not entries:
         return {"anxiety": 0, "sadness": 0, "anger": 0, "shame": 0, "relief": 0}
+    if isinstance(entries, EntryStore):
+        means = entries.feelings.mean(axis=0, dtype=np.float64)
+        return dict(zip(FEELINGS, means.tolist()))
     sums = {"anxiety": 0.0, "sadness": 0.0, "anger": 0.0, "shame": 0.0, "relief": 0.0}
     count = 0
     for e in entries:
@@ -21,39 +31,84 @@ def average_emotion_scores(entries):
     return {k: (sums[k] / count) for k in sums}
 
 
+@timed()
 def count_triggers(entries):
     """Return Counter of triggers (exact-match)."""
+    if isinstance(entries, EntryStore):
+        counts = Counter()
+        per_code = np.bincount(entries.trigger_codes, minlength=len(entries.trigger_vocab))
+        for trig, cnt in zip(entries.trigger_vocab, per_code.tolist()):
+            if trig and cnt:
+                counts[trig.strip()] += cnt
+        return counts
     triggers = [e.get("trigger", "").strip() for e in entries if e.get("trigger")]
     return Counter(triggers)
 
 
+@timed()
 def triggers_per_hour(entries):
     """Return OrderedDict(hour -> count)."""
+    if isinstance(entries, EntryStore):
+        ts = entries.ts[entries.ts != NAT]
+        per_hour = np.bincount(ts % SECONDS_PER_DAY // 3600, minlength=24)
+        return OrderedDict((h, int(c)) for h, c in enumerate(per_hour) if c)
     hours = Counter()
     for e in entries:
         ts = e.get("timestamp")
         if not ts:
             continue
         try:
-            dt = datetime.strptime(ts, "%Y-%m-%d %H:%M:%S")
+            dt = parse_timestamp(ts)
             hours[dt.hour] += 1
         except Exception:
             continue
     return OrderedDict(sorted(hours.items()))
 
 
+@timed()
 def triggers_per_day(entries):
     """Return OrderedDict(date -> count)."""
+    if isinstance(entries, EntryStore):
+        ts = entries.ts[entries.ts != NAT]
+        days, counts = np.unique(ts // SECONDS_PER_DAY, return_counts=True)
+        labels = np.datetime_as_string(days.astype("datetime64[D]"))
+        return OrderedDict(zip(labels.tolist(), counts.tolist()))
     days = Counter()
     for e in entries:
         ts = e.get("timestamp")
         if not ts:
             continue
         try:
-            dt = datetime.strptime(ts, "%Y-%m-%d %H:%M:%S")
+            dt = parse_timestamp(ts)
             days[dt.date().isoformat()] += 1
         except Exception:
             continue
     # return ordered by date
     ordered = OrderedDict(sorted(days.items()))
     return ordered
+
+
+@timed()
+def entries_frame(entries):
+    """Return a DataFrame with one row per entry and feelings as columns.
+
+    Timestamps are parsed in one vectorised pass; date and hour columns are
+    derived from them. An EntryStore is converted straight from its arrays.
+    """
+    if isinstance(entries, EntryStore):
+        df = pd.DataFrame({
+            "timestamp": entries.ts.astype("datetime64[s]"),
+            "trigger": entries.triggers(),
+            "intensity": entries.intensity,
+            **{k: entries.feelings[:, j] for j, k in enumerate(FEELINGS)},
+        })
+    else:
+        df = pd.DataFrame({
+            "timestamp": pd.to_datetime([e["timestamp"] for e in entries], format=TIMESTAMP_FORMAT),
+            "trigger": [e["trigger"] for e in entries],
+            "intensity": [e["intensity"] for e in entries],
+            **{k: [e["feelings"].get(k, 0) for e in entries] for k in FEELINGS},
+        })
+    df["date"] = df["timestamp"].dt.date
+    df["hour"] = df["timestamp"].dt.hour
+    return df
@@ -0,0 +1,934 @@
+"""
+Storage backends for Trigger Tracker.
+Entries live in the JSON snapshot + journal, in monthly JSON partitions, in
+the compact binary format, or in an indexed SQLite database.
+"""
+
+import heapq
+import json
+import os
+import sqlite3
+import threading
+import time
+from contextlib import closing
+from datetime import datetime, timedelta
+
+from utils.helpers import (
+    FEELINGS,
+    TIMESTAMP_FORMAT,
+    append_entries,
+    compact_journal,
+    entry_count,
+    journal_path,
+    load_entries,
+    load_entries_with_cursor,
+    read_new_entries,
+    replace_entries,
+    timestamp_bound,
+)
+from utils.locking import file_lock, file_version, group_commit_for
+from utils.profiling import timed
+from utils import binary, rollups
+
+DATA_DIR = "data"
+DATA_FILE = os.path.join(DATA_DIR, "triggers.json")
+DB_FILE = os.path.join(DATA_DIR, "triggers.db")
+PARTITION_DIR = os.path.join(DATA_DIR, "triggers")
+BINARY_FILE = os.path.join(DATA_DIR, "triggers" + binary.BINARY_SUFFIX)
+
+# Set to "sqlite", "partitioned" or "binary" to store entries in DB_FILE,
+# PARTITION_DIR or BINARY_FILE instead of DATA_FILE.
+BACKEND_ENV = "TRIGGER_TRACKER_BACKEND"
+
+# Entries older than this many days are moved to the archive tier by
+# apply_retention (python main.py archive).
+RETENTION_ENV = "TRIGGER_TRACKER_RETENTION_DAYS"
+RETENTION_DAYS = 365
+
+
+def _ts(value):
+    """Normalise a datetime, timestamp or date string to the stored string form."""
+    if value is None:
+        return None
+    if isinstance(value, str):
+        return timestamp_bound(value)
+    return value.strftime(TIMESTAMP_FORMAT)
+
+
+def page_key(entry):
+    """Return the (timestamp, id) key an entry is paged by."""
+    return entry["timestamp"], entry["id"]
+
+
+def _key(key):
+    # Keys come from stored entries, so their timestamp is kept as is.
+    if key is None or isinstance(key[0], str):
+        return key
+    return _ts(key[0]), key[1]
+
+
+class Storage:
+    """Interface shared by all entry stores.
+
+    Timestamps are compared as "%Y-%m-%d %H:%M:%S" strings, which sort in
+    chronological order. Range bounds accept datetimes, such strings or
+    "%Y-%m-%d" dates (midnight), and raise ValueError for anything else;
+    start is inclusive and end is exclusive.
+    """
+
+    def append(self, entry):
+        self.extend([entry])
+
+    def extend(self, entries):
+        """Append entries; concurrent callers are group-committed."""
+        self._commit.submit(entries)
+
+    def _use_group_commit(self, kind):
+        self._commit = group_commit_for((kind, os.path.abspath(self.path)), self._commit_batch)
+
+    def _commit_batch(self, batch):
+        # Rollups are updated under the same lock as the write so they
+        # always cover exactly what is on disk.
+        with rollups.updating(self.path) as r:
+            self._write(batch)
+            r.add(batch)
+
+    def _write(self, batch):
+        raise NotImplementedError
+
+    def tail_info(self):
+        """Return (number of entries, id of the last entry)."""
+        count, last_id = 0, None
+        for e in self.iter_all():
+            count, last_id = count + 1, e.get("id")
+        return count, last_id
+
+    def iter_all(self):
+        """Yield every entry in insertion order."""
+        raise NotImplementedError
+
+    def snapshot(self):
+        """Return (entries, cursor); pass the cursor to read_new later."""
+        return list(self.iter_all()), None
+
+    def parts(self, size):
+        """Split the entries into pieces of about `size` that can be loaded
+        independently, for the process-pool aggregation of utils.mapreduce.
+
+        Returns picklable (function, args) pairs; calling them in order
+        yields the entries of iter_all, each worker reading its own piece.
+        Returns None when the files do not split that way: loading
+        everything here and pickling it to workers is slower than
+        aggregating it in this process.
+        """
+        return None
+
+    def snapshot_columns(self):
+        """Like snapshot, with the entries as a columnar EntryStore."""
+        from utils.columnar import EntryStore
+
+        entries, cursor = self.snapshot()
+        return EntryStore.from_entries(entries), cursor
+
+    def warm(self):
+        """Load what queries are answered from, for a long-running process
+        whose later queries should only read what was appended since.
+        Stores that query their files directly have nothing to load."""
+
+    def read_new(self, cursor):
+        """Return (entries appended since cursor, new cursor).
+
+        Returns None when the store changed in a way that needs a full
+        reload through snapshot().
+        """
+        return None
+
+    def range(self, start=None, end=None):
+        """Return entries with start <= timestamp < end, oldest first."""
+        return _range(self.iter_all(), start, end)
+
+    def recent(self, n):
+        """Return the n most recent entries, newest first."""
+        return _page(self.iter_all(), n)
+
+    def count(self, start=None, end=None):
+        """Return the number of entries in [start, end)."""
+        if start is None and end is None:
+            return sum(1 for _ in self.iter_all())
+        return len(self.range(start, end))
+
+    def page(self, size, before=None, after=None, start=None, end=None):
+        """Return up to size entries in [start, end), newest first.
+
+        Pages are keyed on (timestamp, id): pass the key of the last row
+        as before= for the next (older) page, or of the first row as
+        after= for the previous (newer) one.
+        """
+        return _page(self.iter_all(), size, before, after, start, end)
+
+
+def _range(entries, start=None, end=None):
+    """Storage.range over an iterable of entries."""
+    start, end = _ts(start), _ts(end)
+    hits = [
+        e for e in entries
+        if (start is None or e["timestamp"] >= start)
+        and (end is None or e["timestamp"] < end)
+    ]
+    hits.sort(key=lambda e: e["timestamp"])
+    return hits
+
+
+def _page(entries, size, before=None, after=None, start=None, end=None):
+    """Storage.page over an iterable of entries."""
+    start, end = _ts(start), _ts(end)
+    before, after = _key(before), _key(after)
+    hits = (
+        e for e in entries
+        if (start is None or e["timestamp"] >= start)
+        and (end is None or e["timestamp"] < end)
+        and (before is None or page_key(e) < before)
+        and (after is None or page_key(e) > after)
+    )
+    if after is not None:
+        return heapq.nsmallest(size, hits, key=page_key)[::-1]
+    return heapq.nlargest(size, hits, key=page_key)
+
+
+class _CachedQueries(Storage):
+    """Queries answered from the process-wide columns of utils.cache, for
+    file stores that have no index of their own.
+
+    archive_before moves old entries out of the data file into monthly
+    ArchiveSegments next to it. snapshot and read_new, and so the cache,
+    cover only the data file; the other queries also read the archived
+    months they reach into, and iter_all yields archived entries first.
+    Subclasses provide the data file through _write, _hot_info, _iter_hot,
+    _fold and _replace_hot.
+    """
+
+    def archive(self):
+        """Return the archive of this store, or None if nothing was archived."""
+        directory = archive_dir(self.path)
+        return ArchiveSegments(directory) if os.path.isdir(directory) else None
+
+    def _archived_months(self, start=None, end=None):
+        archive = self.archive()
+        return (archive, archive._months(start, end)) if archive is not None else (None, [])
+
+    def tail_info(self):
+        count, last_id = self._hot_info()
+        archive = self.archive()
+        if archive is None:
+            return count, last_id
+        archived, archived_last = archive.tail_info()
+        return count + archived, last_id if count else archived_last
+
+    def iter_all(self):
+        archive = self.archive()
+        if archive is not None:
+            yield from archive.iter_all()
+        yield from self._iter_hot()
+
+    def parts(self, size):
+        hot = self._hot_parts(size)
+        if hot is None:
+            return None
+        archive = self.archive()
+        return (archive.parts(size) if archive is not None else []) + hot
+
+    def _hot_parts(self, size):
+        # The data file is read whole (a JSON snapshot and its journal).
+        return None
+
+    def warm(self):
+        from utils.cache import cached_columns
+
+        cached_columns(self)
+
+    def count(self, start=None, end=None):
+        if start is None and end is None:
+            return self.tail_info()[0]
+        from utils.cache import cached_columns
+
+        total = cached_columns(self).count(_ts(start), _ts(end))
+        archive, months = self._archived_months(start, end)
+        if months:
+            total += archive.count(start, end)
+        return total
+
+    def range(self, start=None, end=None):
+        columns = _loaded_columns(self)
+        if columns is None:
+            hits = _range(self._iter_hot(), start, end)
+        else:
+            hits = [r.to_dict() for r in columns.between(_ts(start), _ts(end))]
+        archive, months = self._archived_months(start, end)
+        if months:
+            hits = _range(archive.range(start, end) + hits)
+        return hits
+
+    def recent(self, n):
+        # A process that already holds the columns answers from their
+        # timeline; a one-shot command just keeps the top n while reading.
+        # Either way the entries come back as stored (EntryStore.entry).
+        columns = _loaded_columns(self)
+        if columns is None:
+            hits = _page(self._iter_hot(), n)
+        else:
+            hits = [r.to_dict() for r in columns.latest(n)]
+        return self._with_archive(hits, n)
+
+    def page(self, size, before=None, after=None, start=None, end=None):
+        # Page through the shared in-memory columns, which are kept in
+        # sorted order, rather than scanning the file on every page.
+        from utils.cache import cached_columns
+
+        hits = cached_columns(self).page(size, _key(before), _key(after), _ts(start), _ts(end))
+        return self._with_archive(hits, size, before, after, start, end)
+
+    def _with_archive(self, hits, size, before=None, after=None, start=None, end=None):
+        """Merge archived entries into a page of hot hits where they belong.
+
+        The archive is only opened when the page reaches back to its newest
+        entry, so recent pages never read it.
+        """
+        archive, months = self._archived_months(start, end)
+        if not months:
+            return hits
+        newest = months[-1][1]["max"]
+        if after is not None and _key(after)[0] > newest:
+            return hits
+        if after is None and len(hits) >= size and hits[-1]["timestamp"] > newest:
+            return hits
+        return _page(hits + archive.page(size, before, after, start, end), size, before, after)
+
+    def archive_before(self, cutoff):
+        """Move entries logged before cutoff into the archive; return how
+        many were moved.
+
+        The total does not change, so the rollups (and everything drawn
+        from them) keep covering the archived entries. A run interrupted
+        between the two writes is finished by the next one.
+        """
+        cutoff = _ts(cutoff)
+        # Writers append under the rollups lock, so none can slip in
+        # between reading the data file and rewriting it.
+        with rollups.updating(self.path) as r:
+            self._fold()
+            in_sync = (r.count, r.last_id) == self.tail_info()
+            hot = list(self._iter_hot())
+            old = [e for e in hot if e.get("timestamp") and e["timestamp"] < cutoff]
+            if not old:
+                return 0
+            ArchiveSegments(archive_dir(self.path)).add(old)
+            self._replace_hot([e for e in hot if not (e.get("timestamp") and e["timestamp"] < cutoff)])
+            # Archiving the most recently added entry changes the last id
+            # the drift check compares; the entries covered are the same.
+            if in_sync:
+                r.last_id = self.tail_info()[1]
+        return len(old)
+
+
+class JsonStorage(_CachedQueries):
+    """Entries in a JSON snapshot replayed with its append-only journal."""
+
+    def __init__(self, path=DATA_FILE):
+        self.path = path
+        self._use_group_commit("json")
+
+    def _write(self, batch):
+        append_entries(self.path, batch)
+
+    def _hot_info(self):
+        return entry_count(self.path)
+
+    def _iter_hot(self):
+        return iter(load_entries(self.path))
+
+    def _fold(self):
+        # Waits out a background compaction, then folds what it left.
+        while not compact_journal(self.path):
+            time.sleep(0.05)
+
+    def _replace_hot(self, entries):
+        replace_entries(self.path, entries)
+
+    def snapshot(self):
+        return load_entries_with_cursor(self.path)
+
+    def read_new(self, cursor):
+        return read_new_entries(self.path, cursor)
+
+
+class BinaryStorage(_CachedQueries):
+    """Entries in the compact binary format of utils.binary; every batch is
+    appended as new blocks."""
+
+    def __init__(self, path=BINARY_FILE):
+        self.path = path
+        self._use_group_commit("binary")
+
+    def _write(self, batch):
+        binary.append_entries(self.path, batch)
+
+    def _hot_info(self):
+        return binary.block_info(self.path)
+
+    def _iter_hot(self):
+        return iter(binary.read_entries(self.path)[0])
+
+    def _fold(self):
+        pass
+
+    def _replace_hot(self, entries):
+        binary.write_file(self.path, entries)
+
+    def _hot_parts(self, size):
+        return [(_read_segment, (self.path, start, end)) for start, end in binary.block_spans(self.path, size)]
+
+    def snapshot(self):
+        entries, inode, offset = binary.read_entries(self.path)
+        return entries, (inode, offset)
+
+    def snapshot_columns(self):
+        columns, inode, offset = binary.read_columns(self.path)
+        return columns, (inode, offset)
+
+    def read_new(self, cursor):
+        inode, offset = cursor
+        entries, new_inode, new_offset = binary.read_entries(self.path, offset)
+        # Rewriting the file (compact or convert) replaces it.
+        if new_inode != inode:
+            return None
+        return entries, (new_inode, new_offset)
+
+
+def _loaded_columns(store):
+    from utils.cache import loaded_columns
+
+    return loaded_columns(store)
+
+
+def partition_key(timestamp):
+    """Return the month partition ("YYYY-MM") a timestamp string belongs to."""
+    if timestamp and len(timestamp) >= 7 and timestamp[4] == "-":
+        return timestamp[:7]
+    return "0000-00"
+
+
+class PartitionedStorage(Storage):
+    """Entries split into one JSON snapshot + journal per calendar month.
+
+    manifest.json records each partition's entry count and timestamp range,
+    so range queries open only the months they overlap and appends touch
+    only the months they write to. Entries are iterated month by month,
+    in insertion order within a month.
+    """
+
+    MANIFEST = "manifest.json"
+    SUFFIXES = (".json", ".jsonl")
+    _FORMAT = 2
+    # Reads one partition file; a module-level function so parts() can
+    # hand it to worker processes.
+    _reader = staticmethod(load_entries)
+
+    def __init__(self, path=PARTITION_DIR):
+        self.path = path
+        self._use_group_commit("partitioned")
+
+    def partition_path(self, month):
+        return os.path.join(self.path, month + self.SUFFIXES[0])
+
+    def _read_month(self, month):
+        return self._reader(self.partition_path(month))
+
+    def _append_month(self, month, entries):
+        append_entries(self.partition_path(month), entries)
+
+    def _manifest_path(self):
+        return os.path.join(self.path, self.MANIFEST)
+
+    def manifest(self):
+        """Return the manifest, rebuilding it if it is missing or unreadable.
+
+        {"count", "last_id", "partitions": {month: {"count", "min", "max",
+        "last_id"}}}; last_id is the id of the last entry of iter_all, the
+        newest month's most recently appended one, which is what rollups
+        built from iter_all end on.
+        """
+        manifest = self._read_manifest()
+        return manifest if manifest is not None else self.rebuild_manifest()
+
+    def _read_manifest(self):
+        try:
+            with open(self._manifest_path(), "r", encoding="utf-8") as f:
+                raw = json.load(f)
+        except (OSError, ValueError):
+            return None
+        return raw if raw.get("format") == self._FORMAT else None
+
+    def _save_manifest(self, manifest):
+        path = self._manifest_path()
+        tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(manifest, f, indent=2)
+        os.replace(tmp, path)
+
+    def rebuild_manifest(self):
+        """Recount every partition file and rewrite the manifest."""
+        os.makedirs(self.path, exist_ok=True)
+        with file_lock(self._manifest_path()):
+            manifest = self._scan()
+            self._save_manifest(manifest)
+        return manifest
+
+    def _scan(self):
+        manifest = {"format": self._FORMAT, "count": 0, "last_id": None, "partitions": {}}
+        if not os.path.isdir(self.path):
+            return manifest
+        months = sorted({
+            name.split(".")[0] for name in os.listdir(self.path)
+            if name.endswith(self.SUFFIXES) and name != self.MANIFEST
+        })
+        for month in months:
+            entries = self._read_month(month)
+            if not entries:
+                continue
+            stamps = [e.get("timestamp") or "" for e in entries]
+            manifest["partitions"][month] = {
+                "count": len(entries), "min": min(stamps), "max": max(stamps), "last_id": entries[-1].get("id"),
+            }
+            manifest["count"] += len(entries)
+            manifest["last_id"] = entries[-1].get("id")
+        return manifest
+
+    def _write(self, batch):
+        by_month = {}
+        for e in batch:
+            by_month.setdefault(partition_key(e.get("timestamp")), []).append(e)
+        os.makedirs(self.path, exist_ok=True)
+        with file_lock(self._manifest_path()):
+            manifest = self._read_manifest() or self._scan()
+            for month, entries in by_month.items():
+                self._append_month(month, entries)
+                stamps = [e.get("timestamp") or "" for e in entries]
+                part = manifest["partitions"].setdefault(month, {"count": 0, "min": stamps[0], "max": stamps[0]})
+                part["count"] += len(entries)
+                part["min"] = min(part["min"], *stamps)
+                part["max"] = max(part["max"], *stamps)
+                part["last_id"] = entries[-1].get("id")
+            manifest["count"] += len(batch)
+            manifest["last_id"] = manifest["partitions"][max(manifest["partitions"])]["last_id"]
+            self._save_manifest(manifest)
+
+    def _commit_batch(self, batch):
+        # A batch that ends in an older month leaves the last id of
+        # iter_all unchanged; rollups that covered the store before the
+        # write take the manifest's, so the drift check keeps matching.
+        with rollups.updating(self.path) as r:
+            in_sync = (r.count, r.last_id) == self.tail_info()
+            self._write(batch)
+            r.add(batch)
+            if in_sync:
+                r.last_id = self.tail_info()[1]
+
+    def _months(self, start=None, end=None, manifest=None):
+        """Return [(month, info)] overlapping [start, end), oldest first."""
+        start, end = _ts(start), _ts(end)
+        manifest = manifest or self.manifest()
+        return [
+            (month, info) for month, info in sorted(manifest["partitions"].items())
+            if (start is None or info["max"] >= start) and (end is None or info["min"] < end)
+        ]
+
+    def _load(self, months):
+        for month, _ in months:
+            yield from self._read_month(month)
+
+    def iter_all(self):
+        return self._load(self._months())
+
+    def parts(self, size):
+        # One piece per month, whatever its size.
+        return [(self._reader, (self.partition_path(month),)) for month, _ in self._months()]
+
+    def tail_info(self):
+        manifest = self.manifest()
+        return manifest["count"], manifest["last_id"]
+
+    def range(self, start=None, end=None):
+        return _range(self._load(self._months(start, end)), start, end)
+
+    def count(self, start=None, end=None):
+        start, end = _ts(start), _ts(end)
+        total = 0
+        for month, info in self._months(start, end):
+            if (start is None or info["min"] >= start) and (end is None or info["max"] < end):
+                total += info["count"]
+            else:
+                total += sum(
+                    1 for e in self._read_month(month)
+                    if (start is None or e["timestamp"] >= start)
+                    and (end is None or e["timestamp"] < end)
+                )
+        return total
+
+    def recent(self, n):
+        return self.page(n)
+
+    def page(self, size, before=None, after=None, start=None, end=None):
+        # Months never overlap, so once a month yields a full page the
+        # months beyond it cannot contribute.
+        months = self._months(start, end)
+        if before is not None:
+            months = [(m, i) for m, i in months if i["min"] <= _key(before)[0]]
+        if after is not None:
+            months = [(m, i) for m, i in months if i["max"] >= _key(after)[0]]
+        else:
+            months.reverse()
+        hits = []
+        for month, _ in months:
+            hits.extend(_page(self._read_month(month), size, before, after, start, end))
+            if len(hits) >= size:
+                break
+        return _page(hits, size, before, after)
+
+    def snapshot(self):
+        manifest = self.manifest()
+        entries, cursors = [], []
+        for month, info in self._months(manifest=manifest):
+            part, cursor = load_entries_with_cursor(self.partition_path(month))
+            entries.extend(part)
+            cursors.append((month, len(part), cursor))
+        return entries, cursors
+
+    def read_new(self, cursor):
+        # Only appends to the newest month, or new later months, can be
+        # picked up incrementally; anything else changes positions.
+        months = self._months()
+        if len(months) < len(cursor) or [m for m, _ in months[:len(cursor)]] != [m for m, _, _ in cursor]:
+            return None
+        for (month, info), (_, seen, _) in zip(months[:len(cursor) - 1], cursor):
+            if info["count"] != seen:
+                return None
+        cursor = list(cursor)
+        entries = []
+        if cursor:
+            month, seen, part_cursor = cursor[-1]
+            update = read_new_entries(self.partition_path(month), part_cursor)
+            if update is None:
+                return None
+            entries.extend(update[0])
+            cursor[-1] = (month, seen + len(update[0]), update[1])
+        for month, _ in months[len(cursor):]:
+            part, part_cursor = load_entries_with_cursor(self.partition_path(month))
+            entries.extend(part)
+            cursor.append((month, len(part), part_cursor))
+        return entries, cursor
+
+
+def _read_segment(path, start=0, end=None):
+    """Entries of a binary file, or of its blocks between two offsets."""
+    return binary.read_entries(path, start, end)[0]
+
+
+def archive_dir(path):
+    """Return the directory holding the archived entries of data file path."""
+    return path + ".archive"
+
+
+class ArchiveSegments(PartitionedStorage):
+    """Archived entries: one compressed binary segment per calendar month.
+
+    Written only by _CachedQueries.archive_before and read through the
+    PartitionedStorage queries, which open only the months they overlap.
+    """
+
+    SUFFIXES = (binary.BINARY_SUFFIX,)
+
+    def __init__(self, path):
+        self.path = path
+
+    _reader = staticmethod(_read_segment)
+
+    def _append_month(self, month, entries):
+        binary.append_entries(self.partition_path(month), entries)
+
+    def add(self, entries):
+        """Append entries to their segments, skipping ids that an earlier,
+        interrupted archive run already stored."""
+        months = {partition_key(e.get("timestamp")) for e in entries}
+        known = self.manifest()["partitions"]
+        stored = {e.get("id") for month in months if month in known for e in self._read_month(month)}
+        fresh = [e for e in entries if e.get("id") not in stored]
+        if fresh:
+            self._write(fresh)
+
+
+def apply_retention(store, days=None, now=None):
+    """Archive the entries of store logged more than `days` days before now.
+
+    days defaults to TRIGGER_TRACKER_RETENTION_DAYS, else RETENTION_DAYS.
+    Returns the number of entries moved. SQLite and partitioned stores
+    already read only what a view needs and have no archive tier.
+    """
+    if not isinstance(store, _CachedQueries):
+        raise ValueError(f"{type(store).__name__} keeps no archive tier")
+    if days is None:
+        days = int(os.environ.get(RETENTION_ENV, RETENTION_DAYS))
+    if days < 1:
+        raise ValueError("retention must be at least one day")
+    return store.archive_before((now or datetime.utcnow()) - timedelta(days=days))
+
+
+_COLUMNS = ("id", "timestamp", "trigger", "before", "after", "intensity", "notes") + FEELINGS
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS entries (
+    seq INTEGER PRIMARY KEY,
+    id INTEGER,
+    timestamp TEXT NOT NULL,
+    trigger TEXT NOT NULL,
+    before TEXT,
+    after TEXT,
+    intensity INTEGER,
+    notes TEXT,
+    anxiety INTEGER,
+    sadness INTEGER,
+    anger INTEGER,
+    shame INTEGER,
+    relief INTEGER
+);
+CREATE INDEX IF NOT EXISTS idx_entries_timestamp ON entries (timestamp);
+CREATE INDEX IF NOT EXISTS idx_entries_trigger ON entries (trigger);
+CREATE INDEX IF NOT EXISTS idx_entries_intensity ON entries (intensity);
+CREATE INDEX IF NOT EXISTS idx_entries_page ON entries (timestamp, id);
+"""
+
+
+def _to_row(entry):
+    feelings = entry.get("feelings") or {}
+    return (
+        entry.get("id"),
+        entry.get("timestamp"),
+        entry.get("trigger", ""),
+        entry.get("before", ""),
+        entry.get("after", ""),
+        entry.get("intensity"),
+        entry.get("notes", ""),
+    ) + tuple(feelings.get(k, 0) for k in FEELINGS)
+
+
+def _from_row(row):
+    return {
+        "id": row[0],
+        "timestamp": row[1],
+        "trigger": row[2],
+        "before": row[3],
+        "after": row[4],
+        "feelings": dict(zip(FEELINGS, row[7:7 + len(FEELINGS)])),
+        "intensity": row[5],
+        "notes": row[6],
+    }
+
+
+def _sqlite_rows(path, lo, hi=None):
+    """Entries with lo <= seq <= hi (no upper bound when hi is None)."""
+    where, params = "seq >= ?", [lo]
+    if hi is not None:
+        where, params = where + " AND seq <= ?", params + [hi]
+    with closing(sqlite3.connect(path, timeout=30)) as conn:
+        rows = conn.execute(SqliteStorage._SELECT + f" WHERE {where} ORDER BY seq", params).fetchall()
+    return [_from_row(r) for r in rows]
+
+
+class SqliteStorage(Storage):
+    """Entries in a SQLite table indexed on timestamp, trigger and intensity."""
+
+    _SELECT = "SELECT " + ", ".join(_COLUMNS) + " FROM entries"
+    _SELECT_SEQ = "SELECT " + ", ".join(_COLUMNS) + ", seq FROM entries"
+
+    def __init__(self, path=DB_FILE):
+        self.path = path
+        self._ready = False
+        self._use_group_commit("sqlite")
+
+    def _connect(self):
+        # One connection per call keeps the store safe to share between
+        # Streamlit session threads; SQLite's own locking serialises
+        # writers across processes.
+        conn = sqlite3.connect(self.path, timeout=30)
+        if not self._ready:
+            conn.executescript(_SCHEMA)
+            self._ready = True
+        return conn
+
+    @timed()
+    def _query(self, sql, params=()):
+        with closing(self._connect()) as conn:
+            return [_from_row(r) for r in conn.execute(sql, params)]
+
+    @timed()
+    def _write(self, entries):
+        rows = [_to_row(e) for e in entries]
+        if not rows:
+            return
+        placeholders = ", ".join("?" * len(_COLUMNS))
+        with closing(self._connect()) as conn, conn:
+            conn.executemany(
+                f"INSERT INTO entries ({', '.join(_COLUMNS)}) VALUES ({placeholders})", rows
+            )
+
+    def iter_all(self):
+        with closing(self._connect()) as conn:
+            for row in conn.execute(self._SELECT + " ORDER BY seq"):
+                yield _from_row(row)
+
+    @timed()
+    def snapshot(self):
+        with closing(self._connect()) as conn:
+            version = file_version(self.path)
+            rows = conn.execute(self._SELECT_SEQ + " ORDER BY seq").fetchall()
+        last = rows[-1][-1] if rows else 0
+        return [_from_row(r) for r in rows], (version, last, len(rows))
+
+    @timed()
+    def read_new(self, cursor):
+        version, last, seen = cursor
+        if file_version(self.path) == version:
+            return [], cursor
+        with closing(self._connect()) as conn:
+            version = file_version(self.path)
+            # Rows at or below the cursor must be untouched for the tail to
+            # be all that changed.
+            if conn.execute("SELECT COUNT(*) FROM entries WHERE seq <= ?", (last,)).fetchone()[0] != seen:
+                return None
+            rows = conn.execute(self._SELECT_SEQ + " WHERE seq > ? ORDER BY seq", (last,)).fetchall()
+        if rows:
+            last = rows[-1][-1]
+        return [_from_row(r) for r in rows], (version, last, seen + len(rows))
+
+    def _where(self, start, end):
+        clauses, params = [], []
+        if start is not None:
+            clauses.append("timestamp >= ?")
+            params.append(_ts(start))
+        if end is not None:
+            clauses.append("timestamp < ?")
+            params.append(_ts(end))
+        return (" WHERE " + " AND ".join(clauses) if clauses else ""), params
+
+    def range(self, start=None, end=None):
+        where, params = self._where(start, end)
+        return self._query(self._SELECT + where + " ORDER BY timestamp, seq", params)
+
+    def recent(self, n):
+        return self._query(self._SELECT + " ORDER BY timestamp DESC, seq DESC LIMIT ?", (n,))
+
+    def page(self, size, before=None, after=None, start=None, end=None):
+        where, params = self._where(start, end)
+        clauses = [where[len(" WHERE "):]] if where else []
+        if before is not None:
+            clauses.append("(timestamp, id) < (?, ?)")
+            params += _key(before)
+        if after is not None:
+            clauses.append("(timestamp, id) > (?, ?)")
+            params += _key(after)
+        where = " WHERE " + " AND ".join(clauses) if clauses else ""
+        order = "ASC" if after is not None else "DESC"
+        rows = self._query(
+            self._SELECT + where + f" ORDER BY timestamp {order}, id {order} LIMIT ?", params + [size]
+        )
+        return rows[::-1] if after is not None else rows
+
+    def parts(self, size):
+        # Runs of seq; each worker selects its own run.
+        with closing(self._connect()) as conn:
+            bounds = [r[0] for r in conn.execute(
+                "SELECT seq FROM (SELECT seq, ROW_NUMBER() OVER (ORDER BY seq) AS n FROM entries) "
+                "WHERE (n - 1) % ? = 0 ORDER BY seq", (size,)
+            )]
+        ends = [b - 1 for b in bounds[1:]] + [None]
+        return [(_sqlite_rows, (self.path, lo, hi)) for lo, hi in zip(bounds, ends)]
+
+    def tail_info(self):
+        with closing(self._connect()) as conn:
+            count = conn.execute("SELECT COUNT(*) FROM entries").fetchone()[0]
+            last = conn.execute("SELECT id FROM entries ORDER BY seq DESC LIMIT 1").fetchone()
+        return count, (last[0] if last else None)
+
+    def count(self, start=None, end=None):
+        where, params = self._where(start, end)
+        with closing(self._connect()) as conn:
+            return conn.execute("SELECT COUNT(*) FROM entries" + where, params).fetchone()[0]
+
+
+def backend_path(backend=None, data_dir=DATA_DIR):
+    """Return where backend keeps its entries inside data_dir.
+
+    backend defaults to the TRIGGER_TRACKER_BACKEND environment variable;
+    unknown names fall back to the JSON snapshot.
+    """
+    backend = (backend or os.environ.get(BACKEND_ENV, "json")).lower()
+    name = {
+        "sqlite": DB_FILE,
+        "partitioned": PARTITION_DIR,
+        "binary": BINARY_FILE,
+    }.get(backend, DATA_FILE)
+    return os.path.join(data_dir, os.path.basename(name))
+
+
+def open_storage(path=None, data_dir=DATA_DIR):
+    """Open the configured store.
+
+    Paths ending in .db or .sqlite use SQLite and .ttb the binary format;
+    without a path the backend is chosen by the TRIGGER_TRACKER_BACKEND
+    environment variable and its files live in data_dir.
+    """
+    if path is None:
+        path = backend_path(data_dir=data_dir)
+        if path == backend_path("partitioned", data_dir):
+            return PartitionedStorage(path)
+    if os.path.splitext(path)[1] in (".db", ".sqlite"):
+        return SqliteStorage(path)
+    if path.endswith(binary.BINARY_SUFFIX):
+        return BinaryStorage(path)
+    if os.path.isdir(path) or path == PARTITION_DIR:
+        return PartitionedStorage(path)
+    return JsonStorage(path)
+
+
+def migrate_json_to_sqlite(json_path=DATA_FILE, db_path=DB_FILE):
+    """Move entries from the JSON snapshot and journal into a SQLite database.
+
+    The JSON files are kept as *.migrated backups. Returns the number of
+    entries copied.
+    """
+    return _migrate_json(json_path, SqliteStorage(db_path))
+
+
+def migrate_json_to_partitioned(json_path=DATA_FILE, directory=PARTITION_DIR):
+    """Move entries from the JSON snapshot and journal into monthly partitions.
+
+    Like migrate_json_to_sqlite, the JSON files are kept as *.migrated.
+    """
+    return _migrate_json(json_path, PartitionedStorage(directory))
+
+
+def migrate_json_to_binary(json_path=DATA_FILE, binary_path=BINARY_FILE):
+    """Move entries from the JSON snapshot and journal into the binary format.
+
+    Like migrate_json_to_sqlite, the JSON files are kept as *.migrated.
+    """
+    return _migrate_json(json_path, BinaryStorage(binary_path))
+
+
+def _migrate_json(json_path, target):
+    entries = load_entries(json_path)
+    target.extend(entries)
+    jpath = journal_path(json_path)
+    for src in (json_path, jpath + ".compacting", jpath):
+        if os.path.exists(src):
+            os.replace(src, src + ".migrated")
+    return len(entries)
@@ -0,0 +1,151 @@
+"""
+Sorted timeline index for Trigger Tracker.
+Keeps entry positions ordered by (epoch seconds, id) as entries are added,
+so range and most-recent queries are binary searches instead of sorts.
+"""
+
+from array import array
+from bisect import bisect_left, bisect_right
+from datetime import datetime
+
+from utils.helpers import parse_timestamp, timestamp_bound
+
+_EPOCH = datetime(1970, 1, 1)
+
+# Key for entries without a usable timestamp; they sort first.
+MISSING = -(2**63)
+
+
+def epoch_of(timestamp):
+    """Return epoch seconds of a timestamp string, or MISSING."""
+    try:
+        return int((parse_timestamp(timestamp) - _EPOCH).total_seconds())
+    except (TypeError, ValueError):
+        return MISSING
+
+
+def _epoch(value):
+    # Range bounds: a string that is not a timestamp or date raises
+    # ValueError (helpers.timestamp_bound) instead of becoming MISSING.
+    if value is None or isinstance(value, int):
+        return value
+    if isinstance(value, datetime):
+        return int((value - _EPOCH).total_seconds())
+    return epoch_of(timestamp_bound(value))
+
+
+def _key_epoch(value):
+    # Page keys carry a stored timestamp, indexed like the entry it came from.
+    return epoch_of(value) if isinstance(value, str) else _epoch(value)
+
+
+class Timeline:
+    """Positions of entries ordered by (epoch, id).
+
+    epochs, ids and positions are parallel arrays in key order. Entries
+    that arrive in time order are appended in O(1); an out-of-order entry
+    is inserted with one binary search and an array shift.
+    """
+
+    __slots__ = ("epochs", "ids", "positions")
+
+    def __init__(self):
+        self.epochs = array("q")
+        self.ids = array("q")
+        self.positions = array("q")
+
+    def __len__(self):
+        return len(self.positions)
+
+    @classmethod
+    def from_entries(cls, entries):
+        """Index a list of entry dicts by their position in the list."""
+        timeline = cls()
+        timeline.extend(
+            [epoch_of(e.get("timestamp")) for e in entries],
+            [e.get("id") or 0 for e in entries],
+            range(len(entries)),
+        )
+        return timeline
+
+    @classmethod
+    def from_sorted(cls, epochs, ids, positions):
+        """Build from parallel sequences that are already in key order."""
+        timeline = cls()
+        timeline.epochs.extend(epochs)
+        timeline.ids.extend(ids)
+        timeline.positions.extend(positions)
+        return timeline
+
+    def copy(self):
+        return self.from_sorted(self.epochs, self.ids, self.positions)
+
+    def index(self, epoch, entry_id):
+        """Return the first index whose key is >= (epoch, entry_id)."""
+        lo = bisect_left(self.epochs, epoch)
+        hi = bisect_right(self.epochs, epoch, lo)
+        return bisect_left(self.ids, entry_id, lo, hi)
+
+    def add(self, epoch, entry_id, position):
+        i = len(self.epochs)
+        if i and (epoch < self.epochs[-1] or (epoch == self.epochs[-1] and entry_id < self.ids[-1])):
+            i = self.index(epoch, entry_id)
+            self.epochs.insert(i, epoch)
+            self.ids.insert(i, entry_id)
+            self.positions.insert(i, position)
+            return
+        self.epochs.append(epoch)
+        self.ids.append(entry_id)
+        self.positions.append(position)
+
+    def extend(self, epochs, ids, positions):
+        """Add a batch; it is sorted first so in-order batches only append."""
+        batch = sorted(zip(epochs, ids, positions))
+        if not batch:
+            return
+        if not self.epochs or batch[0][:2] >= (self.epochs[-1], self.ids[-1]):
+            self.epochs.extend(b[0] for b in batch)
+            self.ids.extend(b[1] for b in batch)
+            self.positions.extend(b[2] for b in batch)
+            return
+        for epoch, entry_id, position in batch:
+            self.add(epoch, entry_id, position)
+
+    def bounds(self, start=None, end=None):
+        """Return the index range [lo, hi) of start <= time < end.
+
+        start/end are epoch seconds, datetimes, timestamp strings or dates.
+        """
+        start, end = _epoch(start), _epoch(end)
+        lo = bisect_left(self.epochs, start) if start is not None else 0
+        hi = bisect_left(self.epochs, end) if end is not None else len(self.epochs)
+        return lo, max(lo, hi)
+
+    def count(self, start=None, end=None):
+        lo, hi = self.bounds(start, end)
+        return hi - lo
+
+    def between(self, start=None, end=None):
+        """Positions with start <= time < end, oldest first."""
+        lo, hi = self.bounds(start, end)
+        return self.positions[lo:hi].tolist()
+
+    def latest(self, n):
+        """Positions of the n most recent entries, newest first; O(n)."""
+        if n <= 0:
+            return []
+        return self.positions[-n:].tolist()[::-1]
+
+    def page(self, size, before=None, after=None, start=None, end=None):
+        """Positions of one page, newest first (see Storage.page).
+
+        before/after are (timestamp, id) keys of the neighbouring page.
+        """
+        lo, hi = self.bounds(start, end)
+        if after is not None:
+            # Ids are integers, so the first key above after is (ts, id + 1).
+            first = max(lo, self.index(_key_epoch(after[0]), after[1] + 1))
+            return self.positions[first:min(hi, first + size)].tolist()[::-1]
+        if before is not None:
+            hi = min(hi, self.index(_key_epoch(before[0]), before[1]))
+        return self.positions[max(lo, hi - size):hi].tolist()[::-1]
@@ -0,0 +1,165 @@
+"""
+Background writer for Trigger Tracker.
+Queues entries for a store and saves them from a worker thread, so a caller
+such as the Streamlit form gets control back before the write is durable.
+"""
+
+import atexit
+import os
+import queue
+import threading
+
+# Entries that may wait for the writer before submit() blocks.
+QUEUE_SIZE = 1000
+# Most entries folded into one write.
+MAX_BATCH = 500
+# The worker thread exits after this many idle seconds; the next submit
+# starts a new one, so idle profiles hold no thread.
+IDLE_SECONDS = 60
+
+
+class QueueFullError(Exception):
+    """The writer queue stayed full for the whole submit timeout."""
+
+
+class Ticket:
+    """Acknowledgement of one queued entry; done once it is on disk."""
+
+    __slots__ = ("entry", "error", "_event")
+
+    def __init__(self, entry):
+        self.entry = entry
+        self.error = None
+        self._event = threading.Event()
+
+    def done(self):
+        return self._event.is_set()
+
+    def saved(self):
+        """True once the entry was written without an error."""
+        return self._event.is_set() and self.error is None
+
+    def wait(self, timeout=None):
+        """Block until the write finished; return done()."""
+        return self._event.wait(timeout)
+
+    def _finish(self, error=None):
+        self.error = error
+        self._event.set()
+
+
+class BackgroundWriter:
+    """Saves queued entries to store on a worker thread.
+
+    Everything queued while a write is in progress goes out together in
+    the next store.extend call, which is a single durable write on every
+    backend. The queue is bounded, so a stalled disk pushes back on
+    submit() instead of growing without limit.
+    """
+
+    def __init__(self, store, queue_size=QUEUE_SIZE, max_batch=MAX_BATCH):
+        self.store = store
+        self.max_batch = max_batch
+        self._queue = queue.Queue(queue_size)
+        self._lock = threading.Lock()
+        self._thread = None
+        self._closed = False
+
+    def submit(self, entry, timeout=5):
+        """Queue entry and return its Ticket without waiting for the write.
+
+        Raises QueueFullError if no slot frees up within timeout seconds.
+        """
+        ticket = Ticket(entry)
+        # Held while queueing so close() cannot slip its stop marker in
+        # ahead of an entry that was accepted.
+        with self._lock:
+            if self._closed:
+                raise RuntimeError("writer is closed")
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="entry-writer", daemon=True)
+                self._thread.start()
+            try:
+                self._queue.put(ticket, timeout=timeout)
+            except queue.Full:
+                raise QueueFullError(f"{self._queue.maxsize} entries are already waiting to be saved") from None
+        return ticket
+
+    def pending(self):
+        """Return the number of entries not yet written."""
+        return self._queue.unfinished_tasks
+
+    def flush(self):
+        """Block until everything queued so far has been written."""
+        self._queue.join()
+
+    def close(self):
+        """Write what is queued and stop the worker."""
+        with self._lock:
+            if self._closed:
+                return
+            self._closed = True
+            thread = self._thread
+        if thread is not None:
+            self._queue.put(None)
+            thread.join()
+
+    def _run(self):
+        while True:
+            try:
+                batch = [self._queue.get(timeout=IDLE_SECONDS)]
+            except queue.Empty:
+                # submit() queues under the lock, so nothing can arrive
+                # between this check and the thread being marked gone.
+                with self._lock:
+                    if self._queue.empty():
+                        self._thread = None
+                        return
+                continue
+            while batch[-1] is not None and len(batch) < self.max_batch:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            stop = batch[-1] is None
+            tickets = [t for t in batch if t is not None]
+            self._write(tickets)
+            for _ in batch:
+                self._queue.task_done()
+            if stop:
+                return
+
+    def _write(self, tickets):
+        if not tickets:
+            return
+        try:
+            self.store.extend([t.entry for t in tickets])
+        except Exception as exc:
+            for t in tickets:
+                t._finish(exc)
+            return
+        for t in tickets:
+            t._finish()
+
+
+_writers = {}
+_writers_lock = threading.Lock()
+
+
+def writer_for(store):
+    """Return the process-wide BackgroundWriter of store."""
+    key = type(store).__name__, os.path.abspath(store.path)
+    with _writers_lock:
+        writer = _writers.get(key)
+        if writer is None:
+            writer = _writers[key] = BackgroundWriter(store)
+        return writer
+
+
+@atexit.register
+def close_all():
+    """Flush and stop every writer; runs at interpreter exit."""
+    with _writers_lock:
+        writers = list(_writers.values())
+    for writer in writers:
+        writer.close()